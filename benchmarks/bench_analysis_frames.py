@@ -0,0 +1,108 @@
+# bench_analysis_frames.py
+"""Load time, memory and aggregation time of the analysis frames: plain
+``pd.read_csv`` vs the memory-mapped columnar files. Convert first, then
+run from the project root:
+
+    python rag_demo/columnar_data.py
+    python benchmarks/bench_analysis_frames.py
+
+Each mode runs in a fresh process and reports the time to load the frames,
+the process's resident memory growth (RssAnon is private, RssFile the
+mapped file pages shared between workers), the frames' own
+``memory_usage(deep=True)`` and the time of a per-symbol yearly mean over
+every frame.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, "./stock_api")  # tracing.py, for stage timings
+sys.path.insert(0, "./rag_demo")
+from analytical_templates import source_columns  # noqa: E402
+from columnar_data import DATASETS, csv_path, load_frame  # noqa: E402
+
+TEMPLATE_FRAMES = {
+    "stock_weekly_data": "weekly",
+    "quarterly_earnings": "earnings",
+    "cash_flow": "cash_flow",
+}
+
+
+def memory_kb():
+    fields = {}
+    with open("/proc/self/status") as file:
+        for line in file:
+            name, _, value = line.partition(":")
+            if name in ("RssAnon", "RssFile"):
+                fields[name] = int(value.split()[0])
+    return fields
+
+
+def load(mode, names):
+    if mode == "csv":
+        return {name: pd.read_csv(csv_path(name)) for name in names}
+    if mode == "columnar":
+        return {name: load_frame(name) for name in names}
+    # What the analytical templates load
+    return {name: load_frame(name, source_columns(TEMPLATE_FRAMES[name])) for name in names}
+
+
+def aggregate(frames):
+    for name, frame in frames.items():
+        symbol_column, dates = DATASETS[name]
+        date_column = next(iter(dates))
+        dates = frame[date_column]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates)
+        year = dates.dt.year
+        numeric = frame.select_dtypes("number")
+        numeric.groupby([frame[symbol_column], year], observed=True).mean()
+
+
+def worker(mode, names, results):
+    before = memory_kb()
+    start = time.perf_counter()
+    frames = load(mode, names)
+    load_seconds = time.perf_counter() - start
+    after = memory_kb()
+    start = time.perf_counter()
+    aggregate(frames)
+    results.put(
+        {
+            "mode": mode,
+            "load_ms": 1000 * load_seconds,
+            "aggregate_ms": 1000 * (time.perf_counter() - start),
+            "anon_mb": (after["RssAnon"] - before["RssAnon"]) / 1024,
+            "file_mb": (after["RssFile"] - before["RssFile"]) / 1024,
+            "frames_mb": sum(f.memory_usage(deep=True).sum() for f in frames.values()) / 2**20,
+        }
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", nargs="+", default=["csv", "columnar", "templates"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    names = [name for name in TEMPLATE_FRAMES if os.path.exists(csv_path(name))]
+    context = multiprocessing.get_context("spawn")
+    print(f"frames: {', '.join(names)}")
+    for mode in args.modes:
+        runs = []
+        for _ in range(args.repeat):
+            results = context.Queue()
+            process = context.Process(target=worker, args=(mode, names, results))
+            process.start()
+            runs.append(results.get())
+            process.join()
+        best = min(runs, key=lambda run: run["load_ms"])
+        print(
+            f"{mode:10} load {best['load_ms']:7.1f} ms  aggregate {best['aggregate_ms']:6.1f} ms  "
+            f"private +{best['anon_mb']:5.1f} MB  mapped +{best['file_mb']:5.1f} MB  "
+            f"frames {best['frames_mb']:5.1f} MB"
+        )
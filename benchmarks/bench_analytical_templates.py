@@ -0,0 +1,59 @@
+# bench_analytical_templates.py
+"""Latency and coverage of the analytical fast path on sample questions.
+Run from the project root:
+
+    python benchmarks/bench_analytical_templates.py
+"""
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, "./stock_api")  # tracing.py, for stage timings
+sys.path.insert(0, "./rag_demo")
+from analytical_templates import AnalyticalTemplates  # noqa: E402
+
+QUESTIONS = [
+    "What is the average close price of NVDA in 2023?",
+    "What is the average stock price between Nvidia and Apple? Please provide "
+    "the numbers and the distribution across years.",
+    "Which company has the highest stock price?",
+    "What are the top 5 companies by average trading volume in 2022?",
+    "What was Adobe's total operating cash flow between 2020 and 2022?",
+    "What is the median EPS of Microsoft since 2021?",
+    "What is the maximum estimated EPS for AMZN?",
+    "Show the yearly average closing price of Tesla",
+    # Expected to fall back to the agent
+    "What is the average stock price for Apple in 2023, and which month has "
+    "the highest stock price?",
+    "How has the stock price of Tesla changed over time?",
+    "Is there a correlation between news sentiment and NVDA's price?",
+    "What is the average stock price of Apple when volume was above 1M?",
+    "What is the average stock price of Apple and the total volume in 2023?",
+    "What is the average stock price of Apple in the last 2 years?",
+    "What is the average stock price of Apple in 2023 vs 2022?",
+    "What were the highest and lowest stock prices of Apple?",
+    "What was the average close price of Apple in January 2023?",
+    "What is the total volume of NVDA in Q1 2023?",
+    "What was the highest stock price of Tesla in the first half of 2023?",
+    "What was the average stock price of Microsoft in Dec 2022?",
+    "What is the average close price of AMZN in 2023 H2?",
+]
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    companies = pd.read_csv("./data/company_overview.csv", usecols=["Symbol", "Name"])
+    templates = AnalyticalTemplates(
+        pd.read_csv("./data/stock_weekly_data.csv"),
+        pd.read_csv("./data/quarterly_earnings.csv"),
+        pd.read_csv("./data/cash_flow.csv"),
+        companies.itertuples(index=False),
+    )
+    print(f"setup: {(time.perf_counter() - start) * 1000:.0f} ms")
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        answer = templates.answer(question)
+        elapsed = (time.perf_counter() - start) * 1000
+        status = "match   " if answer is not None else "fallback"
+        print(f"{status} {elapsed:7.2f} ms  {question[:70]}")
+    print(templates.stats())
@@ -0,0 +1,72 @@
+# bench_bot_stream.py
+"""Client-side time to first token vs. total latency of /bot/stream, next
+to the blocking /bot. Start the server first, then:
+
+    python benchmarks/bench_bot_stream.py --url http://localhost:5001
+
+Different questions go to each endpoint round, so the semantic answer
+cache does not turn the second call into a hit.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import requests
+
+QUESTIONS = [
+    "What does Adobe do?",
+    "Which companies compete with Facebook in social media?",
+    "What is the average stock price for Apple in 2023?",
+    "Describe Nvidia's main business segments.",
+]
+
+
+def streamed(session, url, query):
+    start = time.perf_counter()
+    ttfb = None
+    with session.post(url + "/bot/stream", json={"query": query}, stream=True, timeout=300) as response:
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event == "token" and ttfb is None:
+                ttfb = time.perf_counter() - start
+            elif line.startswith("data: ") and event == "error":
+                raise RuntimeError(json.loads(line[len("data: "):])["error"])
+    total = time.perf_counter() - start
+    return 1000 * (ttfb if ttfb is not None else total), 1000 * total
+
+
+def blocking(session, url, query):
+    start = time.perf_counter()
+    session.post(url + "/bot", json={"query": query}, timeout=300).raise_for_status()
+    total = 1000 * (time.perf_counter() - start)
+    # The whole answer arrives at once
+    return total, total
+
+
+def report(name, results):
+    ttfb, total = np.array(results).T
+    print(
+        f"{name:10} n={len(results):3}  first token p50 {np.percentile(ttfb, 50):8.1f} ms  "
+        f"total p50 {np.percentile(total, 50):8.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:5001")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    session = requests.Session()
+    results = {"/bot": [], "/bot/stream": []}
+    for i in range(args.rounds):
+        for j, query in enumerate(QUESTIONS):
+            suffix = f" (run {i}-{j})"
+            results["/bot"].append(blocking(session, args.url, query + suffix + " a"))
+            results["/bot/stream"].append(streamed(session, args.url, query + suffix + " b"))
+    for name, rows in results.items():
+        report(name, rows)
+    print("server-side:", session.get(args.url + "/bot/stats", timeout=10).json()["streaming"])
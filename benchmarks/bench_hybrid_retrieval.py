@@ -0,0 +1,105 @@
+# bench_hybrid_retrieval.py
+"""Latency and context size of the hybrid company retriever against the
+plain top-3 similarity search. Builds an in-memory store over
+company_overview.csv; without an OpenAI key (the default) it uses random
+embeddings, so the vector ranking is noise and the keyword side carries
+the precision. Run from the project root:
+
+    python benchmarks/bench_hybrid_retrieval.py [--openai]
+
+For each question: the expected companies, the retrieved ones, whether
+every expected company was retrieved, the context size in characters and
+the search time excluding the query embedding.
+"""
+import argparse
+import sys
+import time
+import zlib
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+sys.path.insert(0, "./stock_api")  # tracing.py, for stage timings
+sys.path.insert(0, "./rag_demo")
+from hybrid_retriever import SYMBOL_LINE, HybridRetriever  # noqa: E402
+from vector_store_generator import load_documents  # noqa: E402
+
+# (question, symbols the context should include)
+QUESTIONS = [
+    ("What does ADBE do?", {"ADBE"}),
+    ("What are Adobe's flagship products?", {"ADBE"}),
+    ("Which companies compete with Facebook in social media?", {"META"}),
+    ("What is the primary business focus of Google?", {"GOOGL"}),
+    ("How does Microsoft's product portfolio compare to Apple's?", {"MSFT", "AAPL"}),
+    ("Which companies make semiconductor equipment?", {"AMAT", "LRCX", "KLAC"}),
+    ("Tell me about life sciences companies working on vaccines", {"MRNA"}),
+    ("Which companies sell athletic apparel?", {"LULU"}),
+    ("What companies focus on beauty and fashion?", set()),
+    ("Which companies offer cloud security software?", {"CRWD", "ZS"}),
+]
+
+
+class RandomEmbeddings(Embeddings):
+    def __init__(self, dimension=1536):
+        self.dimension = dimension
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        rng = np.random.default_rng(zlib.crc32(text.encode()))
+        return rng.random(self.dimension, dtype="float32").tolist()
+
+
+def symbols(documents):
+    return [SYMBOL_LINE.search(d.page_content).group(1).strip() for d in documents]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--openai", action="store_true", help="embed with OpenAI")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.openai:
+        from config_utils import load_openai_key
+        from langchain_openai import OpenAIEmbeddings
+
+        embeddings = OpenAIEmbeddings(openai_api_key=load_openai_key())
+    else:
+        embeddings = RandomEmbeddings()
+    documents = load_documents()
+    ids = list(documents)
+    vectorstore = FAISS.from_texts(
+        [documents[i].page_content for i in ids], embeddings,
+        metadatas=[documents[i].metadata for i in ids], ids=ids,
+    )
+    start = time.perf_counter()
+    retriever = HybridRetriever(vectorstore)
+    print(f"Index built in {1000 * (time.perf_counter() - start):.1f} ms")
+
+    totals = {"plain": [0, 0], "hybrid": [0, 0]}
+    for question, expected in QUESTIONS:
+        vector = embeddings.embed_query(question)
+        plain = vectorstore.similarity_search_by_vector(vector, k=3)
+        named = retriever.named_symbols(question)
+        if not retriever.needs_search(question, named):
+            vector = None
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            chosen, _ = retriever.select(question, named, vector)
+            hybrid = retriever._documents(chosen)
+        search_ms = 1000 * (time.perf_counter() - start) / args.repeat
+        print(f"\n{question}")
+        for name, result in (("plain", plain), ("hybrid", hybrid)):
+            found = symbols(result)
+            hit = expected <= set(found)
+            size = sum(len(d.page_content) for d in result)
+            totals[name][0] += hit
+            totals[name][1] += size
+            timing = f"  {search_ms:.3f} ms" if name == "hybrid" else ""
+            print(f"  {name:6} {'hit ' if hit else 'miss'} {size:6} chars  {found}{timing}")
+    print()
+    for name, (hits, size) in totals.items():
+        print(f"{name:6} {hits}/{len(QUESTIONS)} questions covered, {size / len(QUESTIONS):.0f} context chars on average")
@@ -0,0 +1,60 @@
+# bench_indicators.py
+"""Time indicators.compute_indicators over the bundled weekly data and a
+synthetic frame. Run from the project root:
+
+    python benchmarks/bench_indicators.py [--rows 10000000] [--symbols 2000]
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, "./stock_api")
+from indicators import INDICATORS, compute_indicators, weekly_frame  # noqa: E402
+
+
+def synthetic_frame(rows, symbols):
+    weeks = rows // symbols
+    rng = np.random.default_rng(0)
+    steps = rng.normal(0, 0.03, size=(symbols, weeks))
+    close = 100 * np.exp(np.cumsum(steps, axis=1))
+    dates = pd.date_range("1990-01-05", periods=weeks, freq="W-FRI")
+    names = [f"S{i:05d}" for i in range(symbols)]
+    return pd.DataFrame(
+        {
+            "symbol": pd.Categorical(np.repeat(names, weeks)),
+            "date": np.tile(dates, symbols),
+            "close": close.ravel(),
+        }
+    )
+
+
+def bench(label, frame, window, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compute_indicators(frame, INDICATORS, window)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    print(
+        f"{label}: {len(frame):,} rows, {frame['symbol'].nunique()} symbols, "
+        f"best {best * 1000:.1f} ms ({best / len(frame) * 1e9:.0f} ns/row)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--symbols", type=int, default=2000)
+    parser.add_argument("--window", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = pd.read_csv("./data/stock_weekly_data.csv").to_dict("records")
+    frame = weekly_frame(rows)
+    print(f"loaded stock_weekly_data.csv in {time.perf_counter() - start:.2f} s")
+    bench("stock_weekly_data.csv", frame, args.window, args.repeat)
+    bench("synthetic", synthetic_frame(args.rows, args.symbols), args.window, args.repeat)
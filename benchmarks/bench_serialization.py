@@ -0,0 +1,90 @@
+# bench_serialization.py
+"""Per-document cost of the REST serialization path, before and after
+mongo_json. Run from the project root:
+
+    python benchmarks/bench_serialization.py
+"""
+import csv
+import json
+import sys
+import timeit
+from math import isnan
+
+from bson import ObjectId
+
+sys.path.insert(0, "./stock_api")
+import mongo_json  # noqa: E402
+
+
+def load_documents(path):
+    def convert(value):
+        if value == "None":
+            return float("nan")
+        for cast in (int, float):
+            try:
+                return cast(value)
+            except ValueError:
+                pass
+        return value
+
+    with open(path) as file:
+        return [
+            dict({k: convert(v) for k, v in row.items()}, _id=ObjectId())
+            for row in csv.DictReader(file)
+        ]
+
+
+# The code paths rest_api.py used before mongo_json
+def process_data(data):
+    if isinstance(data, dict):
+        return {k: process_data(v) for k, v in data.items() if k != "_id"}
+    elif isinstance(data, list):
+        return [process_data(item) for item in data]
+    elif isinstance(data, float) and isnan(data):
+        return "NaN"
+    else:
+        return data
+
+
+def legacy_process_data(documents):
+    # jsonify() with Flask's default provider: sorted keys, stdlib json
+    return json.dumps([process_data(d) for d in documents], sort_keys=True).encode()
+
+
+def legacy_nan_loop(documents):
+    documents = [dict(d) for d in documents]
+    for document in documents:
+        document["_id"] = str(document["_id"])
+        for key, value in document.items():
+            if isinstance(value, float) and isnan(value):
+                document[key] = None
+    return json.dumps(documents, sort_keys=True).encode()
+
+
+def stdlib_fallback(documents):
+    return json.dumps(
+        mongo_json._scrub(documents),
+        default=mongo_json._default,
+        sort_keys=True,
+        separators=(",", ":"),
+        allow_nan=False,
+    ).encode()
+
+
+def bench(name, fn, documents, number=20):
+    seconds = min(timeit.repeat(lambda: fn(documents), number=number, repeat=5))
+    per_doc = seconds / number / len(documents) * 1e6
+    print(f"  {name:<28} {per_doc:8.2f} us/doc")
+    return per_doc
+
+
+if __name__ == "__main__":
+    print(f"orjson available: {mongo_json.orjson is not None}")
+    for name in ("company_overview", "cash_flow", "stock_weekly_data"):
+        documents = load_documents(f"./data/{name}.csv")
+        print(f"{name} ({len(documents)} documents)")
+        base = bench("process_data + jsonify", legacy_process_data, documents)
+        bench("isnan loop + jsonify", legacy_nan_loop, documents)
+        bench("mongo_json stdlib fallback", stdlib_fallback, documents)
+        new = bench("mongo_json.dumps", mongo_json.dumps, documents)
+        print(f"  speedup vs process_data: {base / new:.1f}x")
@@ -0,0 +1,120 @@
+# bench_vectorstore_load.py
+"""Load time and memory per worker: pickled vector store vs the
+memory-mapped faiss_store layout. Builds a synthetic store so no OpenAI
+key is needed. Run from the project root:
+
+    python benchmarks/bench_vectorstore_load.py --docs 50000 --workers 4
+
+Each worker is a fresh process that loads the store, runs one search and
+reports its resident memory split into private (RssAnon) and file-backed
+pages (RssFile); file-backed pages of the mapped store are shared between
+workers through the OS cache.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+sys.path.insert(0, "./rag_demo")
+from faiss_store import load_store, save_store  # noqa: E402
+
+
+class RandomEmbeddings(Embeddings):
+    def __init__(self, dimension):
+        self.dimension = dimension
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        rng = np.random.default_rng(abs(hash(text)) % 2**32)
+        return rng.random(self.dimension, dtype="float32").tolist()
+
+
+def memory_kb():
+    fields = {}
+    with open("/proc/self/status") as file:
+        for line in file:
+            name, _, value = line.partition(":")
+            if name in ("VmRSS", "RssAnon", "RssFile"):
+                fields[name] = int(value.split()[0])
+    return fields
+
+
+def worker(mode, path, dimension, results):
+    start = time.perf_counter()
+    embeddings = RandomEmbeddings(dimension)
+    if mode == "pickle":
+        with open(path, "rb") as f:
+            store = FAISS.deserialize_from_bytes(
+                embeddings=embeddings,
+                serialized=f.read(),
+                allow_dangerous_deserialization=True,
+            )
+    else:
+        store = load_store(embeddings, path, mmap=mode != "read")
+    load = time.perf_counter() - start
+    store.similarity_search("software and cloud services", k=4)
+    results.put((getattr(store, "index_mode", "memory"), load, memory_kb()))
+
+
+def build(directory, docs, dimension, index_type):
+    rng = np.random.default_rng(0)
+    vectors = rng.random((docs, dimension), dtype="float32")
+    texts = [f"Symbol: S{i}\nDescription: " + "lorem ipsum " * 80 for i in range(docs)]
+    store = FAISS.from_embeddings(
+        list(zip(texts, vectors.tolist())),
+        RandomEmbeddings(dimension),
+        metadatas=[{"row": i} for i in range(docs)],
+        ids=[f"S{i}" for i in range(docs)],
+    )
+    pickle_path = os.path.join(directory, "store.pkl")
+    with open(pickle_path, "wb") as f:
+        f.write(store.serialize_to_bytes())
+    store_dir = os.path.join(directory, "store")
+    save_store(store, store_dir, index_type)
+    return pickle_path, store_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--index-type", choices=("flat", "ivf", "hnsw"), default="flat")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        pickle_path, store_dir = build(directory, args.docs, args.dim, args.index_type)
+        print(f"build: {time.perf_counter() - start:.1f} s, {args.docs} docs x {args.dim}")
+        paths = {"pickle": pickle_path, "read": store_dir, "mmap": store_dir}
+        for mode, path in paths.items():
+            results = context.Queue()
+            processes = [
+                context.Process(target=worker, args=(mode, path, args.dim, results))
+                for _ in range(args.workers)
+            ]
+            for process in processes:
+                process.start()
+            rows = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+            # How the faiss index was actually loaded, see faiss_store._read_index
+            index_modes = sorted({index_mode for index_mode, _, _ in rows})
+            loads = [load for _, load, _ in rows]
+            memory = [m for _, _, m in rows]
+            print(
+                f"{mode:6} index {'/'.join(index_modes):6}  "
+                f"load {np.mean(loads) * 1000:8.1f} ms  "
+                f"rss {np.mean([m['VmRSS'] for m in memory]) / 1024:7.1f} MB  "
+                f"private {np.mean([m['RssAnon'] for m in memory]) / 1024:7.1f} MB  "
+                f"file-backed {np.mean([m['RssFile'] for m in memory]) / 1024:7.1f} MB"
+            )
@@ -0,0 +1,106 @@
+# eval_context_builder.py
+"""Prompt tokens and coverage of the context builder against the full
+top-document context. Run from the project root:
+
+    python benchmarks/eval_context_builder.py [--budget 600] [--llm]
+
+Each question comes with the company documents to use and the overview
+fields an answer needs; a question is covered when every needed field's
+value (the start of it, for descriptions) is in the context. ``--llm``
+also answers every question with both contexts through the general
+chain's prompt and prints the answers with their prompt tokens (needs the
+OpenAI key).
+"""
+import argparse
+import sys
+import time
+
+from langchain_community.document_loaders import CSVLoader
+
+sys.path.insert(0, "./stock_api")  # tracing.py, for stage timings
+sys.path.insert(0, "./rag_demo")
+from context_builder import ContextBuilder, TokenCounter, parse_fields  # noqa: E402
+
+# (question, documents in retrieval order, fields the answer needs)
+EVAL_SET = [
+    ("What does Adobe do?", ["ADBE"], ["Description"]),
+    ("What are Adobe's flagship products?", ["ADBE"], ["Description"]),
+    ("Which companies compete with Facebook in social media?",
+     ["META", "GOOGL", "GOOG"], ["Description"]),
+    ("What industry is Nvidia in?", ["NVDA"], ["Industry"]),
+    ("What is Apple's market cap?", ["AAPL"], ["MarketCapitalization"]),
+    ("What is the dividend yield of PepsiCo?", ["PEP"], ["DividendYield"]),
+    ("Compare the profit margins of Microsoft and Apple", ["MSFT", "AAPL"],
+     ["ProfitMargin"]),
+    ("Where is Tesla headquartered?", ["TSLA"], ["Address"]),
+    ("What is the PE ratio of Amazon?", ["AMZN"], ["PERatio"]),
+    ("What do analysts expect for NVDA's target price?", ["NVDA"], ["AnalystTargetPrice"]),
+    ("How volatile is AMD stock compared to Intel?", ["AMD", "INTC"], ["Beta"]),
+    ("Which semiconductor equipment makers are there?",
+     ["AMAT", "LRCX", "KLAC"], ["Description", "Industry"]),
+]
+
+
+def covered(context, documents, needed):
+    for document in documents:
+        fields = parse_fields(document.page_content)
+        for name in needed:
+            value = fields.get(name, "")
+            if value in ("", "None", "-"):
+                continue
+            if (value[:60] if name == "Description" else value) not in context:
+                return False
+    return True
+
+
+def answer(llm, prompt, counter):
+    start = time.perf_counter()
+    response = llm.invoke(prompt)
+    usage = response.response_metadata.get("token_usage", {})
+    return response.content, usage.get("prompt_tokens", counter.count(prompt)), time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=int, default=600)
+    parser.add_argument("--llm", action="store_true")
+    args = parser.parse_args()
+
+    counter = TokenCounter()
+    builder = ContextBuilder(args.budget, counter)
+    documents = {}
+    for document in CSVLoader(file_path="./data/company_overview.csv").load():
+        documents[parse_fields(document.page_content)["Symbol"]] = document
+    if args.llm:
+        from company_info_query_engine import template
+        from config_utils import load_openai_key
+        from langchain_openai import ChatOpenAI
+
+        llm = ChatOpenAI(model_name="gpt-4o-mini", openai_api_key=load_openai_key())
+
+    totals = {"full": [0, 0], "built": [0, 0]}
+    for question, symbols, needed in EVAL_SET:
+        retrieved = [documents[symbol] for symbol in symbols]
+        contexts = {
+            "full": " ".join(d.page_content for d in retrieved),
+            "built": builder.build(question, retrieved),
+        }
+        print(f"\n{question}")
+        for name, context in contexts.items():
+            tokens = counter.count(context)
+            hit = covered(context, retrieved, needed)
+            totals[name][0] += hit
+            totals[name][1] += tokens
+            print(f"  {name:5} {'covered' if hit else 'MISSING'}  {tokens:5} tokens")
+            if args.llm:
+                reply, prompt_tokens, seconds = answer(
+                    llm, template.format(context=context, question=question), counter
+                )
+                print(f"        {prompt_tokens} prompt tokens, {seconds:.2f} s: {reply[:200]}")
+    print()
+    for name, (hits, tokens) in totals.items():
+        print(
+            f"{name:5} {hits}/{len(EVAL_SET)} covered, "
+            f"{tokens / len(EVAL_SET):.0f} context tokens on average"
+        )
+    print(f"build: {builder.stats()['avg_build_ms']:.2f} ms on average")
@@ -0,0 +1,66 @@
+# eval_question_classifier.py
+"""Accuracy and latency of the local question classifier on the labeled
+questions in data/question_labels.csv. Run from the project root:
+
+    python benchmarks/eval_question_classifier.py [--llm]
+
+``--llm`` also runs the two-call LLM classifier for comparison (needs the
+OpenAI key and makes two API calls per question).
+"""
+import argparse
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, "./stock_api")  # tracing.py, for stage timings
+sys.path.insert(0, "./rag_demo")
+from question_classifier import QuestionClassifier, column_terms, read_labeled  # noqa: E402
+
+DATA_FILES = [
+    "./data/stock_weekly_data.csv",
+    "./data/cash_flow.csv",
+    "./data/quarterly_earnings.csv",
+    "./data/news_sentiment.csv",
+]
+
+
+def evaluate(name, classify, questions, labels):
+    correct = 0
+    elapsed = 0.0
+    for question, label in zip(questions, labels):
+        start = time.perf_counter()
+        predicted = classify(question)
+        elapsed += time.perf_counter() - start
+        if predicted == label:
+            correct += 1
+        else:
+            print(f"  {name}: expected {label:10} got {predicted:10} {question[:60]}")
+    print(
+        f"{name}: accuracy {correct / len(questions):.1%} "
+        f"({correct}/{len(questions)}), {elapsed / len(questions) * 1000:.3f} ms/question"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--labels", default="./data/question_labels.csv")
+    parser.add_argument("--min-confidence", type=float, default=0.3)
+    parser.add_argument("--llm", action="store_true")
+    args = parser.parse_args()
+
+    questions, labels = read_labeled(args.labels)
+    companies = pd.read_csv("./data/company_overview.csv", usecols=["Symbol", "Name"])
+    classifier = QuestionClassifier(
+        column_terms(DATA_FILES), companies.itertuples(index=False)
+    )
+    evaluate("local", lambda q: classifier.classify(q)[0], questions, labels)
+    deferred = sum(
+        classifier.classify(q)[1] < args.min_confidence for q in questions
+    )
+    print(f"local: {deferred}/{len(questions)} below confidence {args.min_confidence}")
+
+    if args.llm:
+        from query_router import classify_question_llm
+
+        evaluate("llm", classify_question_llm, questions, labels)
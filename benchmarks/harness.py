@@ -0,0 +1,240 @@
+# harness.py
+"""Timing, load generation and result files for the offline benchmark suite
+(run_offline_suite.py).
+
+``Benchmark.run`` times a callable the way pytest-benchmark does: a warm-up
+call, then rounds of a calibrated number of calls until ``min_time`` has
+passed, and reports min/median/mean/stddev per call and calls per second.
+``run_load`` calls a function from a thread pool and reports throughput
+and p50/p95/p99 latency. Results are written as JSON, one file per run with
+the git revision and machine, and two runs are compared with
+
+    python benchmarks/harness.py BASELINE.json CURRENT.json [--tolerance 0.1]
+
+which exits with status 1 when a benchmark got slower than the tolerance.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+RESULTS_DIR = "./benchmarks/results"
+# Relative slowdown that counts as a regression
+DEFAULT_TOLERANCE = 0.10
+# Calls per round are chosen so a round takes about this long
+ROUND_SECONDS = 0.01
+
+
+def _summary(seconds):
+    ms = np.asarray(seconds) * 1000
+    q1, median, q3 = np.percentile(ms, [25, 50, 75])
+    mean = float(ms.mean())
+    return {
+        "min_ms": float(ms.min()),
+        "max_ms": float(ms.max()),
+        "mean_ms": mean,
+        "stddev_ms": float(ms.std(ddof=1)) if len(ms) > 1 else 0.0,
+        "median_ms": float(median),
+        "iqr_ms": float(q3 - q1),
+        "ops": 1000 / mean if mean else 0.0,
+        "rounds": len(ms),
+    }
+
+
+@contextlib.contextmanager
+def _quiet(enabled):
+    # The chatbot modules print a line per step; keep it out of the timings
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+class Benchmark:
+    """Microbenchmark runner collecting results by name.
+
+    A benchmark that raises is recorded with its error instead of timings,
+    so one missing resource does not stop the rest of the suite.
+    """
+
+    def __init__(self, min_time=0.5, min_rounds=5, max_rounds=1000, quiet=True):
+        self.min_time = min_time
+        self.min_rounds = min_rounds
+        self.max_rounds = max_rounds
+        self.quiet = quiet
+        self.results = {}
+
+    def run(self, name, function, *args, setup=None, group=None):
+        """Time ``function(*args)``. ``setup`` runs untimed before every
+        round, which then makes a single call."""
+        try:
+            with _quiet(self.quiet):
+                samples, iterations = self._measure(function, args, setup)
+        except Exception as e:
+            self.results[name] = {"kind": "micro", "group": group, "error": f"{type(e).__name__}: {e}"}
+            print(f"{name:<52} error: {type(e).__name__}: {e}")
+            return None
+        result = dict(_summary(samples), kind="micro", group=group, iterations=iterations)
+        self.results[name] = result
+        print(
+            f"{name:<52} median {result['median_ms']:9.3f} ms  min {result['min_ms']:9.3f} ms  "
+            f"stddev {result['stddev_ms']:8.3f} ms  {result['ops']:10.1f} ops/s"
+        )
+        return result
+
+    def _measure(self, function, args, setup):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function(*args)
+        first = time.perf_counter() - start
+        iterations = 1 if setup is not None else max(1, int(ROUND_SECONDS / max(first, 1e-9)))
+        samples = []
+        deadline = time.perf_counter() + self.min_time
+        while len(samples) < self.max_rounds and (
+            len(samples) < self.min_rounds or time.perf_counter() < deadline
+        ):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            for _ in range(iterations):
+                function(*args)
+            samples.append((time.perf_counter() - start) / iterations)
+        return samples, iterations
+
+
+def run_load(function, requests, concurrency, quiet=True):
+    """Call ``function(i)`` for ``i`` in ``range(requests)`` from
+    ``concurrency`` threads. A call that raises or returns False is an
+    error; its latency still counts."""
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            ok = function(i) is not False
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    with _quiet(quiet):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(one, range(requests)))
+        elapsed = time.perf_counter() - start
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "kind": "load",
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": sum(not ok for _, ok in results),
+        "seconds": elapsed,
+        "throughput_rps": requests / elapsed,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(latencies.max()),
+    }
+
+
+def report_load(name, result):
+    print(
+        f"{name:<28} {result['throughput_rps']:8.1f} req/s  p50 {result['p50_ms']:8.1f} ms  "
+        f"p95 {result['p95_ms']:8.1f} ms  p99 {result['p99_ms']:8.1f} ms  "
+        f"errors {result['errors']}/{result['requests']}"
+    )
+
+
+def environment():
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "git_revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def save_results(results, path=None, settings=None):
+    """Write ``results`` as JSON; by default to a new timestamped file in
+    RESULTS_DIR. Returns the path."""
+    info = environment()
+    created = datetime.now(timezone.utc)
+    if not path:
+        stamp = created.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(RESULTS_DIR, f"{stamp}-{info['git_revision'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    payload = {
+        "created": created.isoformat(timespec="seconds"),
+        "environment": info,
+        "settings": settings or {},
+        "benchmarks": results,
+    }
+    with open(path, "w") as file:
+        json.dump(payload, file, indent=2, sort_keys=True)
+    return path
+
+
+def load_results(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def _metric(result):
+    # What "slower" means for each kind of result
+    if result.get("kind") == "load":
+        return "p95_ms", result["p95_ms"]
+    return "median_ms", result["median_ms"]
+
+
+def compare(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """Print the change of every benchmark in both runs; returns the names
+    that got slower by more than ``tolerance``."""
+    old = baseline["benchmarks"]
+    new = current["benchmarks"]
+    regressions = []
+    for name in sorted(set(old) & set(new)):
+        if "error" in old[name] or "error" in new[name]:
+            print(f"{name:<52} skipped (error in one run)")
+            continue
+        metric, before = _metric(old[name])
+        _, after = _metric(new[name])
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif change < -tolerance:
+            flag = "  faster"
+        print(f"{name:<52} {metric} {before:9.3f} -> {after:9.3f} ({change:+7.1%}){flag}")
+    for name in sorted(set(old) - set(new)):
+        print(f"{name:<52} only in baseline")
+    for name in sorted(set(new) - set(old)):
+        print(f"{name:<52} new")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+    regressions = compare(load_results(args.baseline), load_results(args.current), args.tolerance)
+    print(f"{len(regressions)} regression(s)")
+    sys.exit(1 if regressions else 0)
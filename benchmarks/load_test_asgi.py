@@ -0,0 +1,94 @@
+# load_test_asgi.py
+"""REST latency while the chatbot is saturated. Start the server first:
+
+    uvicorn unified_api.asgi_server:app --port 5001
+    python benchmarks/load_test_asgi.py --url http://localhost:5001 --bot-users 32
+
+Runs the REST load twice, alone and with ``--bot-users`` clients posting
+to /bot back to back (more than BOT_CONCURRENCY, so the bot group is
+saturated and queueing), and prints REST p50/p95/p99 for both phases.
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+REST_PATHS = [
+    "/api/stock_weekly_data?symbol=AAPL&limit=52",
+    "/api/cash_flow?symbol=MSFT",
+    "/api/quarterly_earnings?symbol=NVDA",
+    "/api/company_overview?symbol=ADBE",
+]
+BOT_QUESTIONS = [
+    "What does Adobe do?",
+    "Which companies compete with Facebook in social media?",
+    "What is the average stock price for Apple in 2023?",
+]
+
+
+def rest_phase(url, requests_total, concurrency):
+    session = requests.Session()
+
+    def one(i):
+        start = time.perf_counter()
+        response = session.get(url + REST_PATHS[i % len(REST_PATHS)], timeout=60)
+        return time.perf_counter() - start, response.status_code
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(requests_total)))
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    errors = sum(status >= 500 for _, status in results)
+    return latencies, errors
+
+
+def bot_users(url, users, stop):
+    counts = {"done": 0, "rejected": 0}
+
+    def user(index):
+        session = requests.Session()
+        i = index
+        while not stop.is_set():
+            response = session.post(
+                url + "/bot", json={"query": BOT_QUESTIONS[i % len(BOT_QUESTIONS)]},
+                timeout=300,
+            )
+            counts["rejected" if response.status_code == 503 else "done"] += 1
+            i += 1
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    return threads, counts
+
+
+def report(name, latencies, errors):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(
+        f"{name:12} n={len(latencies):5}  p50 {p50:7.1f} ms  p95 {p95:7.1f} ms  "
+        f"p99 {p99:7.1f} ms  5xx {errors}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:5001")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--bot-users", type=int, default=32)
+    parser.add_argument("--bot-ramp", type=float, default=2.0,
+                        help="seconds to let the bot load build up")
+    args = parser.parse_args()
+
+    report("baseline", *rest_phase(args.url, args.requests, args.concurrency))
+
+    stop = threading.Event()
+    threads, counts = bot_users(args.url, args.bot_users, stop)
+    time.sleep(args.bot_ramp)
+    limits = requests.get(args.url + "/limits", timeout=10).json()
+    report("bot loaded", *rest_phase(args.url, args.requests, args.concurrency))
+    stop.set()
+    print(f"bot group during the run: {limits.get('bot')}")
+    print(f"bot requests finished: {counts['done']}, rejected: {counts['rejected']}")
@@ -0,0 +1,351 @@
+# offline_env.py
+"""Local stand-ins for MongoDB and OpenAI, so the API server and the
+chatbot run without network access. Call ``install`` before importing any
+project module, from the project root:
+
+    import offline_env
+    offline_env.install(llm_latency=0.5)
+    from unified_api.unified_api_server import app
+
+- Every ``pymongo.MongoClient`` and mongoengine connection is one shared
+  mongomock client. ``StockInfoDB`` is seeded from ``data/*.csv`` the way
+  ingest_csv.py loads it (generated news rows when news_sentiment.csv is
+  missing), plus generated users, posts and comment threads for GraphQL.
+- ``ChatOpenAI`` and ``OpenAIEmbeddings`` are replaced by FakeChatModel and
+  FakeEmbeddings: a fixed latency per call (and per streamed token), and
+  outputs derived from a checksum of the input, so runs are repeatable.
+- The ``vectorstore`` resource is built in memory from
+  company_overview.csv with the fake embeddings.
+- The semantic cache, question log and embedding cache write to a
+  temporary directory instead of ./tmp.
+"""
+import asyncio
+import functools
+import os
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+DATA_DIR = "./data"
+PROJECT_PATHS = ["./stock_api", "./rag_demo", "."]
+# Generated GraphQL data
+FORUM_USERS = 50
+FORUM_POSTS = 500
+FORUM_COMMENTS_PER_POST = 8
+NEWS_PER_SYMBOL = 20
+
+WORDS = (
+    "revenue growth margin market cloud software platform customers segment "
+    "products services demand pricing outlook guidance quarter annual strong "
+    "steady expansion competition innovation portfolio operating efficiency"
+).split()
+
+_client = None
+
+
+def _estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model answering without a network call.
+
+    Accepts ChatOpenAI's constructor arguments. The classification prompts
+    of query_router get "n" and "general"; a pandas agent prompt gets a
+    "Final Answer:" line; anything else gets ``answer_words`` words picked
+    by a checksum of the prompt. Usage metadata is filled in so
+    ``get_openai_callback`` counts tokens and requests.
+    """
+
+    model_name: str = "gpt-4o-mini"
+    openai_api_key: Optional[str] = None
+    streaming: bool = False
+    stream_usage: bool = False
+    # Seconds before the first token, and between streamed tokens
+    latency: float = 0.0
+    token_latency: float = 0.0
+    answer_words: int = 60
+
+    @classmethod
+    def is_lc_serializable(cls):
+        # Callbacks see the constructor arguments (model_name), as with ChatOpenAI
+        return True
+
+    @property
+    def _llm_type(self):
+        return "fake-openai-chat"
+
+    @property
+    def _identifying_params(self):
+        return {"model_name": self.model_name}
+
+    def reply(self, messages):
+        prompt = "\n".join(str(message.content) for message in messages)
+        if prompt.rstrip().endswith("y/n:"):
+            return prompt, "n"
+        if "Classify the following question" in prompt:
+            return prompt, "general"
+        rng = np.random.default_rng(zlib.crc32(prompt.encode()))
+        text = " ".join(rng.choice(WORDS, self.answer_words)).capitalize() + "."
+        if "Final Answer:" in prompt:
+            text = f"Final Answer: {text}"
+        return prompt, text
+
+    def _usage(self, prompt, text):
+        input_tokens = _estimate_tokens(prompt)
+        output_tokens = _estimate_tokens(text)
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+
+    def _result(self, prompt, text):
+        message = AIMessage(
+            content=text,
+            usage_metadata=self._usage(prompt, text),
+            response_metadata={"model_name": self.model_name},
+        )
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={"model_name": self.model_name},
+        )
+
+    def _chunks(self, prompt, text):
+        tokens = text.split(" ")
+        for index, token in enumerate(tokens):
+            last = index == len(tokens) - 1
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content=token if last else token + " ",
+                    usage_metadata=self._usage(prompt, text) if last and self.stream_usage else None,
+                    response_metadata={"model_name": self.model_name} if last else {},
+                )
+            )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt, text = self.reply(messages)
+        time.sleep(self.latency + self.token_latency * len(text.split(" ")))
+        return self._result(prompt, text)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt, text = self.reply(messages)
+        await asyncio.sleep(self.latency + self.token_latency * len(text.split(" ")))
+        return self._result(prompt, text)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt, text = self.reply(messages)
+        time.sleep(self.latency)
+        for chunk in self._chunks(prompt, text):
+            time.sleep(self.token_latency)
+            if run_manager is not None:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt, text = self.reply(messages)
+        await asyncio.sleep(self.latency)
+        for chunk in self._chunks(prompt, text):
+            await asyncio.sleep(self.token_latency)
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+class FakeEmbeddings(Embeddings):
+    """Unit vectors seeded by a checksum of the text: equal texts get equal
+    vectors, different texts are unrelated. ``latency`` is paid once per
+    call, as with one batched API request."""
+
+    def __init__(self, dimension=1536, latency=0.0, **kwargs):
+        self.dimension = dimension
+        self.latency = latency
+
+    def _vector(self, text):
+        rng = np.random.default_rng(zlib.crc32(text.encode()))
+        vector = rng.standard_normal(self.dimension, dtype="float32")
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        time.sleep(self.latency)
+        return self._vector(text)
+
+    async def aembed_documents(self, texts):
+        await asyncio.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text):
+        await asyncio.sleep(self.latency)
+        return self._vector(text)
+
+
+def mongo_client(*args, **kwargs):
+    """The shared in-memory client, whatever URI or options are passed."""
+    global _client
+    if _client is None:
+        import mongomock
+
+        _client = mongomock.MongoClient()
+    return _client
+
+
+def synthetic_news(symbols, per_symbol=NEWS_PER_SYMBOL):
+    rng = np.random.default_rng(0)
+    start = datetime(2024, 1, 1, 12)
+    rows = []
+    for symbol in symbols:
+        for day in range(per_symbol):
+            score = round(float(rng.uniform(-1, 1)), 4)
+            rows.append(
+                {
+                    "ticket_number": symbol,
+                    "time_published": (start + timedelta(days=day)).strftime("%Y%m%dT%H%M%S"),
+                    "title": f"{symbol} news {day}",
+                    "url": f"https://example.com/{symbol}/{day}",
+                    "summary": " ".join(rng.choice(WORDS, 30)),
+                    "overall_sentiment_score": score,
+                    "overall_sentiment_label": "Bullish" if score > 0.15 else "Bearish" if score < -0.15 else "Neutral",
+                }
+            )
+    return rows
+
+
+def seed_stock_db(db, data_dir=DATA_DIR):
+    """Load the CSVs into ``db`` with ingest_csv's conversion and indexes."""
+    from ingest_csv import COLLECTIONS, chunked, ensure_indexes, read_rows
+
+    for name, spec in COLLECTIONS.items():
+        path = os.path.join(data_dir, spec["file"])
+        if os.path.exists(path):
+            # Later rows replace earlier ones with the same key, as with
+            # ingest_csv's upserts
+            rows = {tuple(row[f] for f in spec["key"]): row for row in read_rows(path, spec["key"])}
+            for chunk in chunked(rows.values(), 1000):
+                db[name].insert_many(chunk)
+        elif name == "news_sentiment":
+            symbols = db["company_overview"].distinct("Symbol")
+            db[name].insert_many(synthetic_news(symbols))
+    ensure_indexes(db)
+
+
+def seed_forum(db, users=FORUM_USERS, posts=FORUM_POSTS, comments_per_post=FORUM_COMMENTS_PER_POST):
+    """Users, posts and two-level comment threads in the GraphQL
+    collections. Returns the post ids, newest first."""
+    from bson import ObjectId
+
+    rng = np.random.default_rng(0)
+    people = [
+        {
+            "_id": ObjectId(),
+            "user_id": f"user{i}",
+            "email": f"user{i}@example.com",
+            "display_name": f"User {i}",
+            "password": "0" * 128,
+        }
+        for i in range(users)
+    ]
+    db["user"].insert_many(people)
+    start = datetime(2024, 1, 1)
+    post_documents = []
+    comment_documents = []
+    for i in range(posts):
+        poster = people[i % users]
+        post_id = ObjectId()
+        top_level = []
+        all_ids = []
+        for j in range(comments_per_post):
+            commenter = people[int(rng.integers(users))]
+            comment = {
+                "_id": ObjectId(),
+                "post_id": post_id,
+                "commenter_info": {"user_id": commenter["user_id"], "user_name": commenter["display_name"]},
+                "content": f"Comment {j} on post {i}",
+                "comment_ids": [],
+            }
+            # Every other comment replies to the one before it
+            if j % 2 and comment_documents:
+                comment_documents[-1]["comment_ids"].append(comment["_id"])
+            else:
+                top_level.append(comment["_id"])
+            all_ids.append(comment["_id"])
+            comment_documents.append(comment)
+        post_documents.append(
+            {
+                "_id": post_id,
+                "post_title": f"Post {i} about {WORDS[i % len(WORDS)]}",
+                "post_url": f"https://example.com/posts/{i}",
+                "post_date": start + timedelta(hours=i),
+                "poster_user_info": {"user_id": poster["user_id"], "user_name": poster["display_name"]},
+                "content": " ".join(rng.choice(WORDS, 40)),
+                "comment_ids": top_level,
+                "upvote": int(rng.integers(100)),
+                "downvote": int(rng.integers(20)),
+                "all_comment_ids": all_ids,
+            }
+        )
+    db["post"].insert_many(post_documents)
+    db["comment"].insert_many(comment_documents)
+    return [str(post["_id"]) for post in reversed(post_documents)]
+
+
+def build_vectorstore():
+    from langchain_community.vectorstores import FAISS
+    from resources import resources
+    from vector_store_generator import load_documents
+
+    documents = load_documents()
+    ids = list(documents)
+    return FAISS.from_texts(
+        [documents[i].page_content for i in ids],
+        resources.get("embeddings"),
+        metadatas=[documents[i].metadata for i in ids],
+        ids=ids,
+    )
+
+
+def install(llm_latency=0.0, token_latency=0.0, embedding_latency=0.0, seed=True):
+    """Patch Mongo and OpenAI and seed the database. Returns the
+    ``StockInfoDB`` database and the seeded post ids."""
+    for path in reversed(PROJECT_PATHS):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    scratch = tempfile.mkdtemp(prefix="offline-bench-")
+    os.environ.setdefault("RESOURCE_WARMUP", "0")
+    os.environ.setdefault("SEMANTIC_CACHE_PATH", os.path.join(scratch, "semantic_cache"))
+    os.environ.setdefault("QUESTION_LOG_PATH", os.path.join(scratch, "question_log.jsonl"))
+    os.environ.setdefault("EMBEDDING_CACHE_PATH", os.path.join(scratch, "embedding_cache.sqlite"))
+
+    import langchain_openai
+    import mongoengine
+    import pymongo
+
+    pymongo.MongoClient = mongo_client
+    mongoengine.connect = functools.partial(mongoengine.connect, mongo_client_class=mongo_client)
+    langchain_openai.ChatOpenAI = functools.partial(
+        FakeChatModel, latency=llm_latency, token_latency=token_latency
+    )
+    langchain_openai.OpenAIEmbeddings = functools.partial(FakeEmbeddings, latency=embedding_latency)
+
+    from company_info_query_engine import resources
+
+    resources.register("vectorstore", build_vectorstore, warm=False)
+
+    db = mongo_client()["StockInfoDB"]
+    post_ids = []
+    if seed:
+        seed_stock_db(db)
+        post_ids = seed_forum(db)
+    return db, post_ids
@@ -0,0 +1,259 @@
+# run_offline_suite.py
+"""Offline benchmark suite: serialization, every REST route, the GraphQL
+resolvers, company retrieval and question routing, then a concurrent load
+phase, all against mongomock and fake OpenAI models (see offline_env.py).
+Run from the project root:
+
+    python benchmarks/run_offline_suite.py --save
+    python benchmarks/run_offline_suite.py --compare benchmarks/results/<baseline>.json
+
+``--save`` writes the results to benchmarks/results/ (or the given path);
+``--compare`` checks them against an earlier file. The exit status is 1
+when a benchmark raised, a load phase request failed (an HTTP 5xx or a
+JSON body with an ``error`` key) or, with ``--compare``, on a regression. The fake LLM answers immediately unless ``--llm-latency``
+(seconds per call) is set, so microbenchmarks measure this project's code;
+use a realistic latency for the load phase. ``--url`` sends the load phase
+to a running server instead of the in-process Flask app, e.g. the ASGI
+server started against real services.
+
+Mongo times are mongomock's (pure Python, far slower than a server), so
+compare runs with each other rather than with production latencies.
+"""
+import argparse
+import sys
+import threading
+
+import offline_env
+from harness import (DEFAULT_TOLERANCE, Benchmark, compare, load_results, report_load,
+                     run_load, save_results)
+
+GROUPS = ["serialization", "rest", "graphql", "retrieval", "router", "load"]
+
+REST_PATHS = [
+    "/api/company_overview?symbol=ADBE",
+    "/api/company_overview?sort_field=MarketCapitalization&sort_order=desc&limit=20",
+    "/api/cash_flow?symbol=MSFT",
+    "/api/quarterly_earnings?symbol=NVDA",
+    "/api/stock_weekly_data?symbol=AAPL&limit=52",
+    "/api/stock_weekly_data?symbol=AAPL&start=2020-01-01",
+    "/api/news_sentiment?symbol=ADBE",
+    "/api/bulk/company_overview?symbols=AAPL,MSFT,NVDA,ADBE,GOOGL",
+    "/api/bulk/cash_flow?symbols=AAPL,MSFT,NVDA,ADBE,GOOGL",
+    "/api/bulk/quarterly_earnings?symbols=AAPL,MSFT,NVDA,ADBE,GOOGL",
+    "/api/bulk/stock_weekly_data?symbols=AAPL,MSFT,NVDA,ADBE,GOOGL",
+    "/api/bulk/stock_weekly_data?symbols=AAPL,MSFT,NVDA,ADBE,GOOGL&format=matrix",
+    "/api/indicators?symbols=AAPL,MSFT&names=sma,rsi",
+]
+GRAPHQL_QUERIES = {
+    "posts": "{ posts(first: 20) { postTitle posterUserInfo { userName } upvote } }",
+    "postsConnection": (
+        "{ postsConnection(first: 20) { edges { cursor node { postTitle } } pageInfo { hasNextPage } } }"
+    ),
+    "post+comments": '{ post(id: "%(post)s") { postTitle comments { content comments { content } } } }',
+    "commentTree": '{ commentTree(postId: "%(post)s") { totalCount nodes { depth comment { content } } } }',
+    "postsByUser": '{ postsByUser(userId: "user1", first: 10) { postTitle allComments { content } } }',
+    "users": "{ users { userId displayName } }",
+    "isUserRegistered": '{ isUserRegistered(email: "user1@example.com") }',
+}
+RETRIEVAL_QUESTIONS = [
+    "What does ADBE do?",
+    "Which companies compete with Facebook in social media?",
+    "Which companies make semiconductor equipment?",
+    "Tell me about life sciences companies working on vaccines",
+]
+ROUTER_QUESTIONS = [
+    ("general, named company", "What are Adobe's flagship products?"),
+    ("general, open", "Which companies offer cloud security software?"),
+    ("analytical, template", "What is the average stock price for Apple in 2023?"),
+    ("analytical, agent", "What was Microsoft's operating cash flow last quarter?"),
+]
+BOT_QUESTIONS = [question for _, question in ROUTER_QUESTIONS]
+
+
+def ok(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response
+
+
+def succeeded(status, body):
+    # /bot answers 200 with {"error": ...} when answering fails
+    return status < 500 and not (isinstance(body, dict) and "error" in body)
+
+
+def failures(results):
+    """Names of the benchmarks that raised or had failed requests."""
+    return sorted(
+        name for name, result in results.items() if "error" in result or result.get("errors")
+    )
+
+
+def bench_serialization(bench):
+    from bench_serialization import legacy_process_data, load_documents
+    import mongo_json
+
+    for name in ("company_overview", "stock_weekly_data"):
+        documents = load_documents(f"./data/{name}.csv")[:500]
+        bench.run(f"serialize/{name} process_data+jsonify (500)", legacy_process_data, documents,
+                  group="serialization")
+        bench.run(f"serialize/{name} mongo_json.dumps (500)", mongo_json.dumps, documents,
+                  group="serialization")
+
+
+def bench_rest(bench, client):
+    from response_cache import response_cache
+
+    for path in REST_PATHS:
+        bench.run(f"rest{path}", lambda p=path: ok(client.get(p)), setup=response_cache.clear,
+                  group="rest")
+    path = REST_PATHS[4]
+    ok(client.get(path))
+    bench.run(f"rest{path} (cached)", lambda: ok(client.get(path)), group="rest")
+
+
+def bench_graphql(bench, client, post_ids):
+    for name, query in GRAPHQL_QUERIES.items():
+        query = query % {"post": post_ids[0]} if "%(post)s" in query else query
+
+        def execute(query=query):
+            body = ok(client.post("/graphql", json={"query": query})).get_json()
+            if body.get("errors"):
+                raise RuntimeError(body["errors"][0].get("message"))
+
+        bench.run(f"graphql/{name}", execute, group="graphql")
+
+
+def bench_retrieval(bench):
+    from company_info_query_engine import retrieve_context
+    from resources import resources
+
+    vectorstore = resources.get("vectorstore")
+    retriever = resources.get("retriever")
+    for question in RETRIEVAL_QUESTIONS:
+        bench.run(f"retrieval/faiss top-3: {question}", vectorstore.similarity_search, question, 3,
+                  group="retrieval")
+        bench.run(f"retrieval/hybrid: {question}", retriever.retrieve, question, group="retrieval")
+        bench.run(f"retrieval/context: {question}", retrieve_context, question, group="retrieval")
+
+
+def bench_router(bench):
+    from rag_demo.query_router import answer_query, classify_question, route_query
+
+    for kind, question in ROUTER_QUESTIONS:
+        bench.run(f"router/classify ({kind}): {question}", classify_question, question,
+                  group="router")
+        bench.run(f"router/route_query ({kind}): {question}", route_query, question,
+                  group="router")
+    # The untimed first call stores the answer, so every timed call is a hit
+    question = ROUTER_QUESTIONS[0][1]
+    bench.run(f"router/answer_query (cache hit): {question}", answer_query, question,
+              group="router")
+
+
+def load_phase(args, app, results):
+    paths = REST_PATHS[:7]
+    if args.url:
+        import requests
+
+        local = threading.local()
+
+        def session():
+            if not hasattr(local, "session"):
+                local.session = requests.Session()
+            return local.session
+
+        def check(response):
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+            return succeeded(response.status_code, body)
+
+        def get(path):
+            return check(session().get(args.url + path, timeout=60))
+
+        def post(path, body):
+            return check(session().post(args.url + path, json=body, timeout=300))
+    else:
+
+        def check(response):
+            return succeeded(response.status_code, response.get_json(silent=True))
+
+        def get(path):
+            return check(app.test_client().get(path))
+
+        def post(path, body):
+            return check(app.test_client().post(path, json=body))
+
+    def rest(i):
+        return get(paths[i % len(paths)])
+
+    def mixed(i):
+        # One chatbot question per ``--bot-every`` requests
+        if i % args.bot_every == 0:
+            return post("/bot", {"query": BOT_QUESTIONS[(i // args.bot_every) % len(BOT_QUESTIONS)]})
+        return rest(i)
+
+    for name, function in (("load/rest", rest), ("load/rest+bot", mixed)):
+        result = run_load(function, args.load_requests, args.concurrency)
+        results[name] = dict(result, group="load")
+        report_load(name, result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=GROUPS)
+    parser.add_argument("--min-time", type=float, default=0.5,
+                        help="seconds to spend timing each microbenchmark")
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--token-latency", type=float, default=0.0,
+                        help="seconds per generated token")
+    parser.add_argument("--embedding-latency", type=float, default=0.0)
+    parser.add_argument("--load-requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--bot-every", type=int, default=10)
+    parser.add_argument("--url", help="run the load phase against this server")
+    parser.add_argument("--save", nargs="?", const="", help="write results (optionally to PATH)")
+    parser.add_argument("--compare", metavar="BASELINE")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--verbose", action="store_true", help="show the modules' own output")
+    args = parser.parse_args()
+
+    _, post_ids = offline_env.install(args.llm_latency, args.token_latency, args.embedding_latency)
+    from unified_api.unified_api_server import app
+
+    client = app.test_client()
+    bench = Benchmark(min_time=args.min_time, quiet=not args.verbose)
+    if "serialization" in args.only:
+        bench_serialization(bench)
+    if "rest" in args.only:
+        bench_rest(bench, client)
+    if "graphql" in args.only:
+        bench_graphql(bench, client, post_ids)
+    if "retrieval" in args.only:
+        bench_retrieval(bench)
+    if "router" in args.only:
+        bench_router(bench)
+    results = dict(bench.results)
+    if "load" in args.only:
+        load_phase(args, app, results)
+
+    settings = {
+        name: getattr(args, name)
+        for name in ("min_time", "llm_latency", "token_latency", "embedding_latency",
+                     "load_requests", "concurrency", "bot_every", "url")
+    }
+    if args.save is not None:
+        print(f"Results written to {save_results(results, args.save, settings)}")
+    failed = failures(results)
+    if failed:
+        print(f"{len(failed)} benchmark(s) failed: {', '.join(failed)}")
+    regressions = []
+    if args.compare:
+        regressions = compare(load_results(args.compare), {"benchmarks": results}, args.tolerance)
+        print(f"{len(regressions)} regression(s)")
+    sys.exit(1 if failed or regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+# analytical_templates.py
+import re
+import threading
+import time
+
+import pandas as pd
+from tracing_hooks import traced
+
+# (pattern, frame, column, label). A generic word ("price", "EPS") matched
+# only inside a more specific phrase ("opening price", "EPS surprise")
+# belongs to that phrase's metric.
+METRICS = [
+    (r"estimated eps|eps estimate", "earnings", "estimatedEPS", "estimated EPS"),
+    (r"((eps|earnings) )?surprise", "earnings", "surprisePercentage",
+     "earnings surprise (%)"),
+    (r"\beps\b|earnings per share", "earnings", "reportedEPS", "reported EPS"),
+    (r"operating cash ?flow|cash ?flow", "cash_flow", "operatingCashflow",
+     "operating cash flow"),
+    (r"capital expenditures?|\bcapex\b", "cash_flow", "capitalExpenditures",
+     "capital expenditures"),
+    (r"net income", "cash_flow", "netIncome", "net income"),
+    (r"dividends? pa(id|yout)", "cash_flow", "dividendPayout", "dividend payout"),
+    (r"(trading )?volume", "weekly", "volume", "weekly trading volume"),
+    (r"open(ing)? price", "weekly", "open", "opening price"),
+    (r"clos(e|ing)( stock)? price|stock price|share price|\bprices?\b",
+     "weekly", "close", "closing price"),
+]
+
+WEEKLY_COLUMNS = {
+    "1. open": "open",
+    "2. high": "high",
+    "3. low": "low",
+    "4. close": "close",
+    "5. volume": "volume",
+}
+DATE_COLUMNS = {"weekly": "date", "earnings": "fiscalDateEnding", "cash_flow": "fiscalDateEnding"}
+
+AGGREGATIONS = [
+    (r"\b(average|mean|avg)\b", "mean", "average"),
+    (r"\bmedian\b", "median", "median"),
+    (r"\b(total|sum)\b", "sum", "total"),
+    (r"\b(standard deviation|std)\b", "std", "standard deviation of the"),
+    (r"\b(highest|maximum|max|peak|largest|biggest)\b", "max", "highest"),
+    (r"\b(lowest|minimum|min|smallest)\b", "min", "lowest"),
+]
+
+# Questions these templates cannot answer faithfully go to the agent.
+UNSUPPORTED = re.compile(
+    r"\b(month\w*|quarter\w*|week of|correlat\w*|predict\w*|forecast\w*|why|"
+    r"trend\w*|growth|grow|change[sd]?|percent(age)? change|ratio|return\w*|"
+    r"compare[sd]?|comparison|difference|news|sentiment|after|before)\b"
+)
+# Months, quarters and halves: the templates filter by whole years only.
+# Abbreviations (and "may") need a day or year after them, so the MAR
+# ticker and the verb do not count.
+SUB_YEAR_PERIOD = re.compile(
+    r"\b(january|february|march|april|june|july|august|september|october|"
+    r"november|december|q[1-4]|h[12]|half|halves|semester)\b|"
+    r"\b(jan|feb|mar|apr|may|jun|jul|aug|sept?|oct|nov|dec)\.?\s+(\d{1,2}|(19|20)\d{2})\b"
+)
+# Conditions and comparisons a single aggregate would silently drop
+CONDITIONS = re.compile(
+    r"\b(when(ever)?|while|where|if|above|below|under|than|exceed\w*|vs|versus|against)\b"
+)
+# Periods relative to today, which the year filter cannot express
+RELATIVE_PERIOD = re.compile(
+    r"\b(last|past|previous|prior|recent\w*|latest|current|this year|ytd|"
+    r"year[- ]to[- ]date|so far|to date|decades?|\d+ years?)\b"
+)
+# Period words that need a year to mean anything
+PERIOD_WORDS = re.compile(r"\b(since|from|starting|until|till|through|during|up to)\b")
+YEAR_BY_YEAR = re.compile(
+    r"\b(by|per|each|every|across|over the) years?\b|year[- ]by[- ]year|"
+    r"\byearly\b|\bannual(ly)?\b|\bdistribution\b"
+)
+TOP_N = re.compile(r"\btop\s+(\d+)\b|\bbottom\s+(\d+)\b")
+WHICH = re.compile(r"\bwhich (company|companies|stock|stocks|ticker|symbol)\b")
+YEAR = re.compile(r"\b((?:19|20)\d{2})\b")
+
+NAME_SUFFIXES = re.compile(
+    r"\b(inc|incorporated|corp|corporation|co|company|ltd|plc|holdings?|"
+    r"group|class [a-c]|the)\b\.?",
+)
+# First words of company names too common to stand for the company alone
+GENERIC_NAME_WORDS = {
+    "american", "advanced", "applied", "analog", "automatic", "baker",
+    "booking", "cadence", "charter", "constellation", "dollar", "electronic",
+    "intuitive", "monster", "texas", "trade", "vertex",
+}
+# Well-known names that differ from the listed company name
+EXTRA_ALIASES = {"google": "GOOGL", "facebook": "META", "amd": "AMD"}
+# Tickers that are also everyday words when capitalized
+AMBIGUOUS_TICKERS = {"A", "I", "ON", "ALL", "IT", "ARE", "NOW", "FOR"}
+
+
+def source_columns(frame_name):
+    """The columns of a frame's source data the templates read, so callers
+    can load only those."""
+    original = {v: k for k, v in WEEKLY_COLUMNS.items()} if frame_name == "weekly" else {}
+    metrics = {original.get(column, column) for _, frame, column, _ in METRICS if frame == frame_name}
+    return ["symbol", DATE_COLUMNS[frame_name], *sorted(metrics)]
+
+
+def company_aliases(companies):
+    """Lower-case company name aliases -> symbol, from company_overview
+    ``Symbol``/``Name`` pairs ("apple inc" -> "apple")."""
+    aliases = {}
+    symbols = set()
+    for symbol, name in companies:
+        symbols.add(symbol)
+        cleaned = str(name).lower().replace(",", " ").replace(".com", "")
+        cleaned = NAME_SUFFIXES.sub(" ", cleaned)
+        words = cleaned.split()
+        if not words:
+            continue
+        aliases.setdefault(" ".join(words), symbol)
+        if len(words[0]) >= 4 and words[0] not in GENERIC_NAME_WORDS:
+            aliases.setdefault(words[0], symbol)
+    for alias, symbol in EXTRA_ALIASES.items():
+        if symbol in symbols:
+            aliases.setdefault(alias, symbol)
+    return aliases
+
+
+def _years(text):
+    """The years a question is about: ``None`` for all of them, a range, or
+    a single-year list. Raises ValueError for periods it cannot express."""
+    years = sorted(set(int(y) for y in YEAR.findall(text)))
+    if RELATIVE_PERIOD.search(text):
+        raise ValueError("relative period")
+    if not years:
+        if PERIOD_WORDS.search(text):
+            raise ValueError("period without a year")
+        return None
+    if re.search(r"\b(between|from)\b.*\b(and|to|through|-)\b", text) and len(years) == 2:
+        return range(years[0], years[1] + 1)
+    if len(years) == 1 and re.search(r"\b(since|from|starting)\b", text):
+        return range(years[0], 3000)
+    if len(years) > 1 or PERIOD_WORDS.search(text):
+        # "2022 and 2023" asks for each year, "until 2022" has no start
+        raise ValueError("unsupported period")
+    return years
+
+
+def _strictly_inside(span, other):
+    return other[0] <= span[0] and span[1] <= other[1] and span != other
+
+
+def _format(value, column):
+    if pd.isna(value):
+        return "n/a"
+    if column in ("volume",) or abs(value) >= 1e5:
+        return f"{value:,.0f}"
+    return f"{value:,.2f}"
+
+
+class AnalyticalTemplates:
+    """Answers common analytical questions directly with pandas.
+
+    Recognized shapes: an aggregate of a metric for named companies over an
+    optional period, top-N companies by a metric, and year-by-year
+    distributions. ``answer`` returns ``None`` for anything else so the
+    caller can fall back to the LLM agent.
+    """
+
+    def __init__(self, weekly, earnings, cash_flow, companies):
+        self.frames = {
+            "weekly": self._prepare(weekly.rename(columns=WEEKLY_COLUMNS), DATE_COLUMNS["weekly"]),
+            "earnings": self._prepare(earnings, DATE_COLUMNS["earnings"]),
+            "cash_flow": self._prepare(cash_flow, DATE_COLUMNS["cash_flow"]),
+        }
+        companies = list(companies)
+        self.names = {symbol: name for symbol, name in companies}
+        self.symbols = set(self.names)
+        self.aliases = company_aliases(companies)
+        self._alias_pattern = re.compile(
+            r"\b("
+            + "|".join(re.escape(a) for a in sorted(self.aliases, key=len, reverse=True))
+            + r")\b"
+        )
+        self.matched = 0
+        self.fallback = 0
+        self.fast_path_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _prepare(frame, date_column):
+        frame = frame.copy()
+        for column in frame.columns:
+            if column not in ("symbol", date_column) and frame[column].dtype == object:
+                converted = pd.to_numeric(frame[column], errors="coerce")
+                if converted.notna().any():
+                    frame[column] = converted
+        dates = frame[date_column]
+        # Already datetime64 when loaded from the columnar files
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates)
+        frame["year"] = dates.dt.year
+        return frame
+
+    def _symbols(self, query, text):
+        found = []
+        for token in re.findall(r"\b[A-Z]{1,5}\b", query):
+            if token in self.symbols and token not in AMBIGUOUS_TICKERS:
+                found.append(token)
+        for alias in self._alias_pattern.findall(text):
+            found.append(self.aliases[alias])
+        return list(dict.fromkeys(found))
+
+    def _label(self, symbol):
+        return f"{self.names.get(symbol, symbol)} [{symbol}]"
+
+    def parse(self, query):
+        """Structured form of ``query`` or ``None`` when no template fits."""
+        text = query.lower()
+        if UNSUPPORTED.search(text) or SUB_YEAR_PERIOD.search(text) or CONDITIONS.search(text):
+            return None
+        matches = [
+            ((f, c, l), [m.span() for m in re.finditer(p, text)]) for p, f, c, l in METRICS
+        ]
+        spans = [span for _, metric_spans in matches for span in metric_spans]
+        metrics = [
+            metric
+            for metric, metric_spans in matches
+            if metric_spans
+            and not all(any(_strictly_inside(s, o) for o in spans) for s in metric_spans)
+        ]
+        # More than one metric left means a multi-metric question
+        if len(metrics) != 1:
+            return None
+        metric = metrics[0]
+        try:
+            years = _years(text)
+        except ValueError:
+            return None
+        aggregations = list(
+            dict((fn, word) for p, fn, word in AGGREGATIONS if re.search(p, text)).items()
+        )
+        symbols = self._symbols(query, text)
+        top = TOP_N.search(text)
+        which = WHICH.search(text)
+        parsed = {
+            "metric": metric,
+            "symbols": symbols,
+            "years": years,
+            "by_year": bool(YEAR_BY_YEAR.search(text)),
+        }
+        if top or (which and not symbols):
+            extreme = [a for a in aggregations if a[0] in ("max", "min")]
+            other = [a for a in aggregations if a[0] not in ("max", "min")]
+            # One ranking direction, optionally over one aggregate
+            if len(extreme) > 1 or len(other) > 1:
+                return None
+            ascending = bool(re.search(r"\b(lowest|least|smallest|bottom|min\w*)\b", text))
+            parsed["kind"] = "top"
+            parsed["n"] = int(next(g for g in top.groups() if g)) if top else 1
+            parsed["ascending"] = ascending
+            parsed["aggregation"] = (other or extreme or [("mean", "average")])[0]
+            return parsed
+        if not symbols or len(aggregations) > 1:
+            return None
+        if parsed["by_year"]:
+            parsed["kind"] = "by_year"
+            parsed["aggregation"] = (aggregations or [("mean", "average")])[0]
+            return parsed
+        if not aggregations:
+            return None
+        parsed["kind"] = "aggregate"
+        parsed["aggregation"] = aggregations[0]
+        return parsed
+
+    def _rows(self, parsed, all_symbols=False):
+        frame_name, column, _ = parsed["metric"]
+        frame = self.frames[frame_name]
+        if not all_symbols:
+            frame = frame[frame["symbol"].isin(parsed["symbols"])]
+        if parsed["years"] is not None:
+            frame = frame[frame["year"].isin(list(parsed["years"]))]
+        return frame, column
+
+    def _period(self, parsed):
+        years = parsed["years"]
+        if years is None:
+            return ""
+        if isinstance(years, range):
+            last = min(years.stop - 1, int(self.frames["weekly"]["year"].max()))
+            return f" from {years.start} to {last}"
+        return " in " + " and ".join(str(y) for y in years)
+
+    def execute(self, parsed):
+        frame, column = self._rows(parsed, all_symbols=parsed["kind"] == "top")
+        if frame.empty:
+            return None
+        fn, word = parsed["aggregation"]
+        label = parsed["metric"][2]
+        period = self._period(parsed)
+        if parsed["kind"] == "aggregate":
+            values = frame.groupby("symbol", observed=True)[column].agg(fn)
+            parts = [
+                f"{_format(values.get(s), column)} for {self._label(s)}"
+                for s in parsed["symbols"]
+                if s in values
+            ]
+            return f"The {word} {label}{period} was " + ", and ".join(parts) + "."
+        if parsed["kind"] == "top":
+            values = frame.groupby("symbol", observed=True)[column].agg(fn).dropna()
+            ranked = values.sort_values(ascending=parsed["ascending"]).head(parsed["n"])
+            order = "lowest" if parsed["ascending"] else "highest"
+            if fn not in ("max", "min"):
+                order = f"{order} {word}"
+            lines = [
+                f"{rank}. {self._label(s)}: {_format(v, column)}"
+                for rank, (s, v) in enumerate(ranked.items(), start=1)
+            ]
+            return (
+                f"Companies with the {order} {label}{period}:\n"
+                + "\n".join(lines)
+            )
+        table = frame.groupby(["symbol", "year"], observed=True)[column].agg(fn)
+        overall = frame.groupby("symbol", observed=True)[column].agg(fn)
+        sections = []
+        for symbol in parsed["symbols"]:
+            if symbol not in overall:
+                continue
+            years = table.loc[symbol]
+            lines = [f"  {year}: {_format(v, column)}" for year, v in years.items()]
+            sections.append(
+                f"{self._label(symbol)}: {word} {label}{period} "
+                f"{_format(overall[symbol], column)}, by year:\n" + "\n".join(lines)
+            )
+        return "\n".join(sections) or None
+
+    @traced("analytical_templates")
+    def answer(self, query):
+        start = time.perf_counter()
+        parsed = self.parse(query)
+        response = self.execute(parsed) if parsed else None
+        with self._lock:
+            if response is None:
+                self.fallback += 1
+            else:
+                self.matched += 1
+                self.fast_path_seconds += time.perf_counter() - start
+        return response
+
+    def stats(self):
+        with self._lock:
+            total = self.matched + self.fallback
+            return {
+                "matched": self.matched,
+                "fallback": self.fallback,
+                "match_rate": self.matched / total if total else 0.0,
+                "avg_fast_path_ms": (
+                    1000 * self.fast_path_seconds / self.matched if self.matched else 0.0
+                ),
+            }
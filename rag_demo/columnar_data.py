@@ -0,0 +1,166 @@
+# columnar_data.py
+"""Typed, symbol-partitioned columnar copies of the analysis CSVs.
+
+    python rag_demo/columnar_data.py
+
+``pd.read_csv`` re-parses every CSV on each start and leaves symbols,
+dates and other text as one Python string per cell. The conversion reads
+them once with "None" as missing (pandas before 2.0 kept those numeric
+columns as object), dates as datetime64 and low-cardinality text
+(``symbol``, currency, report time) as categorical. Each table is sorted
+by symbol and written as one uncompressed Arrow IPC (Feather v2) file,
+with the row range of every symbol in the file's metadata.
+
+``load_frame`` memory-maps that file: only the requested columns are
+materialized, a symbol subset is a slice of the mapped buffers, and
+nothing is parsed. Without a converted file (or with a CSV newer than it)
+it reads the CSV with the same types instead.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections.abc import Mapping
+
+import pandas as pd
+
+DATA_DIR = os.environ.get("ANALYSIS_DATA_DIR", "./data")
+COLUMNAR_DIR = os.environ.get("COLUMNAR_DATA_DIR", "./data/columnar")
+
+# dataset -> (symbol column, {date column: format})
+DATASETS = {
+    "stock_weekly_data": ("symbol", {"date": "%Y-%m-%d"}),
+    "news_sentiment": ("ticket_number", {"time_published": "%Y%m%dT%H%M%S"}),
+    "quarterly_earnings": ("symbol", {"fiscalDateEnding": "%Y-%m-%d", "reportedDate": "%Y-%m-%d"}),
+    "cash_flow": ("symbol", {"fiscalDateEnding": "%Y-%m-%d"}),
+}
+# Text columns with at most this share of distinct values become categorical
+CATEGORY_MAX_RATIO = 0.5
+SYMBOL_ROWS_KEY = b"symbol_rows"
+
+
+def csv_path(name):
+    return os.path.join(DATA_DIR, f"{name}.csv")
+
+
+def columnar_path(name):
+    return os.path.join(COLUMNAR_DIR, f"{name}.arrow")
+
+
+def read_typed_csv(name, columns=None):
+    symbol_column, dates = DATASETS[name]
+    frame = pd.read_csv(csv_path(name), usecols=columns, na_values=["None"])
+    for column, date_format in dates.items():
+        if column in frame:
+            frame[column] = pd.to_datetime(frame[column], format=date_format, errors="coerce")
+    for column in frame.columns:
+        values = frame[column]
+        if pd.api.types.is_string_dtype(values) and not isinstance(values.dtype, pd.CategoricalDtype):
+            if column == symbol_column or values.nunique() <= CATEGORY_MAX_RATIO * len(values):
+                frame[column] = values.astype("category")
+    return frame
+
+
+def convert(name):
+    """Write the typed, symbol-sorted Arrow file for one dataset."""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    symbol_column, _ = DATASETS[name]
+    frame = read_typed_csv(name)
+    frame = frame.sort_values(symbol_column, kind="stable").reset_index(drop=True)
+    symbols = frame[symbol_column].astype(str)
+    starts = symbols.ne(symbols.shift()).to_numpy().nonzero()[0].tolist()
+    ends = starts[1:] + [len(frame)]
+    symbol_rows = {symbols[start]: [start, end - start] for start, end in zip(starts, ends)}
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[SYMBOL_ROWS_KEY] = json.dumps(symbol_rows).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    path = columnar_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # One record batch, so whole-column reads are single contiguous buffers
+    feather.write_feather(
+        table, path + ".tmp", compression="uncompressed", chunksize=max(len(table), 1)
+    )
+    os.replace(path + ".tmp", path)
+    return path, len(frame), len(symbol_rows)
+
+
+def _columnar_current(name):
+    path = columnar_path(name)
+    if not os.path.exists(path):
+        return False
+    if os.path.exists(csv_path(name)) and os.path.getmtime(csv_path(name)) > os.path.getmtime(path):
+        print(f"{csv_path(name)} is newer than {path}, reading the CSV; re-run columnar_data.py")
+        return False
+    return True
+
+
+def load_frame(name, columns=None, symbols=None):
+    """One dataset as a DataFrame, optionally limited to ``columns`` and to
+    the rows of ``symbols``."""
+    symbol_column, _ = DATASETS[name]
+    if not _columnar_current(name):
+        frame = read_typed_csv(name, columns)
+        if symbols is not None:
+            frame = frame[frame[symbol_column].isin(symbols)].reset_index(drop=True)
+        return frame
+
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    table = feather.read_table(columnar_path(name), columns=columns, memory_map=True)
+    if symbols is not None:
+        symbol_rows = json.loads(table.schema.metadata[SYMBOL_ROWS_KEY])
+        parts = [table.slice(*symbol_rows[s]) for s in symbols if s in symbol_rows]
+        table = pa.concat_tables(parts) if parts else table.slice(0, 0)
+    # split_blocks keeps null-free numeric columns as views of the mapping
+    return table.to_pandas(split_blocks=True)
+
+
+class LazyFrames(Mapping):
+    """Dataset name -> DataFrame; each frame is loaded on first access."""
+
+    def __init__(self, names=DATASETS):
+        self.names = list(names)
+        self._frames = {}
+        self._lock = threading.Lock()
+        self.timings = {}
+
+    def __getitem__(self, name):
+        if name not in self.names:
+            raise KeyError(name)
+        if name not in self._frames:
+            with self._lock:
+                if name not in self._frames:
+                    start = time.perf_counter()
+                    self._frames[name] = load_frame(name)
+                    self.timings[name] = time.perf_counter() - start
+        return self._frames[name]
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("datasets", nargs="*", default=list(DATASETS))
+    args = parser.parse_args()
+    for name in args.datasets:
+        if not os.path.exists(csv_path(name)):
+            print(f"Skipping {name}: {csv_path(name)} not found")
+            continue
+        start = time.perf_counter()
+        path, rows, symbols = convert(name)
+        print(f"{name}: {rows} rows, {symbols} symbols -> {path} ({time.perf_counter() - start:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
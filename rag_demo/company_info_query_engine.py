@@ -1,29 +1,6 @@
 # company_info_query_engine.py
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
-from langchain.schema.runnable import RunnablePassthrough
-from langchain.schema import StrOutputParser
-from config_utils import load_openai_key
-
-# Initialize the embeddings model (required for deserialization)
-OPENAI_KEY = load_openai_key()
-embeddings_model = OpenAIEmbeddings(openai_api_key=OPENAI_KEY)
-
-# Load the serialized vector store from the file
-with open('./tmp/faiss_vectorstore.pkl', 'rb') as f:
-    vectorstore_bytes = f.read()
-
-# Deserialize the vector store from bytes
-vectorstore = FAISS.deserialize_from_bytes(
-    embeddings=embeddings_model, 
-    serialized=vectorstore_bytes, 
-    allow_dangerous_deserialization=True
-)
-
-# Initialize the LLMChain with the prompt and OpenAI model
-llm = ChatOpenAI(model_name="gpt-4o-mini", openai_api_key=OPENAI_KEY)
+from resources import chat_model, resources
+from tracing_hooks import span, traced
 
 # Define a prompt template for generating an answer
 template = """
@@ -36,23 +13,87 @@ Context: {context}
 User's question: {question}
 
 Your conversational Answer:"""
-prompt = PromptTemplate.from_template(template)
 
-chain = (
-    {"context": RunnablePassthrough(), "question": RunnablePassthrough()}
-    | prompt
-    | llm
-    | StrOutputParser()
-)
+@resources.resource("vectorstore")
+def load_vectorstore():
+    from faiss_store import STORE_DIR, load_store
+
+    # Memory-map the vector store written by vector_store_generator.py; worker
+    # processes share the index and document pages through the OS cache
+    vectorstore = load_store(resources.get("embeddings"), STORE_DIR)
+    if vectorstore is None:
+        raise RuntimeError(f"No vector store in {STORE_DIR}, run rag_demo/vector_store_generator.py")
+    return vectorstore
+
+@resources.resource("retriever")
+def build_retriever():
+    from hybrid_retriever import HybridRetriever
+
+    return HybridRetriever(resources.get("vectorstore"))
+
+@resources.resource("context_builder")
+def build_context_builder():
+    from context_builder import ContextBuilder
+
+    return ContextBuilder()
+
+@resources.resource("general_chain")
+def build_chain():
+    from langchain.prompts import PromptTemplate
+    from langchain.schema import StrOutputParser
+
+    prompt = PromptTemplate.from_template(template)
+    # Takes the {"question", "context"} dict of retrieve_context as is
+    return prompt | chat_model("gpt-4o-mini") | StrOutputParser()
+
+def retrieve_context(query):
+    """The general chain's input: the question and its best matching
+    company documents (keyword and vector search, see hybrid_retriever),
+    cut down to the fields the question needs (see context_builder)."""
+    results = resources.get("retriever").retrieve(query)
+    context = resources.get("context_builder").build(query, results)
+    return {"question": query, "context": context}
+
+async def aretrieve_context(query):
+    retriever = await resources.aget("retriever")
+    results = await retriever.aretrieve(query)
+    context_builder = await resources.aget("context_builder")
+    return {"question": query, "context": context_builder.build(query, results)}
+
+@traced("general_chain")
+def answer_with_context(inputs):
+    return resources.get("general_chain").invoke(inputs)
+
+@traced("general_chain")
+async def aanswer_with_context(inputs):
+    chain = await resources.aget("general_chain")
+    return await chain.ainvoke(inputs)
+
+def stream_answer_with_context(inputs):
+    """Answer chunks as the LLM produces them."""
+    with span("general_chain"):
+        yield from resources.get("general_chain").stream(inputs)
+
+async def astream_answer_with_context(inputs):
+    chain = await resources.aget("general_chain")
+    with span("general_chain"):
+        async for chunk in chain.astream(inputs):
+            yield chunk
 
 def run_general_query(query):
-    # Perform a similarity search
-    results = vectorstore.similarity_search(query)
-    # Extract the content of the top results
-    top_results_content = " ".join([result.page_content for result in results[:3]])
-    response = chain.invoke({"question": query, "context": top_results_content})
+    response = answer_with_context(retrieve_context(query))
     return response
 
+async def arun_general_query(query):
+    return await aanswer_with_context(await aretrieve_context(query))
+
+def stream_general_query(query):
+    yield from stream_answer_with_context(retrieve_context(query))
+
+async def astream_general_query(query):
+    async for chunk in astream_answer_with_context(await aretrieve_context(query)):
+        yield chunk
+
 if __name__ == "__main__":
     # Perform a similarity search
     query = "What companies have a comparable business model, offering both software products and cloud-based services?"
@@ -1,8 +1,15 @@
 # config_utils.py
+from functools import lru_cache
+
 import yaml
 
 
-def load_openai_key(filepath="./secret.yml"):
+@lru_cache(maxsize=None)
+def load_config(filepath="./secret.yml"):
+    """secret.yml contents, read once per process and path."""
     with open(filepath, "r") as file:
-        config = yaml.safe_load(file)
-    return config["OPENAI_KEY"]
+        return yaml.safe_load(file)
+
+
+def load_openai_key(filepath="./secret.yml"):
+    return load_config(filepath)["OPENAI_KEY"]
@@ -0,0 +1,194 @@
+# context_builder.py
+"""Prompt context for the general chain from retrieved company documents.
+
+A company overview document has one "Field: value" line per CSV column
+(about fifty, mostly figures such as EBITDA or moving averages). The
+builder keeps the profile fields (name, symbol, sector, industry,
+description) plus only the figures the question asks about, merges
+documents that describe the same business (share classes such as GOOG and
+GOOGL), and stops adding text at a token budget counted with tiktoken.
+"""
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+
+from tracing_hooks import traced
+
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "600"))
+# A document that would get fewer tokens than this is left out
+MIN_DOCUMENT_TOKENS = 40
+TOKENIZER_MODEL = "gpt-4o-mini"
+
+PROFILE_FIELDS = ["Sector", "Industry", "Description"]
+# (question pattern, fields it asks for)
+FIELD_GROUPS = [
+    (r"market cap\w*|valuation|worth|size|largest|biggest|smallest",
+     ["MarketCapitalization"]),
+    (r"p/?e|price[- ]to[- ]earnings|valuation|expensive|cheap|multiples?",
+     ["PERatio", "ForwardPE", "TrailingPE", "PEGRatio", "PriceToBookRatio",
+      "PriceToSalesRatioTTM", "EVToRevenue", "EVToEBITDA"]),
+    (r"dividends?|yields?|payouts?", ["DividendPerShare", "DividendYield", "DividendDate", "ExDividendDate"]),
+    (r"revenues?|sales|top line", ["RevenueTTM", "RevenuePerShareTTM", "QuarterlyRevenueGrowthYOY"]),
+    (r"profit\w*|margins?|earnings|eps|income|ebitda|growth",
+     ["ProfitMargin", "OperatingMarginTTM", "GrossProfitTTM", "EBITDA", "EPS",
+      "DilutedEPSTTM", "QuarterlyEarningsGrowthYOY"]),
+    (r"analysts?|ratings?|target price|price target|recommend\w*|buy|sell",
+     ["AnalystTargetPrice", "AnalystRatingStrongBuy", "AnalystRatingBuy",
+      "AnalystRatingHold", "AnalystRatingSell", "AnalystRatingStrongSell"]),
+    (r"(stock|share) prices?|52[- ]week|moving averages?|trading range",
+     ["52WeekHigh", "52WeekLow", "50DayMovingAverage", "200DayMovingAverage"]),
+    (r"beta|volatil\w*|risk\w*", ["Beta"]),
+    (r"return on \w+|roe|roa", ["ReturnOnAssetsTTM", "ReturnOnEquityTTM"]),
+    (r"headquarter\w*|address|located|location|based|where|country",
+     ["Address", "Country"]),
+    (r"exchange|listed|currency", ["Exchange", "Currency"]),
+    (r"fiscal|quarters?", ["FiscalYearEnd", "LatestQuarter"]),
+    (r"shares|outstanding|book value", ["SharesOutstanding", "BookValue"]),
+]
+FIELD_LINE = re.compile(r"^(\w+): ?(.*)$")
+MISSING = {"", "None", "-", "nan"}
+
+
+@lru_cache(maxsize=None)
+def _field_pattern(name):
+    # "ProfitMargin" -> "profit margin", "52WeekHigh" -> "52 week high"
+    words = re.sub(r"(?<=[a-z0-9])(?=[A-Z])|(?<=\d)(?=[A-Za-z])", " ", name).lower()
+    return re.compile(rf"\b{re.escape(words)}\b")
+
+
+def parse_fields(text):
+    """``Field: value`` lines of a CSVLoader document as a dict; lines
+    that do not start a field continue the previous one."""
+    fields = {}
+    name = None
+    for line in text.splitlines():
+        match = FIELD_LINE.match(line)
+        if match:
+            name = match.group(1)
+            fields[name] = match.group(2).strip()
+        elif name is not None:
+            fields[name] += "\n" + line
+    return fields
+
+
+class TokenCounter:
+    """tiktoken encoding for ``model``. tiktoken downloads its BPE file on
+    first use; where that fails (no network) counts fall back to about four
+    characters per token."""
+
+    def __init__(self, model=TOKENIZER_MODEL):
+        try:
+            import tiktoken
+
+            self.encoding = tiktoken.encoding_for_model(model)
+        except Exception as e:
+            print(f"tiktoken encoding for {model} unavailable ({type(e).__name__}), estimating tokens")
+            self.encoding = None
+
+    def count(self, text):
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text))
+
+    def truncate(self, text, tokens):
+        if self.encoding is None:
+            return text[: tokens * 4]
+        return self.encoding.decode(self.encoding.encode(text)[:tokens])
+
+
+class ContextBuilder:
+    def __init__(self, budget=CONTEXT_TOKEN_BUDGET, counter=None):
+        self.budget = budget
+        self.counter = counter or TokenCounter()
+        self._groups = [(re.compile(rf"\b({pattern})\b"), fields) for pattern, fields in FIELD_GROUPS]
+        self.builds = 0
+        self.documents_used = 0
+        self.full_tokens = 0
+        self.context_tokens = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def fields_for(self, query, available):
+        """Profile fields, then the figures the question mentions."""
+        text = query.lower()
+        fields = list(PROFILE_FIELDS)
+        for pattern, group in self._groups:
+            if pattern.search(text):
+                fields.extend(group)
+        fields.extend(name for name in available if _field_pattern(name).search(text))
+        return [name for name in dict.fromkeys(fields) if name in available]
+
+    def _merge(self, documents):
+        # Documents with the same description describe one business
+        companies = {}
+        for document in documents:
+            fields = parse_fields(document.page_content)
+            key = " ".join(fields.get("Description", "").lower().split()) or document.page_content
+            if key in companies:
+                symbol = fields.get("Symbol")
+                if symbol and symbol not in companies[key]["symbols"]:
+                    companies[key]["symbols"].append(symbol)
+                continue
+            companies[key] = {"fields": fields, "symbols": [fields.get("Symbol", "")]}
+        return list(companies.values())
+
+    def _render(self, company, names, tokens_left):
+        fields = company["fields"]
+        symbols = ", ".join(s for s in company["symbols"] if s)
+        lines = [f"{fields.get('Name', '')} [{symbols}]"]
+        for name in names:
+            value = fields.get(name, "")
+            if value not in MISSING and name != "Description":
+                lines.append(f"{name}: {value}")
+        head = "\n".join(lines)
+        description = fields.get("Description", "")
+        if "Description" not in names or description in MISSING:
+            return head if self.counter.count(head) <= tokens_left else None
+        # Trim the description, not the figures, to fit the budget
+        room = tokens_left - self.counter.count(head + "\nDescription: ")
+        if room < MIN_DOCUMENT_TOKENS:
+            return None
+        if self.counter.count(description) > room:
+            description = self.counter.truncate(description, room).rstrip() + "..."
+        return f"{head}\nDescription: {description}"
+
+    @traced("build_context")
+    def build(self, query, documents):
+        """Context text for ``query`` from ``documents`` (best first)."""
+        start = time.perf_counter()
+        sections = []
+        tokens_left = self.budget
+        companies = self._merge(documents)
+        for company in companies:
+            names = self.fields_for(query, company["fields"])
+            section = self._render(company, names, tokens_left)
+            if section is None:
+                break
+            sections.append(section)
+            tokens_left -= self.counter.count(section) + 1
+        context = "\n\n".join(sections)
+        elapsed = time.perf_counter() - start
+        full = self.counter.count(" ".join(d.page_content for d in documents))
+        used = self.budget - tokens_left
+        print(f"Context: {used} tokens from {len(sections)}/{len(documents)} documents (full documents: {full})")
+        with self._lock:
+            self.builds += 1
+            self.documents_used += len(sections)
+            self.full_tokens += full
+            self.context_tokens += used
+            self.seconds += elapsed
+        return context
+
+    def stats(self):
+        with self._lock:
+            count = self.builds
+            return {
+                "builds": count,
+                "budget": self.budget,
+                "avg_documents": self.documents_used / count if count else 0.0,
+                "avg_context_tokens": self.context_tokens / count if count else 0.0,
+                "avg_full_document_tokens": self.full_tokens / count if count else 0.0,
+                "avg_build_ms": 1000 * self.seconds / count if count else 0.0,
+            }
@@ -0,0 +1,204 @@
+# faiss_store.py
+"""On-disk layout for the company overview vector store.
+
+A store directory holds one subdirectory per saved version and a
+``CURRENT`` file naming the one to load. A version holds:
+
+    index.faiss          flat L2 index, the copy vector_store_generator edits
+    index.<type>.faiss   optional IVF or HNSW index built from it for serving
+    docs.bin             document texts, UTF-8, concatenated
+    docs.offsets.npy     int64 start offsets into docs.bin (n + 1 entries)
+    docs.json            document ids, metadata and the serving index name
+
+``save_store`` writes a new version, then replaces ``CURRENT`` atomically,
+so a reader loads either the old or the new files, never a mix. The
+previous version is kept for readers that were opening it; older ones are
+deleted.
+
+``load_store`` memory-maps the index read-only and reads the texts through
+``np.memmap``, so processes serving the same store share those pages in the
+OS cache instead of each unpickling a private copy.
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import faiss
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+STORE_DIR = "./tmp/faiss_store"
+CURRENT_FILE = "CURRENT"
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+# Search-time settings for the approximate indexes
+IVF_NPROBE = int(os.environ.get("VECTOR_INDEX_NPROBE", "8"))
+HNSW_EF_SEARCH = int(os.environ.get("VECTOR_INDEX_EF_SEARCH", "64"))
+
+
+class MmapDocstore(Docstore):
+    """Read-only docstore over ``docs.bin`` / ``docs.offsets.npy``."""
+
+    def __init__(self, directory, ids, metadatas):
+        self.ids = ids
+        self.metadatas = metadatas
+        self.rows = {doc_id: row for row, doc_id in enumerate(ids)}
+        self.offsets = np.load(os.path.join(directory, "docs.offsets.npy"), mmap_mode="r")
+        path = os.path.join(directory, "docs.bin")
+        self.blob = (
+            np.memmap(path, dtype="uint8", mode="r")
+            if os.path.getsize(path)
+            else np.zeros(0, dtype="uint8")
+        )
+
+    def search(self, search):
+        row = self.rows.get(search)
+        if row is None:
+            return f"ID {search} not found."
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        text = self.blob[start:end].tobytes().decode("utf-8")
+        return Document(page_content=text, metadata=self.metadatas[row])
+
+    def to_memory(self):
+        return InMemoryDocstore({doc_id: self.search(doc_id) for doc_id in self.ids})
+
+
+def build_index(flat_index, index_type, nlist=None, hnsw_m=32):
+    """IVF or HNSW copy of ``flat_index`` (same L2 metric)."""
+    vectors = flat_index.reconstruct_n(0, flat_index.ntotal)
+    dimension = flat_index.d
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m)
+    elif index_type == "ivf":
+        # Around 39 training points per list is the least faiss accepts quietly.
+        nlist = nlist or int(4 * np.sqrt(len(vectors)))
+        nlist = max(1, min(nlist, len(vectors) // 39))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dimension), dimension, nlist)
+        index.train(vectors)
+    else:
+        raise ValueError(f"Unknown index type {index_type!r}")
+    index.add(vectors)
+    return index
+
+
+def current_version(directory=STORE_DIR):
+    """Directory of the version ``CURRENT`` names, or ``None``."""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as file:
+            name = file.read().strip()
+    except FileNotFoundError:
+        # Stores saved before versioning keep their files at the top level
+        return directory if os.path.exists(os.path.join(directory, "docs.json")) else None
+    return os.path.join(directory, name) if name else None
+
+
+def save_store(vectorstore, directory=STORE_DIR, index_type="flat"):
+    os.makedirs(directory, exist_ok=True)
+    previous = current_version(directory)
+    if previous == directory:
+        previous = None
+    version = tempfile.mkdtemp(prefix=time.strftime("%Y%m%d-%H%M%S-"), dir=directory)
+    ids = [vectorstore.index_to_docstore_id[i] for i in range(vectorstore.index.ntotal)]
+    documents = [vectorstore.docstore.search(doc_id) for doc_id in ids]
+    offsets = np.zeros(len(documents) + 1, dtype="int64")
+    with open(os.path.join(version, "docs.bin"), "wb") as file:
+        for row, document in enumerate(documents):
+            data = document.page_content.encode("utf-8")
+            file.write(data)
+            offsets[row + 1] = offsets[row] + len(data)
+
+    faiss.write_index(vectorstore.index, os.path.join(version, "index.faiss"))
+    index_file = "index.faiss"
+    if index_type != "flat":
+        index_file = f"index.{index_type}.faiss"
+        faiss.write_index(
+            build_index(vectorstore.index, index_type), os.path.join(version, index_file)
+        )
+    with open(os.path.join(version, "docs.offsets.npy"), "wb") as file:
+        np.save(file, offsets)
+    manifest = {
+        "index": index_file,
+        "index_type": index_type,
+        "ids": ids,
+        "metadatas": [document.metadata for document in documents],
+    }
+    with open(os.path.join(version, "docs.json"), "w") as file:
+        json.dump(manifest, file)
+    # mkdtemp creates the directory private to its owner
+    os.chmod(version, 0o755)
+
+    pointer = os.path.join(directory, CURRENT_FILE)
+    with open(pointer + ".tmp", "w") as file:
+        file.write(os.path.basename(version))
+    os.replace(pointer + ".tmp", pointer)
+
+    keep = {os.path.basename(version), CURRENT_FILE}
+    if previous:
+        keep.add(os.path.basename(previous))
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name not in keep and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _read_index(path, index_type, mmap):
+    """The index at ``path`` and how it was loaded: "mmap" or "memory"."""
+    if not mmap:
+        return faiss.read_index(path), "memory"
+    # IO_FLAG_MMAP maps IVF inverted lists; flat vectors (flat and HNSW
+    # storage) are only mapped in place by IO_FLAG_MMAP_IFC, added in faiss 1.9.
+    if index_type == "ivf":
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    elif hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        flags = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+    else:
+        print(
+            f"faiss {faiss.__version__} cannot mmap {index_type} indexes, "
+            f"reading {path} into memory"
+        )
+        return faiss.read_index(path), "memory"
+    try:
+        return faiss.read_index(path, flags), "mmap"
+    except RuntimeError as e:
+        print(f"Could not mmap {path}, reading it into memory: {e}")
+        return faiss.read_index(path), "memory"
+
+
+def load_store(embeddings, directory=STORE_DIR, mmap=True, editable=False):
+    """FAISS vector store from ``directory``, or ``None`` if there is none.
+
+    ``editable`` loads the flat index and an in-memory docstore so the store
+    can be updated and saved again; otherwise the serving index named in
+    the manifest is mapped read-only. The store's ``index_mode`` says
+    whether the index was mapped ("mmap") or read into memory ("memory").
+    """
+    directory = current_version(directory)
+    if directory is None:
+        return None
+    manifest_path = os.path.join(directory, "docs.json")
+    with open(manifest_path) as file:
+        manifest = json.load(file)
+    index_type = "flat" if editable else manifest["index_type"]
+    index_file = "index.faiss" if editable else manifest["index"]
+    index, index_mode = _read_index(
+        os.path.join(directory, index_file), index_type, mmap and not editable
+    )
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = IVF_NPROBE
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    docstore = MmapDocstore(directory, manifest["ids"], manifest["metadatas"])
+    if editable:
+        docstore = docstore.to_memory()
+    vectorstore = FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=dict(enumerate(manifest["ids"])),
+    )
+    vectorstore.index_mode = index_mode
+    return vectorstore
@@ -0,0 +1,252 @@
+# hybrid_retriever.py
+"""Company retrieval for the general chain: BM25 over the company overview
+fields fused with the FAISS store's ranking.
+
+Companies named in the question, by ticker ("ADBE") or name ("Adobe"), are
+found exactly and come first; a named sector ("life sciences companies")
+restricts both rankings to that sector. The keyword and vector rankings
+are merged with reciprocal rank fusion (RRF). A question about the named
+companies alone gets only their documents as context, instead of the
+nearest three rows, and skips the query embedding.
+"""
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+from analytical_templates import AMBIGUOUS_TICKERS, company_aliases
+from tracing_hooks import span, traced
+
+OVERVIEW_CSV = "./data/company_overview.csv"
+# Indexed fields and how many times their tokens count
+BM25_FIELDS = {"Name": 3, "Symbol": 3, "Sector": 2, "Industry": 2, "Description": 1}
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", "3"))
+# Candidates taken from each ranking before fusion
+RETRIEVAL_FETCH_K = int(os.environ.get("RETRIEVAL_FETCH_K", "20"))
+
+STOPWORDS = {
+    "a", "about", "an", "and", "any", "are", "as", "at", "be", "by", "can",
+    "company", "companies", "corporation", "do", "does", "for", "from", "has",
+    "have", "how", "in", "inc", "is", "it", "its", "me", "of", "on", "or",
+    "other", "s", "some", "tell", "that", "the", "their", "them", "there",
+    "these", "they", "this", "to", "what", "which", "who", "with",
+}
+# Extra phrases for the company_overview sectors, besides the sector name
+SECTOR_ALIASES = {
+    "TECHNOLOGY": r"tech",
+    "LIFE SCIENCES": r"biotech\w*|pharma\w*|health ?care",
+    "TRADE & SERVICES": r"retail(ers?)?",
+    "ENERGY & TRANSPORTATION": r"energy|transportation|utilit(y|ies)",
+    "REAL ESTATE & CONSTRUCTION": r"real estate|construction",
+}
+# Questions that want more than the companies they name
+EXPAND = re.compile(
+    r"\b(companies|competitors?|compet\w*|rivals?|peers?|similar|alternatives?|"
+    r"compare[sd]?|comparable|versus|vs|like|other|others)\b"
+)
+SYMBOL_LINE = re.compile(r"^Symbol: (.+)$", re.MULTILINE)
+
+
+def tokenize(text):
+    tokens = []
+    for token in re.findall(r"[a-z0-9]+", str(text).lower()):
+        if token in STOPWORDS:
+            continue
+        # Light plural stemming: "chips" and "chip" match
+        if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """Inverted index with the BM25 weight of every (term, document) pair
+    computed up front, so scoring a query is one array add per term."""
+
+    def __init__(self, documents, k1=BM25_K1, b=BM25_B):
+        self.size = len(documents)
+        lengths = np.array([len(tokens) for tokens in documents], dtype="float64")
+        average = lengths.mean() if self.size else 1.0
+        counts = defaultdict(dict)
+        for row, tokens in enumerate(documents):
+            for term, tf in Counter(tokens).items():
+                counts[term][row] = tf
+        self.postings = {}
+        for term, tfs in counts.items():
+            rows = np.fromiter(tfs.keys(), dtype="int64", count=len(tfs))
+            tf = np.fromiter(tfs.values(), dtype="float64", count=len(tfs))
+            idf = math.log(1 + (self.size - len(tfs) + 0.5) / (len(tfs) + 0.5))
+            norm = k1 * (1 - b + b * lengths[rows] / average)
+            self.postings[term] = rows, idf * tf * (k1 + 1) / (tf + norm)
+
+    def scores(self, tokens):
+        scores = np.zeros(self.size)
+        for term in set(tokens):
+            posting = self.postings.get(term)
+            if posting is not None:
+                scores[posting[0]] += posting[1]
+        return scores
+
+
+def rrf(rankings, k=RRF_K):
+    """Reciprocal rank fusion of ranked symbol lists, best first."""
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for rank, symbol in enumerate(ranking, start=1):
+            fused[symbol] += 1.0 / (k + rank)
+    return sorted(fused, key=fused.get, reverse=True)
+
+
+class HybridRetriever:
+    """Retrieves company overview documents for a question.
+
+    ``retrieve`` returns the store's documents (one per company) best
+    first. Vector store document ids are the company symbols, as written
+    by vector_store_generator.py.
+    """
+
+    def __init__(self, vectorstore, csv_path=OVERVIEW_CSV, top_k=RETRIEVAL_TOP_K,
+                 fetch_k=RETRIEVAL_FETCH_K):
+        self.vectorstore = vectorstore
+        self.top_k = top_k
+        self.fetch_k = fetch_k
+        companies = pd.read_csv(csv_path, usecols=list(BM25_FIELDS)).fillna("")
+        self.symbols = companies["Symbol"].tolist()
+        self.rows = {symbol: row for row, symbol in enumerate(self.symbols)}
+        self.sectors = companies["Sector"].to_numpy()
+        self.index = BM25Index(
+            [
+                [token for field, weight in BM25_FIELDS.items()
+                 for token in tokenize(company[field]) * weight]
+                for company in companies.to_dict("records")
+            ]
+        )
+        self.aliases = company_aliases(zip(self.symbols, companies["Name"]))
+        self._alias_pattern = re.compile(
+            r"\b("
+            + "|".join(re.escape(a) for a in sorted(self.aliases, key=len, reverse=True))
+            + r")\b"
+        )
+        self._sector_patterns = []
+        for sector in sorted(set(self.sectors) - {""}):
+            pattern = re.escape(sector.lower()).replace("\\&", "(&|and)").replace("\\ ", " ")
+            if sector in SECTOR_ALIASES:
+                pattern += "|" + SECTOR_ALIASES[sector]
+            self._sector_patterns.append((sector, re.compile(rf"\b({pattern})\b")))
+        self.retrievals = 0
+        self.documents_returned = 0
+        self.named_hits = 0
+        self.sector_hits = 0
+        self.embed_seconds = 0.0
+        self.search_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def named_symbols(self, query):
+        found = [
+            token for token in re.findall(r"\b[A-Z]{1,5}\b", query)
+            if token in self.rows and token not in AMBIGUOUS_TICKERS
+        ]
+        text = query.lower().replace("'s", "")
+        found.extend(self.aliases[alias] for alias in self._alias_pattern.findall(text))
+        return list(dict.fromkeys(found))
+
+    def named_sectors(self, query):
+        text = query.lower()
+        return [sector for sector, pattern in self._sector_patterns if pattern.search(text)]
+
+    @traced("bm25_search")
+    def sparse_ranking(self, query, allowed=None):
+        scores = self.index.scores(tokenize(query))
+        if allowed is not None:
+            scores[~allowed] = 0.0
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > self.fetch_k:
+            candidates = candidates[np.argpartition(-scores[candidates], self.fetch_k)[: self.fetch_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [self.symbols[row] for row in candidates]
+
+    @traced("similarity_search")
+    def dense_ranking(self, vector, allowed=None):
+        ranking = []
+        for document, _ in self.vectorstore.similarity_search_with_score_by_vector(
+            vector, k=self.fetch_k
+        ):
+            match = SYMBOL_LINE.search(document.page_content)
+            symbol = match.group(1).strip() if match else None
+            if symbol in self.rows and (allowed is None or allowed[self.rows[symbol]]):
+                ranking.append(symbol)
+        return ranking
+
+    def needs_search(self, query, named):
+        # Questions about the named companies alone skip the query embedding
+        return not named or bool(EXPAND.search(query.lower()))
+
+    def select(self, query, named, vector):
+        """Symbols to use as context, best first, and the sectors filtered on."""
+        if vector is None:
+            return named, []
+        sectors = self.named_sectors(query)
+        allowed = np.isin(self.sectors, sectors) if sectors else None
+        fused = rrf([self.sparse_ranking(query, allowed), self.dense_ranking(vector, allowed)])
+        others = [symbol for symbol in fused if symbol not in named]
+        return named + others[: max(self.top_k - len(named), 0)], sectors
+
+    def _documents(self, symbols):
+        documents = []
+        for symbol in symbols:
+            document = self.vectorstore.docstore.search(symbol)
+            # Docstores return a message string for unknown ids
+            if not isinstance(document, str):
+                documents.append(document)
+        return documents
+
+    def _finish(self, query, named, vector, embed_seconds):
+        start = time.perf_counter()
+        symbols, sectors = self.select(query, named, vector)
+        documents = self._documents(symbols)
+        search_seconds = time.perf_counter() - start
+        with self._lock:
+            self.retrievals += 1
+            self.documents_returned += len(documents)
+            self.named_hits += bool(named)
+            self.sector_hits += bool(sectors)
+            self.embed_seconds += embed_seconds
+            self.search_seconds += search_seconds
+        return documents
+
+    def retrieve(self, query):
+        named = self.named_symbols(query)
+        vector = None
+        start = time.perf_counter()
+        if self.needs_search(query, named):
+            with span("embed_query"):
+                vector = self.vectorstore.embeddings.embed_query(query)
+        return self._finish(query, named, vector, time.perf_counter() - start)
+
+    async def aretrieve(self, query):
+        named = self.named_symbols(query)
+        vector = None
+        start = time.perf_counter()
+        if self.needs_search(query, named):
+            with span("embed_query"):
+                vector = await self.vectorstore.embeddings.aembed_query(query)
+        return self._finish(query, named, vector, time.perf_counter() - start)
+
+    def stats(self):
+        with self._lock:
+            count = self.retrievals
+            return {
+                "retrievals": count,
+                "named_company_rate": self.named_hits / count if count else 0.0,
+                "sector_filter_rate": self.sector_hits / count if count else 0.0,
+                "avg_documents": self.documents_returned / count if count else 0.0,
+                "avg_embed_ms": 1000 * self.embed_seconds / count if count else 0.0,
+                "avg_search_ms": 1000 * self.search_seconds / count if count else 0.0,
+            }
@@ -1,33 +1,149 @@
 # pandas_data_analyzer.py
+import asyncio
+import contextvars
+import queue
+import threading
+
 import pandas as pd
-from langchain_experimental.agents import create_pandas_dataframe_agent
-from langchain_openai import ChatOpenAI
-from config_utils import load_openai_key
-
-# Initialize the OpenAI model
-llm = ChatOpenAI(model_name="gpt-4", openai_api_key=load_openai_key())
-
-# Load data into pandas DataFrame
-stock_weekly_data_df = pd.read_csv("./data/stock_weekly_data.csv")  
-news_sentiment_df = pd.read_csv("./data/news_sentiment.csv")  
-quarterly_earnings_df = pd.read_csv("./data/quarterly_earnings.csv")  
-cash_flow_df = pd.read_csv("./data/cash_flow.csv")  
-
-# Create the pandas DataFrame agent
-agent = create_pandas_dataframe_agent(
-    llm, 
-    [stock_weekly_data_df, news_sentiment_df, quarterly_earnings_df, cash_flow_df], 
-    verbose=True, 
-    allow_dangerous_code=True,  
-    handle_parsing_errors=True,
-    max_iterations=20
-
-)
+from analytical_templates import AnalyticalTemplates, source_columns
+from columnar_data import LazyFrames, load_frame
+from resources import chat_model, resources
+from tracing_hooks import span
+
+# Data frames, the agent and the templates are built on first use (or by the
+# server's background warm-up), not at import time.
+@resources.resource("analysis_frames")
+def load_frames():
+    # Typed frames from the memory-mapped files written by columnar_data.py
+    # (or the CSVs), each read when first used
+    return LazyFrames(["stock_weekly_data", "news_sentiment", "quarterly_earnings", "cash_flow"])
+
+@resources.resource("pandas_agent")
+def build_agent():
+    from langchain_experimental.agents import create_pandas_dataframe_agent
+
+    frames = resources.get("analysis_frames")
+    # Create the pandas DataFrame agent
+    return create_pandas_dataframe_agent(
+        # Streams internally so stream_analytical_query can relay the answer
+        chat_model("gpt-4", streaming=True),
+        [
+            frames["stock_weekly_data"],
+            frames["news_sentiment"],
+            frames["quarterly_earnings"],
+            frames["cash_flow"],
+        ],
+        verbose=True,
+        allow_dangerous_code=True,
+        handle_parsing_errors=True,
+        max_iterations=20
+    )
+
+# Deterministic answers for common question templates, tried before the agent
+@resources.resource("analytical_templates")
+def build_templates():
+    companies_df = pd.read_csv("./data/company_overview.csv", usecols=["Symbol", "Name"])
+    # Only the columns the templates aggregate, independent of the agent's frames
+    return AnalyticalTemplates(
+        load_frame("stock_weekly_data", source_columns("weekly")),
+        load_frame("quarterly_earnings", source_columns("earnings")),
+        load_frame("cash_flow", source_columns("cash_flow")),
+        companies_df.itertuples(index=False),
+    )
 
 def run_analytical_query(query):
-    response = agent.run(query)
+    response = resources.get("analytical_templates").answer(query)
+    if response is not None:
+        print("Analytical fast path: template match")
+        return response
+    print("Analytical fast path: no template, falling back to the agent")
+    with span("pandas_agent"):
+        response = resources.get("pandas_agent").run(query)
     return response
 
+async def arun_analytical_query(query):
+    templates = await resources.aget("analytical_templates")
+    response = await asyncio.to_thread(templates.answer, query)
+    if response is not None:
+        print("Analytical fast path: template match")
+        return response
+    print("Analytical fast path: no template, falling back to the agent")
+    agent = await resources.aget("pandas_agent")
+    with span("pandas_agent"):
+        result = await agent.ainvoke({"input": query})
+    return result["output"]
+
+def stream_analytical_query(query):
+    """Answer chunks: a template answer in one piece, otherwise the agent's
+    final answer token by token."""
+    from streaming import FinalAnswerStream
+
+    response = resources.get("analytical_templates").answer(query)
+    if response is not None:
+        print("Analytical fast path: template match")
+        yield response
+        return
+    print("Analytical fast path: no template, falling back to the agent")
+    agent = resources.get("pandas_agent")
+    tokens = queue.Queue()
+    handler = FinalAnswerStream(tokens.put)
+    result = {}
+
+    def run():
+        try:
+            result["output"] = agent.invoke(
+                {"input": query}, config={"callbacks": [handler]}
+            )["output"]
+        except Exception as e:
+            result["error"] = e
+        finally:
+            tokens.put(None)
+
+    # copy_context keeps the caller's usage callback (get_openai_callback)
+    threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True).start()
+    while True:
+        token = tokens.get()
+        if token is None:
+            break
+        yield token
+    if "error" in result:
+        raise result["error"]
+    if not handler.streamed:
+        yield result["output"]
+
+async def astream_analytical_query(query):
+    from streaming import FinalAnswerStream
+
+    templates = await resources.aget("analytical_templates")
+    response = await asyncio.to_thread(templates.answer, query)
+    if response is not None:
+        print("Analytical fast path: template match")
+        yield response
+        return
+    print("Analytical fast path: no template, falling back to the agent")
+    agent = await resources.aget("pandas_agent")
+    loop = asyncio.get_running_loop()
+    tokens = asyncio.Queue()
+    # Sync callbacks may run on executor threads
+    handler = FinalAnswerStream(lambda t: loop.call_soon_threadsafe(tokens.put_nowait, t))
+    task = asyncio.ensure_future(
+        agent.ainvoke({"input": query}, config={"callbacks": [handler]})
+    )
+    task.add_done_callback(lambda _: loop.call_soon_threadsafe(tokens.put_nowait, None))
+    while True:
+        token = await tokens.get()
+        if token is None:
+            break
+        yield token
+    result = await task
+    if not handler.streamed:
+        yield result["output"]
+
+def analytical_stats():
+    if not resources.ready(["analytical_templates"]):
+        return None
+    return resources.get("analytical_templates").stats()
+
 if __name__ == "__main__":
     query = "What is the average stock price between Nvidia and Apple? Please provide the numbers and the distribution across years."
     response = run_analytical_query(query)
@@ -1,18 +1,109 @@
 # query_router.py
-from langchain_openai import ChatOpenAI
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from company_info_query_engine import run_general_query
-from pandas_data_analyzer import run_analytical_query
-from config_utils import load_openai_key
+import pandas as pd
 
-llm = ChatOpenAI(model_name="gpt-4o-mini", openai_api_key=load_openai_key())
+from company_info_query_engine import (aanswer_with_context, answer_with_context,
+                                       aretrieve_context, astream_answer_with_context,
+                                       retrieve_context, stream_answer_with_context)
+from pandas_data_analyzer import (analytical_stats, arun_analytical_query,
+                                  astream_analytical_query, run_analytical_query,
+                                  stream_analytical_query)
+from question_classifier import QuestionClassifier, column_terms, log_question
+from resources import achat_model, chat_model, resources
+from tracing_hooks import traced
 
+# Below this confidence the local classifier defers to the LLM
+QUESTION_CLASSIFIER_MIN_CONFIDENCE = float(
+    os.environ.get("QUESTION_CLASSIFIER_MIN_CONFIDENCE", "0.3")
+)
+# "1" starts the general path's retrieval while a question is with the LLM
+# classifier; the retrieved context is dropped if the question is analytical
+SPECULATIVE_ROUTING = os.environ.get("SPECULATIVE_ROUTING", "0") == "1"
+SPECULATIVE_WORKERS = int(os.environ.get("SPECULATIVE_WORKERS", "8"))
+
+@resources.resource("question_classifier")
+def build_classifier():
+    return QuestionClassifier(
+        column_terms(
+            [
+                "./data/stock_weekly_data.csv",
+                "./data/cash_flow.csv",
+                "./data/quarterly_earnings.csv",
+                "./data/news_sentiment.csv",
+            ]
+        ),
+        pd.read_csv(
+            "./data/company_overview.csv", usecols=["Symbol", "Name"]
+        ).itertuples(index=False),
+    )
+
+@resources.resource("answer_cache")
+def build_answer_cache():
+    from semantic_cache import SemanticCache, query_numbers
+
+    classifier = resources.get("question_classifier")
+
+    def entities(query):
+        # Known companies only, by ticker or name ("Apple" and "Microsoft"
+        # embed alike); acronyms such as EPS or CEO are not entities
+        return query_numbers(query) | classifier.companies(query)
+
+    return SemanticCache(resources.get("embeddings").embed_query, entities)
+
+classification_counts = {"local": 0, "llm": 0}
+stats_lock = threading.Lock()
+stream_timings = {"count": 0, "ttfb": 0.0, "total": 0.0}
+token_usage = {"answers": 0, "prompt": 0, "completion": 0, "cost": 0.0}
+speculation_counts = {"used": 0, "discarded": 0, "classify": 0.0, "retrieval": 0.0, "hidden": 0.0}
+speculation_pool = ThreadPoolExecutor(
+    max_workers=SPECULATIVE_WORKERS, thread_name_prefix="speculative-retrieval"
+)
+
+def _record_usage(usage):
+    # Token counts of the OpenAI calls made for one answer
+    print(
+        f"Tokens: {usage.prompt_tokens} prompt, {usage.completion_tokens} completion "
+        f"in {usage.successful_requests} requests"
+    )
+    with stats_lock:
+        token_usage["answers"] += 1
+        token_usage["prompt"] += usage.prompt_tokens
+        token_usage["completion"] += usage.completion_tokens
+        token_usage["cost"] += usage.total_cost
+
+def _record_classification(query, label, source):
+    with stats_lock:
+        classification_counts[source] += 1
+    # With QUESTION_LOG=1, logged questions can be labeled and fed back
+    # into the classifier model
+    log_question(query, label, source)
+    return label
+
+@traced("classify_question_local")
+def _classify_locally(classifier, query):
+    # None when the local classifier is not confident enough
+    label, confidence = classifier.classify(query)
+    if confidence < QUESTION_CLASSIFIER_MIN_CONFIDENCE:
+        return None
+    return _record_classification(query, label, "local")
+
+@traced("classify_question")
 def classify_question(query):
-    confirm_analytical = llm.invoke(f"Does the following question asking anything about cash flow, news sentiment, quarterly earnings, or stock weekly data? Return 'y' if yes, 'n' if no. Question: {query}  y/n:").content.strip().lower()
-    if "y" in confirm_analytical.lower():
-        return "analytical"
+    label = _classify_locally(resources.get("question_classifier"), query)
+    if label is None:
+        label = _record_classification(query, classify_question_llm(query), "llm")
+    return label
+
+def confirm_analytical_prompt(query):
+    return f"Does the following question asking anything about cash flow, news sentiment, quarterly earnings, or stock weekly data? Return 'y' if yes, 'n' if no. Question: {query}  y/n:"
 
-    prompt = f"""Classify the following question as either "analytical" or "general":
+def classification_prompt(query):
+    return f"""Classify the following question as either "analytical" or "general":
 
     Question: {query}
 
@@ -29,20 +120,279 @@ def classify_question(query):
 
     Classification:
     """
-    response = llm.invoke(prompt)
+
+@traced("classify_question_llm")
+def classify_question_llm(query):
+    llm = chat_model("gpt-4o-mini")
+    confirm_analytical = llm.invoke(confirm_analytical_prompt(query)).content.strip().lower()
+    if "y" in confirm_analytical.lower():
+        return "analytical"
+
+    response = llm.invoke(classification_prompt(query))
     classification = response.content.strip().lower()
     if "analytical" in classification.lower():
         return "analytical"
     else:
         return "general"
 
+def _record_speculation(question_type, classify_seconds, retrieval_seconds):
+    used = question_type == "general"
+    with stats_lock:
+        speculation_counts["used" if used else "discarded"] += 1
+        speculation_counts["classify"] += classify_seconds
+        if used:
+            speculation_counts["retrieval"] += retrieval_seconds
+            # Retrieval time that overlapped the classifier call
+            speculation_counts["hidden"] += min(classify_seconds, retrieval_seconds)
+    retrieval = f"{1000 * retrieval_seconds:.0f} ms, used" if used else "discarded"
+    print(f"Speculative routing: classification {1000 * classify_seconds:.0f} ms, retrieval {retrieval}")
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+@traced("classify_and_retrieve")
+def classify_and_retrieve(query):
+    """Classify ``query``. Returns ``(question_type, inputs)``, where
+    ``inputs`` is the general chain's input if it was retrieved
+    speculatively (see SPECULATIVE_ROUTING), otherwise None."""
+    label = _classify_locally(resources.get("question_classifier"), query)
+    if label is not None:
+        return label, None
+    if not SPECULATIVE_ROUTING:
+        return _record_classification(query, classify_question_llm(query), "llm"), None
+    retrieval = speculation_pool.submit(_timed, retrieve_context, query)
+    start = time.perf_counter()
+    try:
+        label = classify_question_llm(query)
+    except Exception:
+        retrieval.cancel()
+        raise
+    classify_seconds = time.perf_counter() - start
+    _record_classification(query, label, "llm")
+    if label == "analytical":
+        # A retrieval that is already running finishes in the background
+        retrieval.cancel()
+        _record_speculation(label, classify_seconds, None)
+        return label, None
+    inputs, retrieval_seconds = retrieval.result()
+    _record_speculation(label, classify_seconds, retrieval_seconds)
+    return label, inputs
+
 def route_query(query):
-    question_type = classify_question(query)
+    question_type, inputs = classify_and_retrieve(query)
     print(f"Question type: {question_type}")
     if question_type == "analytical":
         return run_analytical_query(query)
     else:
-        return run_general_query(query)
+        return answer_with_context(inputs or retrieve_context(query))
+
+def answer_query(query):
+    """``route_query`` behind the semantic answer cache."""
+    from langchain_community.callbacks import get_openai_callback
+
+    answer_cache = resources.get("answer_cache")
+    response, vector = answer_cache.get(query)
+    if response is not None:
+        print("Semantic cache hit")
+        return response
+    # Counts the OpenAI requests made while answering, credited to later hits
+    with get_openai_callback() as usage:
+        response = route_query(query)
+    _record_usage(usage)
+    if isinstance(response, str) and response:
+        answer_cache.put(query, response, usage.successful_requests, vector)
+    return response
+
+# Async versions for the ASGI server: LLM calls go through ainvoke and the
+# blocking steps (embedding lookups, pandas templates) run on worker threads,
+# so a slow chain does not hold a thread per request.
+@traced("classify_question")
+async def aclassify_question(query):
+    label = _classify_locally(await resources.aget("question_classifier"), query)
+    if label is None:
+        label = _record_classification(query, await aclassify_question_llm(query), "llm")
+    return label
+
+@traced("classify_question_llm")
+async def aclassify_question_llm(query):
+    llm = await achat_model("gpt-4o-mini")
+    confirm_analytical = (await llm.ainvoke(confirm_analytical_prompt(query))).content
+    if "y" in confirm_analytical.strip().lower():
+        return "analytical"
+    response = await llm.ainvoke(classification_prompt(query))
+    if "analytical" in response.content.strip().lower():
+        return "analytical"
+    return "general"
+
+async def _atimed(awaitable):
+    start = time.perf_counter()
+    result = await awaitable
+    return result, time.perf_counter() - start
+
+@traced("classify_and_retrieve")
+async def aclassify_and_retrieve(query):
+    label = _classify_locally(await resources.aget("question_classifier"), query)
+    if label is not None:
+        return label, None
+    if not SPECULATIVE_ROUTING:
+        return _record_classification(query, await aclassify_question_llm(query), "llm"), None
+    retrieval = asyncio.ensure_future(_atimed(aretrieve_context(query)))
+    start = time.perf_counter()
+    try:
+        label = await aclassify_question_llm(query)
+    except BaseException:
+        retrieval.cancel()
+        raise
+    classify_seconds = time.perf_counter() - start
+    _record_classification(query, label, "llm")
+    if label == "analytical":
+        retrieval.cancel()
+        _record_speculation(label, classify_seconds, None)
+        return label, None
+    inputs, retrieval_seconds = await retrieval
+    _record_speculation(label, classify_seconds, retrieval_seconds)
+    return label, inputs
+
+async def aroute_query(query):
+    question_type, inputs = await aclassify_and_retrieve(query)
+    print(f"Question type: {question_type}")
+    if question_type == "analytical":
+        return await arun_analytical_query(query)
+    return await aanswer_with_context(inputs or await aretrieve_context(query))
+
+async def aanswer_query(query):
+    """``aroute_query`` behind the semantic answer cache."""
+    from langchain_community.callbacks import get_openai_callback
+
+    answer_cache = await resources.aget("answer_cache")
+    response, vector = await asyncio.to_thread(answer_cache.get, query)
+    if response is not None:
+        print("Semantic cache hit")
+        return response
+    with get_openai_callback() as usage:
+        response = await aroute_query(query)
+    _record_usage(usage)
+    if isinstance(response, str) and response:
+        await asyncio.to_thread(
+            answer_cache.put, query, response, usage.successful_requests, vector
+        )
+    return response
+
+def stream_query(query):
+    """``answer_query`` as a stream of answer chunks. Cached and template
+    answers arrive as a single chunk; the streamed answer is cached like a
+    regular one once it is complete."""
+    from langchain_community.callbacks import get_openai_callback
+
+    answer_cache = resources.get("answer_cache")
+    response, vector = answer_cache.get(query)
+    if response is not None:
+        print("Semantic cache hit")
+        yield response
+        return
+    chunks = []
+    with get_openai_callback() as usage:
+        question_type, inputs = classify_and_retrieve(query)
+        print(f"Question type: {question_type}")
+        stream = (
+            stream_analytical_query(query)
+            if question_type == "analytical"
+            else stream_answer_with_context(inputs or retrieve_context(query))
+        )
+        for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+    _record_usage(usage)
+    response = "".join(chunks)
+    if response:
+        answer_cache.put(query, response, usage.successful_requests, vector)
+
+async def astream_query(query):
+    from langchain_community.callbacks import get_openai_callback
+
+    answer_cache = await resources.aget("answer_cache")
+    response, vector = await asyncio.to_thread(answer_cache.get, query)
+    if response is not None:
+        print("Semantic cache hit")
+        yield response
+        return
+    chunks = []
+    with get_openai_callback() as usage:
+        question_type, inputs = await aclassify_and_retrieve(query)
+        print(f"Question type: {question_type}")
+        stream = (
+            astream_analytical_query(query)
+            if question_type == "analytical"
+            else astream_answer_with_context(inputs or await aretrieve_context(query))
+        )
+        async for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+    _record_usage(usage)
+    response = "".join(chunks)
+    if response:
+        await asyncio.to_thread(
+            answer_cache.put, query, response, usage.successful_requests, vector
+        )
+
+def record_stream_timing(ttfb_ms, total_ms):
+    with stats_lock:
+        stream_timings["count"] += 1
+        stream_timings["ttfb"] += ttfb_ms
+        stream_timings["total"] += total_ms
+
+def query_stats():
+    with stats_lock:
+        classification = dict(classification_counts)
+    total = classification["local"] + classification["llm"]
+    classification["local_rate"] = classification["local"] / total if total else 0.0
+    with stats_lock:
+        count = stream_timings["count"]
+        streaming = {
+            "count": count,
+            "avg_ttfb_ms": stream_timings["ttfb"] / count if count else 0.0,
+            "avg_total_ms": stream_timings["total"] / count if count else 0.0,
+        }
+        counts = dict(speculation_counts)
+        usage = dict(token_usage)
+    answers = usage.pop("answers")
+    tokens = {
+        "answers": answers,
+        "avg_prompt_tokens": usage["prompt"] / answers if answers else 0.0,
+        "avg_completion_tokens": usage["completion"] / answers if answers else 0.0,
+        "total_cost": usage["cost"],
+    }
+    speculative = counts["used"] + counts["discarded"]
+    speculation = {
+        "enabled": SPECULATIVE_ROUTING,
+        "used": counts["used"],
+        "discarded": counts["discarded"],
+        "avg_classify_ms": 1000 * counts["classify"] / speculative if speculative else 0.0,
+        "avg_retrieval_ms": 1000 * counts["retrieval"] / counts["used"] if counts["used"] else 0.0,
+        "avg_hidden_ms": 1000 * counts["hidden"] / counts["used"] if counts["used"] else 0.0,
+    }
+    return {
+        "analytical_fast_path": analytical_stats(),
+        "streaming": streaming,
+        "classification": classification,
+        "speculative_routing": speculation,
+        "tokens": tokens,
+        "retrieval": (
+            resources.get("retriever").stats() if resources.ready(["retriever"]) else None
+        ),
+        "context": (
+            resources.get("context_builder").stats()
+            if resources.ready(["context_builder"])
+            else None
+        ),
+        "semantic_cache": (
+            resources.get("answer_cache").stats()
+            if resources.ready(["answer_cache"])
+            else None
+        ),
+    }
 
 if __name__ == "__main__":
     query = "What is the average stock price for Apple in 2023, and which month has the highest stock price?"
@@ -0,0 +1,203 @@
+# question_classifier.py
+import csv
+import json
+import os
+import re
+import threading
+
+from analytical_templates import company_aliases
+
+QUESTION_MODEL_PATH = os.environ.get(
+    "QUESTION_MODEL_PATH", "./tmp/question_classifier.joblib"
+)
+# Logging user questions for retraining is opt-in (QUESTION_LOG=1)
+QUESTION_LOG = os.environ.get("QUESTION_LOG", "0") == "1"
+QUESTION_LOG_PATH = os.environ.get("QUESTION_LOG_PATH", "./tmp/question_log.jsonl")
+QUESTION_LOG_MAX_BYTES = int(os.environ.get("QUESTION_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+
+# Weighted cues; a question's score per class is the sum of matched weights.
+ANALYTICAL_CUES = [
+    (r"\b(average|mean|median|total|sum|highest|lowest|maximum|minimum|max|min)\b", 2.0),
+    (r"\btop \d+\b|\brank(ed|ing)?\b|\bhow (much|many)\b", 2.0),
+    (r"\b(calculate|compute|statistic\w*|distribution|correlat\w*|volatil\w*|"
+     r"standard deviation)\b", 2.0),
+    (r"\b(price[sd]?|closing|volume|eps|earnings|cash ?flow|dividends?|"
+     r"net income|capital expenditures?|sentiment|news|surprise)\b", 2.0),
+    (r"\b(weekly|monthly|quarterly|yearly|annual(ly)?)\b|\bper (year|quarter|month)\b", 1.5),
+    (r"\b(19|20)\d{2}\b|\bover time\b|\btrend\w*\b|\b(change[sd]?|growth|grew|"
+     r"increase[sd]?|decrease[sd]?|percent\w*|%)", 1.5),
+    (r"\b(which|what) (company|stock)\b.*\b(highest|lowest|most|least)\b", 1.0),
+]
+GENERAL_CUES = [
+    (r"\bwhat (does|do)\b.*\b(do|make|sell|offer|provide)\b|\bwhat is .* known for\b", 2.5),
+    (r"\b(products?|services?|business( model)?|brands?|platforms?|software|"
+     r"customers|market(s|ing)? focus)\b", 2.0),
+    (r"\b(compet\w*|rivals?|peers?|similar|comparable|alternatives?)\b", 2.0),
+    (r"\b(industry|sector|headquarter\w*|founded|founder|ceo|employees|mission|"
+     r"history|strategy)\b", 2.0),
+    (r"\b(describe|description|overview|tell me about|explain|focus(es)? on|"
+     r"specializ\w*|operate[sd]? in)\b", 2.0),
+    (r"\bdifference between\b|\bcompare\b.*\bportfolio\b", 1.5),
+    (r"\b(who|why)\b", 1.0),
+]
+
+
+def _split_column(name):
+    # "operatingCashflow" -> "operating cashflow", "4. close" -> "close"
+    name = re.sub(r"^\d+\.\s*", "", name)
+    return re.sub(r"(?<=[a-z])(?=[A-Z])", " ", name).lower()
+
+
+def column_terms(paths):
+    """Lower-cased metric names from the analytical CSV headers."""
+    terms = set()
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, newline="") as file:
+            header = next(csv.reader(file), [])
+        for column in header:
+            term = _split_column(column)
+            if term not in ("symbol", "date", "reported currency", "report time"):
+                terms.add(term)
+    return terms
+
+
+class QuestionClassifier:
+    """In-process "analytical" vs "general" classifier.
+
+    Scores lexicon cues (question words, aggregation words, metric names
+    taken from the analytical CSV headers) and, when a trained model exists
+    at ``QUESTION_MODEL_PATH``, blends in its probability. ``classify``
+    returns ``(label, confidence)`` with confidence in [0, 1]; callers fall
+    back to the LLM below their own threshold.
+    """
+
+    def __init__(self, metric_terms=(), companies=(), model_path=QUESTION_MODEL_PATH):
+        self.analytical_cues = [(re.compile(p), w) for p, w in ANALYTICAL_CUES]
+        self.general_cues = [(re.compile(p), w) for p, w in GENERAL_CUES]
+        terms = sorted(t for t in metric_terms if len(t) > 3)
+        self.metric_pattern = (
+            re.compile(r"\b(" + "|".join(map(re.escape, terms)) + r")\b")
+            if terms
+            else None
+        )
+        companies = list(companies)
+        self.tickers = {symbol for symbol, _ in companies}
+        self.aliases = company_aliases(companies)
+        aliases = sorted(self.aliases, key=len, reverse=True)
+        self.company_pattern = (
+            re.compile(r"\b(" + "|".join(map(re.escape, aliases)) + r")\b")
+            if aliases
+            else None
+        )
+        self.model = self._load_model(model_path)
+
+    @staticmethod
+    def _load_model(path):
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            import joblib
+
+            return joblib.load(path)
+        except Exception as e:
+            print(f"Question classifier model not loaded: {e}")
+            return None
+
+    def scores(self, query):
+        text = query.lower()
+        analytical = sum(w for p, w in self.analytical_cues if p.search(text))
+        general = sum(w for p, w in self.general_cues if p.search(text))
+        if self.metric_pattern is not None and self.metric_pattern.search(text):
+            analytical += 1.0
+        # Naming a company without asking for any figure reads as descriptive.
+        if analytical == 0 and self._mentions_company(query, text):
+            general += 1.0
+        return analytical, general
+
+    def companies(self, query):
+        """Symbols of the companies ``query`` names, by ticker or by name."""
+        found = {t for t in re.findall(r"\b[A-Z]{2,5}\b", query) if t in self.tickers}
+        if self.company_pattern is not None:
+            found.update(self.aliases[a] for a in self.company_pattern.findall(query.lower()))
+        return found
+
+    def _mentions_company(self, query, text):
+        if any(t in self.tickers for t in re.findall(r"\b[A-Z]{2,5}\b", query)):
+            return True
+        return self.company_pattern is not None and bool(self.company_pattern.search(text))
+
+    def probability(self, query):
+        """Probability that ``query`` is analytical."""
+        analytical, general = self.scores(query)
+        probability = (analytical + 0.5) / (analytical + general + 1.0)
+        if self.model is not None:
+            model_probability = self.model.predict_proba([query])[0][1]
+            probability = (probability + model_probability) / 2
+        return probability
+
+    def classify(self, query):
+        probability = self.probability(query)
+        label = "analytical" if probability > 0.5 else "general"
+        return label, abs(probability - 0.5) * 2
+
+
+_log_lock = threading.Lock()
+
+
+def log_question(query, label, source, path=QUESTION_LOG_PATH):
+    """Append a classified question to the training log, when QUESTION_LOG
+    is on and the log is under QUESTION_LOG_MAX_BYTES."""
+    if not QUESTION_LOG or not path:
+        return
+    line = json.dumps({"query": query, "label": label, "source": source})
+    try:
+        with _log_lock:
+            if os.path.exists(path) and os.path.getsize(path) >= QUESTION_LOG_MAX_BYTES:
+                return
+            with open(path, "a") as file:
+                file.write(line + "\n")
+    except OSError as e:
+        print(f"Could not log question: {e}")
+
+
+def read_labeled(path):
+    """``(questions, labels)`` from a CSV (question,label) or the JSONL log."""
+    if path.endswith(".jsonl"):
+        with open(path) as file:
+            rows = [json.loads(line) for line in file if line.strip()]
+        return [r["query"] for r in rows], [r["label"] for r in rows]
+    with open(path, newline="") as file:
+        rows = list(csv.DictReader(file))
+    return [r["question"] for r in rows], [r["label"] for r in rows]
+
+
+def train_model(paths, model_path=QUESTION_MODEL_PATH):
+    """Fit a TF-IDF + logistic regression model on labeled questions and
+    save it where ``QuestionClassifier`` picks it up."""
+    import joblib
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+
+    questions, labels = [], []
+    for path in paths:
+        q, l = read_labeled(path)
+        questions += q
+        labels += l
+    model = make_pipeline(
+        TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True),
+        LogisticRegression(max_iter=1000),
+    )
+    model.fit(questions, [label == "analytical" for label in labels])
+    joblib.dump(model, model_path)
+    return model
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python rag_demo/question_classifier.py data/question_labels.csv tmp/question_log.jsonl
+    train_model(sys.argv[1:])
+    print(f"Saved model to {QUESTION_MODEL_PATH}")
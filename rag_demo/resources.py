@@ -0,0 +1,157 @@
+# resources.py
+import asyncio
+import os
+import threading
+import time
+
+# "0" leaves every resource to be built on first use
+RESOURCE_WARMUP = os.environ.get("RESOURCE_WARMUP", "1") != "0"
+
+
+class ResourceRegistry:
+    """Named, lazily built shared objects (LLM clients, vector store, data
+    frames, agents).
+
+    ``get`` builds a resource the first time it is asked for and returns
+    the same object afterwards; a per-resource lock makes concurrent first
+    calls build it once. ``warm_up`` builds the resources registered with
+    ``warm=True`` on a background thread so the first request does not pay
+    for them, while the process can already serve everything else.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._warm = []
+        self._values = {}
+        self._locks = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+        self.timings = {}
+        self.warming = False
+
+    def register(self, name, factory, warm=True):
+        with self._lock:
+            self._factories[name] = factory
+            self._locks.setdefault(name, threading.Lock())
+            if warm and name not in self._warm:
+                self._warm.append(name)
+
+    def resource(self, name, warm=True):
+        """Decorator form of ``register``."""
+
+        def decorator(factory):
+            self.register(name, factory, warm)
+            return factory
+
+        return decorator
+
+    def get(self, name):
+        if name in self._values:
+            return self._values[name]
+        with self._lock:
+            factory = self._factories[name]
+            lock = self._locks[name]
+        with lock:
+            if name not in self._values:
+                start = time.perf_counter()
+                try:
+                    value = factory()
+                except Exception as e:
+                    self._errors[name] = f"{type(e).__name__}: {e}"
+                    raise
+                self.timings[name] = time.perf_counter() - start
+                self._errors.pop(name, None)
+                self._values[name] = value
+        return self._values[name]
+
+    async def aget(self, name):
+        """``get`` for async code: a resource that still has to be built is
+        built on a worker thread instead of blocking the event loop."""
+        if name in self._values:
+            return self._values[name]
+        return await asyncio.to_thread(self.get, name)
+
+    def warm_up(self, names=None):
+        """Build ``names`` (default: every warm resource) in the background."""
+        names = list(self._warm if names is None else names)
+
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"Warm-up of {name} failed: {e}")
+            self.warming = False
+
+        self.warming = True
+        thread = threading.Thread(target=run, name="resource-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def ready(self, names=None):
+        names = self._warm if names is None else names
+        return all(name in self._values for name in names)
+
+    def status(self):
+        with self._lock:
+            names = list(self._factories)
+        return {
+            name: {
+                "state": (
+                    "ready"
+                    if name in self._values
+                    else "failed" if name in self._errors else "pending"
+                ),
+                "seconds": round(self.timings[name], 3) if name in self.timings else None,
+                "error": self._errors.get(name),
+            }
+            for name in names
+        }
+
+
+resources = ResourceRegistry()
+
+
+@resources.resource("config", warm=False)
+def _config():
+    from config_utils import load_config
+
+    return load_config()
+
+
+def _chat_model_resource(model_name, streaming=False):
+    name = f"chat:{model_name}" + (":streaming" if streaming else "")
+    if name not in resources._factories:
+
+        def factory():
+            from langchain_openai import ChatOpenAI
+            from tracing_hooks import llm_callbacks
+
+            return ChatOpenAI(
+                model_name=model_name,
+                openai_api_key=resources.get("config")["OPENAI_KEY"],
+                streaming=streaming,
+                # Token usage of streamed calls, for the per-answer token log
+                stream_usage=streaming,
+                # LLM call counts and latency for /metrics
+                callbacks=llm_callbacks(),
+            )
+
+        resources.register(name, factory, warm=False)
+    return name
+
+
+def chat_model(model_name, streaming=False):
+    """One shared ChatOpenAI client per model name (and streaming mode)."""
+    return resources.get(_chat_model_resource(model_name, streaming))
+
+
+async def achat_model(model_name, streaming=False):
+    return await resources.aget(_chat_model_resource(model_name, streaming))
+
+
+@resources.resource("embeddings", warm=False)
+def _embeddings():
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(openai_api_key=resources.get("config")["OPENAI_KEY"])
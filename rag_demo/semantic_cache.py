@@ -0,0 +1,224 @@
+# semantic_cache.py
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import faiss
+import numpy as np
+from tracing_hooks import traced
+
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.93"))
+SEMANTIC_CACHE_TTL = float(os.environ.get("SEMANTIC_CACHE_TTL", "86400"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+SEMANTIC_CACHE_PATH = os.environ.get("SEMANTIC_CACHE_PATH", "./tmp/semantic_cache")
+# Minimum seconds between two saves triggered by new entries
+SEMANTIC_CACHE_SAVE_INTERVAL = float(
+    os.environ.get("SEMANTIC_CACHE_SAVE_INTERVAL", "60")
+)
+
+
+def normalize_query(query):
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", query.lower())).strip()
+
+
+def query_numbers(query):
+    """Numbers in ``query``, years included."""
+    return set(re.findall(r"\d+(?:\.\d+)?", query))
+
+
+def query_entities(query):
+    """Numbers (years included) and all-caps tokens such as tickers."""
+    return query_numbers(query) | set(re.findall(r"\b[A-Z]{1,5}\b", query))
+
+
+class SemanticCache:
+    """Answers to past questions, looked up by embedding similarity.
+
+    Query embeddings are L2-normalized and kept in a flat inner-product FAISS
+    index, so the score is the cosine similarity. A lookup returns the stored
+    answer of the nearest past question whose score reaches ``threshold``,
+    whose entities are the same and which is younger than ``ttl`` seconds.
+    Entities (``entities(query)``, by default ``query_entities``) are what
+    embeddings barely tell apart, as in "Apple's average price in 2023" and
+    "... in 2022". Identical questions (after
+    lower-casing and dropping punctuation) skip the embedding call. Past
+    ``max_entries`` the least recently used entries are evicted. The index
+    and entries are saved under ``path`` (``.faiss`` and ``.json``) and
+    loaded again on start.
+    """
+
+    # Nearest entries checked for one with matching entities
+    candidates = 5
+
+    def __init__(
+        self,
+        embed,
+        entities=query_entities,
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        ttl=SEMANTIC_CACHE_TTL,
+        max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+        path=SEMANTIC_CACHE_PATH,
+        save_interval=SEMANTIC_CACHE_SAVE_INTERVAL,
+    ):
+        self.embed = embed
+        self.entities = entities
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self.save_interval = save_interval
+        self.index = None
+        self.entries = OrderedDict()  # id -> entry, least recently used first
+        self.by_text = {}  # normalized query -> id
+        self.next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.llm_calls_saved = 0
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    def _vector(self, query):
+        vector = np.asarray([self.embed(query)], dtype="float32")
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _remove(self, entry_id):
+        entry = self.entries.pop(entry_id)
+        self.by_text.pop(entry["key"], None)
+        self.index.remove_ids(np.asarray([entry_id], dtype="int64"))
+        self._dirty = True
+
+    def _expired(self, entry):
+        return time.time() - entry["created_at"] > self.ttl
+
+    def _hit(self, entry_id):
+        entry = self.entries[entry_id]
+        self.entries.move_to_end(entry_id)
+        self.hits += 1
+        self.llm_calls_saved += entry["llm_calls"]
+        return entry["answer"]
+
+    @traced("semantic_cache_lookup")
+    def get(self, query):
+        """``(answer, vector)``; ``answer`` is ``None`` on a miss. Pass
+        ``vector`` on to ``put`` so the question is not embedded twice."""
+        key = normalize_query(query)
+        with self._lock:
+            entry_id = self.by_text.get(key)
+            if entry_id is not None:
+                if not self._expired(self.entries[entry_id]):
+                    return self._hit(entry_id), None
+                self._remove(entry_id)
+                self.expirations += 1
+        vector = self._vector(query)
+        entities = sorted(set(self.entities(query)))
+        with self._lock:
+            if self.index is not None and self.index.ntotal:
+                scores, ids = self.index.search(vector, min(self.candidates, self.index.ntotal))
+                for score, entry_id in zip(scores[0].tolist(), ids[0].tolist()):
+                    if score < self.threshold:
+                        break
+                    entry = self.entries.get(entry_id)
+                    if entry is None or sorted(set(entry.get("entities", []))) != entities:
+                        continue
+                    if not self._expired(entry):
+                        return self._hit(entry_id), vector
+                    self._remove(entry_id)
+                    self.expirations += 1
+            self.misses += 1
+        return None, vector
+
+    def put(self, query, answer, llm_calls=0, vector=None):
+        """Store ``answer``; ``llm_calls`` is what computing it cost."""
+        if vector is None:
+            vector = self._vector(query)
+        key = normalize_query(query)
+        with self._lock:
+            if self.index is None:
+                self.index = faiss.IndexIDMap(faiss.IndexFlatIP(vector.shape[1]))
+            if key in self.by_text:
+                self._remove(self.by_text[key])
+            entry_id = self.next_id
+            self.next_id += 1
+            self.index.add_with_ids(vector, np.asarray([entry_id], dtype="int64"))
+            self.entries[entry_id] = {
+                "key": key,
+                "query": query,
+                "entities": sorted(set(self.entities(query))),
+                "answer": answer,
+                "llm_calls": llm_calls,
+                "created_at": time.time(),
+            }
+            self.by_text[key] = entry_id
+            self._dirty = True
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+            save = time.monotonic() - self._saved_at > self.save_interval
+        if save:
+            self.save()
+
+    def clear(self):
+        with self._lock:
+            if self.index is not None:
+                self.index.reset()
+            self.entries.clear()
+            self.by_text.clear()
+            self._dirty = True
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty or self.index is None:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            faiss.write_index(self.index, self.path + ".faiss")
+            state = {"next_id": self.next_id, "entries": list(self.entries.items())}
+            with open(self.path + ".json.tmp", "w") as file:
+                json.dump(state, file)
+            os.replace(self.path + ".json.tmp", self.path + ".json")
+            self._dirty = False
+            self._saved_at = time.monotonic()
+
+    def load(self):
+        if not (os.path.exists(self.path + ".faiss") and os.path.exists(self.path + ".json")):
+            return
+        try:
+            index = faiss.read_index(self.path + ".faiss")
+            with open(self.path + ".json") as file:
+                state = json.load(file)
+        except (OSError, RuntimeError, ValueError) as e:
+            print(f"Semantic cache not loaded: {e}")
+            return
+        with self._lock:
+            self.index = index
+            self.next_id = state["next_id"]
+            self.entries = OrderedDict((int(i), entry) for i, entry in state["entries"])
+            self.by_text = {entry["key"]: i for i, entry in self.entries.items()}
+            expired = [i for i, entry in self.entries.items() if self._expired(entry)]
+            for entry_id in expired:
+                self._remove(entry_id)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "llm_calls_saved": self.llm_calls_saved,
+            }
@@ -0,0 +1,45 @@
+# streaming.py
+from langchain_core.callbacks import BaseCallbackHandler
+
+FINAL_ANSWER_PREFIX = "Final Answer:"
+
+
+class FinalAnswerStream(BaseCallbackHandler):
+    """Relays the tokens the agent writes after ``Final Answer:``.
+
+    The ReAct agent's intermediate LLM calls (thoughts, pandas code) are
+    not relayed; its last call ends with the answer, whose tokens are passed
+    to ``put`` as they arrive. ``streamed`` tells the caller whether any
+    were, so it can fall back to the agent's returned output.
+    """
+
+    def __init__(self, put):
+        self.put = put
+        self.text = ""
+        self.relaying = False
+        self.streamed = False
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.text = ""
+        self.relaying = False
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.text = ""
+        self.relaying = False
+
+    def on_llm_new_token(self, token, **kwargs):
+        if self.relaying:
+            self._put(token)
+            return
+        self.text += token
+        index = self.text.find(FINAL_ANSWER_PREFIX)
+        if index >= 0:
+            self.relaying = True
+            rest = self.text[index + len(FINAL_ANSWER_PREFIX):].lstrip()
+            if rest:
+                self._put(rest)
+
+    def _put(self, token):
+        if token:
+            self.streamed = True
+            self.put(token)
@@ -0,0 +1,18 @@
+# tracing_hooks.py
+"""The stage timing helpers of stock_api/tracing.py when it is importable
+(the API servers), no-ops otherwise, so the chatbot modules and their
+scripts also run with only rag_demo on the path."""
+import contextlib
+
+try:
+    from tracing import llm_callbacks, span, traced
+except ImportError:
+
+    def span(stage):
+        return contextlib.nullcontext()
+
+    def traced(stage):
+        return lambda function: function
+
+    def llm_callbacks():
+        return []
@@ -1,22 +1,180 @@
 # vector_store_generator.py
+"""Build or update the company overview FAISS store.
+
+    python rag_demo/vector_store_generator.py [--rebuild] [--index-type hnsw]
+
+Embeddings are cached in SQLite keyed on a hash of the embedding model and
+the document text, so only new or changed rows are sent to OpenAI, in
+concurrent batches. An existing store is updated incrementally: documents
+whose text changed or that disappeared from the CSV are deleted by id and
+the new embeddings are added, instead of rebuilding the whole index. The
+result is saved as a new version in the faiss_store layout, which running
+servers pick up on their next load; ``--index-type ivf|hnsw`` also writes
+an approximate index for serving larger corpora.
+"""
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 from langchain_community.document_loaders import CSVLoader
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 from config_utils import load_openai_key
+from faiss_store import INDEX_TYPES, STORE_DIR, load_store, save_store
+
+CSV_PATH = "./data/company_overview.csv"
+EMBEDDING_CACHE_PATH = os.environ.get(
+    "EMBEDDING_CACHE_PATH", "./tmp/embedding_cache.sqlite"
+)
+EMBED_BATCH_SIZE = 64
+EMBED_WORKERS = 4
+
+
+class EmbeddingCache:
+    """Embedding vectors on disk, keyed on ``content_hash``."""
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vector BLOB)"
+        )
+        self._lock = threading.Lock()
+
+    def get_many(self, hashes):
+        found = {}
+        hashes = list(hashes)
+        # SQLite limits the number of bound parameters per statement
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self.connection.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE hash IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+            for digest, blob in rows:
+                found[digest] = np.frombuffer(blob, dtype="float32").tolist()
+        return found
+
+    def put_many(self, items):
+        rows = [
+            (digest, np.asarray(vector, dtype="float32").tobytes())
+            for digest, vector in items
+        ]
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (hash, vector) VALUES (?, ?)", rows
+            )
+
+
+def content_hash(model, text):
+    return hashlib.sha256(f"{model}\n{text}".encode()).hexdigest()
+
+
+def document_id(document):
+    # Rows are keyed on their ticker so an edited row replaces its old vector.
+    match = re.search(r"^Symbol: (.+)$", document.page_content, re.MULTILINE)
+    return match.group(1).strip() if match else str(document.metadata["row"])
+
+
+def load_documents(csv_path=CSV_PATH):
+    return {document_id(d): d for d in CSVLoader(file_path=csv_path).load()}
+
+
+def embed_documents(
+    texts, embeddings_model, cache, batch_size=EMBED_BATCH_SIZE, workers=EMBED_WORKERS
+):
+    """Embeddings for ``texts`` in order, only calling the model for texts
+    missing from ``cache``."""
+    model = embeddings_model.model
+    hashes = [content_hash(model, text) for text in texts]
+    vectors = cache.get_many(set(hashes))
+    missing = list({h: t for h, t in zip(hashes, texts) if h not in vectors}.items())
+    batches = [missing[i : i + batch_size] for i in range(0, len(missing), batch_size)]
+
+    def embed(batch):
+        embedded = embeddings_model.embed_documents([text for _, text in batch])
+        items = [(digest, vector) for (digest, _), vector in zip(batch, embedded)]
+        cache.put_many(items)
+        return items
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for items in executor.map(embed, batches):
+            vectors.update(items)
+    print(f"Embeddings: {len(hashes) - len(missing)} cached, {len(missing)} embedded")
+    return [vectors[h] for h in hashes]
+
+
+def update_store(vectorstore, documents, embeddings_model, cache):
+    """Apply the difference between the store and ``documents`` in place.
+    Returns the number of documents added and removed."""
+    stored = {
+        doc_id: vectorstore.docstore.search(doc_id)
+        for doc_id in vectorstore.index_to_docstore_id.values()
+    }
+    stale = [
+        doc_id
+        for doc_id, document in stored.items()
+        if doc_id not in documents or document.page_content != documents[doc_id].page_content
+    ]
+    added = [doc_id for doc_id in documents if doc_id not in stored or doc_id in stale]
+    if stale:
+        vectorstore.delete(stale)
+    if added:
+        texts = [documents[doc_id].page_content for doc_id in added]
+        vectors = embed_documents(texts, embeddings_model, cache)
+        vectorstore.add_embeddings(
+            list(zip(texts, vectors)),
+            metadatas=[documents[doc_id].metadata for doc_id in added],
+            ids=added,
+        )
+    return len(added), len(stale)
+
+
+def build_store(documents, embeddings_model, cache):
+    ids = list(documents)
+    texts = [documents[doc_id].page_content for doc_id in ids]
+    vectors = embed_documents(texts, embeddings_model, cache)
+    return FAISS.from_embeddings(
+        list(zip(texts, vectors)),
+        embeddings_model,
+        metadatas=[documents[doc_id].metadata for doc_id in ids],
+        ids=ids,
+    )
 
-# Load documents from a CSV file
-loader = CSVLoader(file_path="./data/company_overview.csv")
-documents = loader.load()
 
-# Initialize the OpenAI embeddings model
-embeddings_model = OpenAIEmbeddings(openai_api_key=load_openai_key())
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--output", default=STORE_DIR)
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat")
+    parser.add_argument("--cache", default=EMBEDDING_CACHE_PATH)
+    parser.add_argument("--rebuild", action="store_true", help="ignore the existing store")
+    args = parser.parse_args()
 
-# Create a FAISS vector store from the documents
-vectorstore = FAISS.from_documents(documents, embeddings_model)
+    start = time.perf_counter()
+    embeddings_model = OpenAIEmbeddings(openai_api_key=load_openai_key())
+    cache = EmbeddingCache(args.cache)
+    documents = load_documents(args.csv)
+    vectorstore = (
+        None if args.rebuild else load_store(embeddings_model, args.output, editable=True)
+    )
+    if vectorstore is None:
+        vectorstore = build_store(documents, embeddings_model, cache)
+        print(f"Built store with {len(documents)} documents")
+    else:
+        added, removed = update_store(vectorstore, documents, embeddings_model, cache)
+        print(f"Updated store: {added} added, {removed} removed")
+    save_store(vectorstore, args.output, args.index_type)
+    print(f"Done in {time.perf_counter() - start:.1f} s")
 
-# Serialize the entire vector store to bytes
-vectorstore_bytes = vectorstore.serialize_to_bytes()
 
-# Save the serialized vector store to a file
-with open('./tmp/faiss_vectorstore.pkl', 'wb') as f:
-    f.write(vectorstore_bytes)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# async_rest_api.py
+"""Async (motor) versions of the per-symbol series endpoints for the ASGI
+server. They parse the query string with the same ``SeriesQuery`` as
+rest_api, render the same bodies and headers, and share its response cache,
+so either server can answer a request the other one cached."""
+from mongo_json import dumps
+from pymongo.errors import ExecutionTimeout
+from response_cache import CacheEntry, response_cache
+from series_query import STREAM_FORMATS, TIMEOUT_ERROR, SeriesQuery
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from werkzeug.datastructures import MultiDict
+
+
+async def _rows(query, cursor):
+    # Same (document, next_cursor) pairs as series_query._limited
+    previous = None
+    count = 0
+    async for document in cursor:
+        if query.limit and count == query.limit:
+            yield previous, query.next_cursor(previous)
+            return
+        if previous is not None:
+            yield previous, None
+        previous = document
+        count += 1
+    if previous is not None:
+        yield previous, None
+
+
+async def _json_array(rows, first, transform):
+    # Ends like series_query._json_array, including on a timeout
+    yield b'{"data":[' + dumps(transform(first[0]))
+    next_cursor = first[1]
+    try:
+        async for document, next_cursor in rows:
+            yield b"," + dumps(transform(document))
+    except ExecutionTimeout:
+        yield b'],"next_cursor":null,"error":' + dumps(TIMEOUT_ERROR) + b"}"
+        return
+    yield b'],"next_cursor":' + dumps(next_cursor) + b"}"
+
+
+async def _ndjson(rows, first, transform):
+    yield dumps(transform(first[0])) + b"\n"
+    next_cursor = first[1]
+    try:
+        async for document, next_cursor in rows:
+            yield dumps(transform(document)) + b"\n"
+    except ExecutionTimeout:
+        yield dumps({"error": TIMEOUT_ERROR}) + b"\n"
+        return
+    if next_cursor:
+        yield dumps({"next_cursor": next_cursor}) + b"\n"
+
+
+def _identity(document):
+    return document
+
+
+def _timeout():
+    # Same response as rest_api's ExecutionTimeout handler
+    return JSONResponse({"error": TIMEOUT_ERROR}, status_code=504)
+
+
+class AsyncSeriesEndpoint:
+    """Starlette endpoint (``handle``) for one series collection.
+
+    ``endpoint`` is the Flask endpoint name of the matching rest_api view;
+    it is part of the response cache key.
+    """
+
+    def __init__(self, collection, symbol_field, date_field, endpoint,
+                 cache_collection, transform=None, **kwargs):
+        self.collection = collection
+        self.symbol_field = symbol_field
+        self.date_field = date_field
+        self.endpoint = endpoint
+        self.cache_collection = cache_collection
+        self.transform = transform or _identity
+        self.kwargs = kwargs
+
+    async def handle(self, request):
+        args = MultiDict(request.query_params.multi_items())
+        try:
+            query = SeriesQuery(args, self.symbol_field, self.date_field, **self.kwargs)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        if query.stream:
+            return await self._stream(query)
+
+        # Same key as response_cache._cache_key for the Flask view
+        key = self.endpoint, tuple(
+            sorted((k, v) for k, v in args.items(multi=True) if v != "")
+        )
+        entry = response_cache.get(key)
+        if entry is None:
+            documents, next_cursor = [], None
+            try:
+                async for document, next_cursor in _rows(query, query.find(self.collection())):
+                    documents.append(self.transform(document))
+            except ExecutionTimeout:
+                return _timeout()
+            if not documents:
+                return JSONResponse({"error": "Data not found"}, status_code=404)
+            entry = CacheEntry(
+                dumps(documents),
+                200,
+                "application/json",
+                [("X-Next-Cursor", next_cursor)] if next_cursor else [],
+                self.cache_collection,
+                # Uppercased like response_cache._request_symbols
+                frozenset(s.strip().upper() for s in args.getlist("symbol") if s.strip()),
+                response_cache.ttl,
+            )
+            response_cache.put(key, entry)
+        etag = f'"{entry.etag}"'
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers={"ETag": etag})
+        headers = dict(entry.headers)
+        headers["ETag"] = etag
+        return Response(entry.body, media_type=entry.mimetype, headers=headers)
+
+    async def _stream(self, query):
+        rows = _rows(query, query.find(self.collection()))
+        try:
+            first = await rows.__anext__()
+        except StopAsyncIteration:
+            return JSONResponse({"error": "Data not found"}, status_code=404)
+        except ExecutionTimeout:
+            return _timeout()
+        generate = _ndjson if query.stream == "ndjson" else _json_array
+        return StreamingResponse(
+            generate(rows, first, self.transform), media_type=STREAM_FORMATS[query.stream]
+        )
@@ -0,0 +1,69 @@
+# bulk_query.py
+from series_query import date_range_filter, split_list
+
+MAX_SYMBOLS = 100
+
+# Short names accepted by the matrix format for the weekly price columns
+WEEKLY_VALUE_FIELDS = {
+    "open": "1. open",
+    "high": "2. high",
+    "low": "3. low",
+    "close": "4. close",
+    "volume": "5. volume",
+}
+
+
+def parse_symbols(args):
+    symbols = list(dict.fromkeys(s.upper() for s in split_list(args.get("symbols"))))
+    if not symbols:
+        raise ValueError("symbols parameter is required")
+    if len(symbols) > MAX_SYMBOLS:
+        raise ValueError(f"At most {MAX_SYMBOLS} symbols per request")
+    return symbols
+
+
+def bulk_filter(args, symbols, symbol_field, date_field=None):
+    query = {symbol_field: {"$in": symbols}}
+    if date_field:
+        date_range = date_range_filter(args)
+        if date_range:
+            query[date_field] = date_range
+    return query
+
+
+def bulk_projection(args, symbol_field, date_field=None):
+    fields = split_list(args.get("fields"))
+    if not fields:
+        return None
+    keep = fields + [symbol_field] + ([date_field] if date_field else [])
+    return dict.fromkeys(keep, 1)
+
+
+def group_by_symbol(documents, symbols, symbol_field, transform=None):
+    """``{symbol: [rows...]}`` in request order; symbols without data map to
+    an empty list."""
+    grouped = {symbol: [] for symbol in symbols}
+    for document in documents:
+        if transform is not None:
+            document = transform(document)
+        grouped.setdefault(document[symbol_field], []).append(document)
+    return grouped
+
+
+def weekly_matrix(documents, symbols, values):
+    """Align weekly rows into a dates x symbols matrix per value field, with
+    ``None`` where a symbol has no row for a date."""
+    column = {symbol: i for i, symbol in enumerate(symbols)}
+    rows = {}
+    for document in documents:
+        row = rows.get(document["date"])
+        if row is None:
+            row = rows[document["date"]] = {v: [None] * len(symbols) for v in values}
+        i = column[document["symbol"]]
+        for value in values:
+            row[value][i] = document.get(WEEKLY_VALUE_FIELDS[value])
+    dates = sorted(rows)
+    matrix = {"dates": dates, "symbols": symbols}
+    for value in values:
+        matrix[value] = [rows[date][value] for date in dates]
+    return matrix
@@ -0,0 +1,47 @@
+# comment_tree.py
+
+
+def build_comment_tree(comments, max_depth=5, limit=20, offset=0):
+    """Nest a flat list of a post's comments into a paged reply tree.
+
+    Replies are linked through each comment's ``comment_ids``; comments no
+    other comment points at are the top-level ones, in creation order.
+    ``limit`` caps every level, ``offset`` pages the top level and nodes
+    deeper than ``max_depth`` are returned without their replies.
+    """
+    by_id = {str(comment.id): comment for comment in comments}
+    reply_ids = set()
+    for comment in comments:
+        reply_ids.update(str(child_id) for child_id in comment.comment_ids or [])
+    roots = sorted(
+        (c for c in comments if str(c.id) not in reply_ids), key=lambda c: c.id
+    )
+
+    def children(comment):
+        return [
+            by_id[str(child_id)]
+            for child_id in comment.comment_ids or []
+            if str(child_id) in by_id
+        ]
+
+    def node(comment, depth):
+        replies = children(comment)
+        expand = depth < max_depth
+        return {
+            "comment": comment,
+            "depth": depth,
+            "reply_count": len(replies),
+            "replies": (
+                [node(reply, depth + 1) for reply in replies[:limit]]
+                if expand
+                else []
+            ),
+        }
+
+    page = roots[offset : offset + limit]
+    return {
+        "total_count": len(roots),
+        "comment_count": len(comments),
+        "has_more": offset + len(page) < len(roots),
+        "nodes": [node(comment, 1) for comment in page],
+    }
@@ -1,10 +1,43 @@
 # graphql_api.py
+import time
+
 from flask import Blueprint
 from flask_graphql import GraphQLView
 from graphql_schema import schema
+from promise import is_thenable
+from tracing import TRACING, record_stage
 
 graphql_api = Blueprint("graphql_api", __name__)
 
+
+class ResolverTiming:
+    """graphql-core middleware timing the top-level Query and Mutation
+    resolvers (nested fields are mostly attribute reads and dataloader
+    batches; introspection is skipped). Promise results are timed until they resolve."""
+
+    def resolve(self, next, root, info, **args):
+        if root is not None or info.field_name.startswith("__"):
+            return next(root, info, **args)
+        stage = f"graphql {info.parent_type.name}.{info.field_name}"
+        start = time.perf_counter()
+        result = next(root, info, **args)
+        if is_thenable(result):
+
+            def done(value):
+                record_stage(stage, time.perf_counter() - start)
+                return value
+
+            return result.then(done)
+        record_stage(stage, time.perf_counter() - start)
+        return result
+
+
 graphql_api.add_url_rule(
-    "/graphql", view_func=GraphQLView.as_view("graphql", schema=schema, graphiql=True)
+    "/graphql",
+    view_func=GraphQLView.as_view(
+        "graphql",
+        schema=schema,
+        graphiql=True,
+        middleware=[ResolverTiming()] if TRACING else None,
+    ),
 )
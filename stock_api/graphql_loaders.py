@@ -0,0 +1,77 @@
+# graphql_loaders.py
+from bson import ObjectId
+from graphql_models import Comment as CommentModel
+from graphql_models import Post as PostModel
+from graphql_models import User as UserModel
+from mongo_client import MAX_TIME_MS
+from promise import Promise
+from promise.dataloader import DataLoader
+
+
+def _to_object_id(key):
+    try:
+        return ObjectId(str(key))
+    except Exception:
+        return None
+
+
+class _DocumentLoader(DataLoader):
+    """Batches ``load`` calls into one ``$in`` query on ``key_field``."""
+
+    model = None
+    key_field = "id"
+
+    def get_cache_key(self, key):
+        return str(key)
+
+    def to_query_key(self, key):
+        return str(key)
+
+    def batch_load_fn(self, keys):
+        query_keys = [k for k in (self.to_query_key(key) for key in keys) if k]
+        documents = self.model.objects(**{f"{self.key_field}__in": query_keys}).max_time_ms(
+            MAX_TIME_MS
+        )
+        by_key = {str(getattr(doc, self.key_field)): doc for doc in documents}
+        return Promise.resolve([by_key.get(str(key)) for key in keys])
+
+
+class CommentLoader(_DocumentLoader):
+    model = CommentModel
+
+    def to_query_key(self, key):
+        return _to_object_id(key)
+
+
+class PostLoader(_DocumentLoader):
+    model = PostModel
+
+    def to_query_key(self, key):
+        return _to_object_id(key)
+
+
+class UserLoader(_DocumentLoader):
+    model = UserModel
+    key_field = "user_id"
+
+
+class Loaders:
+    def __init__(self):
+        self.comments = CommentLoader()
+        self.posts = PostLoader()
+        self.users = UserLoader()
+
+
+def get_loaders(info):
+    # One set of loaders per GraphQL execution, stored on the request context
+    # so every resolver in the same request shares the batch and the cache.
+    context = info.context
+    if context is None:
+        return Loaders()
+    if isinstance(context, dict):
+        return context.setdefault("loaders", Loaders())
+    loaders = getattr(context, "graphql_loaders", None)
+    if loaders is None:
+        loaders = Loaders()
+        setattr(context, "graphql_loaders", loaders)
+    return loaders
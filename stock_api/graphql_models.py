@@ -10,7 +10,13 @@ class UserInfo(EmbeddedDocument):
 
 
 class Post(Document):
-    meta = {"collection": "post"}
+    meta = {
+        "collection": "post",
+        "indexes": [
+            ("-post_date", "-id"),
+            ("poster_user_info.user_id", "-post_date", "-id"),
+        ],
+    }
     post_title = StringField(required=True, min_length=3, max_length=200)
     post_url = StringField()
     post_date = DateTimeField(required=True)
@@ -23,7 +29,7 @@ class Post(Document):
 
 
 class Comment(Document):
-    meta = {"collection": "comment"}
+    meta = {"collection": "comment", "indexes": ["post_id"]}
     post_id = ObjectIdField(required=True)
     commenter_info = EmbeddedDocumentField(UserInfo)
     content = StringField(required=True, min_length=1, max_length=1000)
@@ -0,0 +1,86 @@
+# graphql_pagination.py
+import base64
+from datetime import datetime
+
+from bson import ObjectId
+from graphene.utils.str_converters import to_snake_case
+from graphql.language.ast import FragmentSpread, InlineFragment
+from mongo_client import MAX_TIME_MS
+from mongoengine.queryset.visitor import Q
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(post):
+    raw = f"{post.post_date.isoformat()}|{post.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        post_date, post_id = raw.split("|", 1)
+        return datetime.fromisoformat(post_date), ObjectId(post_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def _collect(selections, fragments, names):
+    for selection in selections or []:
+        if isinstance(selection, FragmentSpread):
+            fragment = fragments[selection.name.value]
+            _collect(fragment.selection_set.selections, fragments, names)
+        elif isinstance(selection, InlineFragment):
+            _collect(selection.selection_set.selections, fragments, names)
+        else:
+            names[selection.name.value] = selection
+
+
+def selected_fields(info, path=()):
+    """Names of the fields selected under the current field, following
+    ``path`` (e.g. ``("edges", "node")``) into nested selections."""
+    selections = [
+        s for ast in info.field_asts for s in ast.selection_set.selections
+    ]
+    for name in path:
+        names = {}
+        _collect(selections, info.fragments, names)
+        if name not in names or names[name].selection_set is None:
+            return set()
+        selections = names[name].selection_set.selections
+    names = {}
+    _collect(selections, info.fragments, names)
+    return set(names)
+
+
+def projection(model, field_names, aliases=None, required=("id",)):
+    """Model fields needed to resolve ``field_names``, or ``None`` when a
+    selected field is unknown and the whole document has to be loaded."""
+    aliases = aliases or {}
+    fields = set(required)
+    for name in field_names:
+        if name.startswith("__"):
+            continue
+        field = aliases.get(to_snake_case(name), to_snake_case(name))
+        if field not in model._fields:
+            return None
+        fields.add(field)
+    return sorted(fields)
+
+
+def paginate_posts(queryset, first=None, after=None, only=None):
+    """Keyset page over posts ordered by ``post_date`` then ``_id``, newest
+    first. Returns ``(posts, has_next_page)``."""
+    first = DEFAULT_PAGE_SIZE if first is None else first
+    first = max(0, min(first, MAX_PAGE_SIZE))
+    if after:
+        post_date, post_id = decode_cursor(after)
+        queryset = queryset.filter(
+            Q(post_date__lt=post_date) | Q(post_date=post_date, id__lt=post_id)
+        )
+    queryset = queryset.order_by("-post_date", "-id")
+    if only:
+        queryset = queryset.only(*only)
+    posts = list(queryset.limit(first + 1).max_time_ms(MAX_TIME_MS))
+    return posts[:first], len(posts) > first
@@ -1,15 +1,30 @@
 # graphql_schema.py
 import graphene
+from comment_tree import build_comment_tree
 from dateutil.parser import parse
-from graphene import Boolean, Field, List, Mutation, ObjectType, String
+from graphene import Boolean, Field, Int, List, Mutation, ObjectType, String, relay
 from graphene_mongo import MongoengineObjectType
+from graphql_loaders import get_loaders
 from graphql_models import Comment as CommentModel
 from graphql_models import Post as PostModel
 from graphql_models import User as UserModel
 from graphql_models import UserInfo as UserInfoModel
+from graphql_pagination import (encode_cursor, paginate_posts, projection,
+                                selected_fields)
+from mongo_client import MAX_TIME_MS
+from vote_counter import record_vote
 from werkzeug.security import check_password_hash, generate_password_hash
 
 
+def load_comments(info, ids):
+    # Missing ids are dropped, matching what an ``id__in`` query returns.
+    return (
+        get_loaders(info)
+        .comments.load_many(ids or [])
+        .then(lambda comments: [c for c in comments if c is not None])
+    )
+
+
 class UserInfo(MongoengineObjectType):
     class Meta:
         model = UserInfoModel
@@ -22,6 +37,8 @@ class Post(MongoengineObjectType):
     poster_user_info = Field(UserInfo)
     comment_ids = List(String)
     post_url = String()
+    comments = List(lambda: Comment)
+    all_comments = List(lambda: Comment)
 
     def resolve_poster_user_info(self, info):
         return self.poster_user_info
@@ -29,17 +46,91 @@ class Post(MongoengineObjectType):
     def resolve_post_url(self, info):
         return self.post_url
 
+    def resolve_comments(self, info):
+        return load_comments(info, self.comment_ids)
+
+    def resolve_all_comments(self, info):
+        return load_comments(info, self.all_comment_ids)
+
 
 class Comment(MongoengineObjectType):
     class Meta:
         model = CommentModel
 
+    comments = List(lambda: Comment)
+    post = Field(lambda: Post)
+
+    def resolve_comments(self, info):
+        return load_comments(info, self.comment_ids)
+
+    def resolve_post(self, info):
+        return get_loaders(info).posts.load(self.post_id)
+
 
 class User(MongoengineObjectType):
     class Meta:
         model = UserModel
 
 
+class PostConnection(relay.Connection):
+    class Meta:
+        node = Post
+
+
+# GraphQL fields on Post that are resolved from a differently named model field
+POST_FIELD_ALIASES = {"comments": "comment_ids", "all_comments": "all_comment_ids"}
+
+
+def post_projection(info, path=()):
+    return projection(
+        PostModel,
+        selected_fields(info, path),
+        aliases=POST_FIELD_ALIASES,
+        required=("id", "post_date"),
+    )
+
+
+def post_page(queryset, info, first, after):
+    posts, has_next_page = paginate_posts(
+        queryset, first, after, only=post_projection(info, ("edges", "node"))
+    )
+    edges = [
+        PostConnection.Edge(node=post, cursor=encode_cursor(post)) for post in posts
+    ]
+    return PostConnection(
+        edges=edges,
+        page_info=relay.PageInfo(
+            has_next_page=has_next_page,
+            has_previous_page=after is not None,
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+        ),
+    )
+
+
+def post_list(queryset, info, first, after):
+    if first is None and after is None:
+        only = post_projection(info)
+        queryset = queryset.order_by("-post_date", "-id").max_time_ms(MAX_TIME_MS)
+        return list(queryset.only(*only) if only else queryset)
+    posts, _ = paginate_posts(queryset, first, after, only=post_projection(info))
+    return posts
+
+
+class CommentTreeNode(ObjectType):
+    comment = Field(Comment)
+    depth = Int()
+    reply_count = Int()
+    replies = List(lambda: CommentTreeNode)
+
+
+class CommentTree(ObjectType):
+    total_count = Int()
+    comment_count = Int()
+    has_more = Boolean()
+    nodes = List(CommentTreeNode)
+
+
 class RegisterUser(Mutation):
     class Arguments:
         user_id = String(required=True)
@@ -81,32 +172,49 @@ class Login(Mutation):
 
 
 class Query(ObjectType):
-    posts = List(Post)
+    posts = List(Post, first=Int(), after=String())
     post = Field(Post, id=String(required=True))
     comment = Field(Comment, id=String(required=True))
 
-    posts_by_user = List(Post, user_id=String(required=True))
+    posts_by_user = List(
+        Post, user_id=String(required=True), first=Int(), after=String()
+    )
 
-    def resolve_posts_by_user(self, info, user_id):
-        return list(PostModel.objects(poster_user_info__user_id=user_id))
+    posts_connection = Field(PostConnection, first=Int(), after=String())
+    posts_by_user_connection = Field(
+        PostConnection, user_id=String(required=True), first=Int(), after=String()
+    )
 
-    def resolve_posts(self, info):
-        return list(PostModel.objects.all().order_by("-post_date"))
+    def resolve_posts_by_user(self, info, user_id, first=None, after=None):
+        return post_list(
+            PostModel.objects(poster_user_info__user_id=user_id), info, first, after
+        )
+
+    def resolve_posts(self, info, first=None, after=None):
+        return post_list(PostModel.objects.all(), info, first, after)
+
+    def resolve_posts_connection(self, info, first=None, after=None):
+        return post_page(PostModel.objects.all(), info, first, after)
+
+    def resolve_posts_by_user_connection(self, info, user_id, first=None, after=None):
+        return post_page(
+            PostModel.objects(poster_user_info__user_id=user_id), info, first, after
+        )
 
     def resolve_post(self, info, id):
-        return PostModel.objects.get(id=id)
+        return get_loaders(info).posts.load(id)
 
     def resolve_comment(self, info, id):
-        return CommentModel.objects.get(id=id)
+        return get_loaders(info).comments.load(id)
 
     users = List(User)
     user = Field(User, id=String(required=True))
 
     def resolve_users(self, info):
-        return list(UserModel.objects.all())
+        return list(UserModel.objects.all().max_time_ms(MAX_TIME_MS))
 
     def resolve_user(self, info, id):
-        return UserModel.objects.get(user_id=id)
+        return get_loaders(info).users.load(id)
 
     is_user_registered = Field(
         Boolean,
@@ -127,7 +235,28 @@ class Query(ObjectType):
     comments = List(Comment, ids=List(String, required=True))
 
     def resolve_comments(self, info, ids):
-        return list(CommentModel.objects(id__in=ids))
+        return load_comments(info, ids)
+
+    comment_tree = Field(
+        CommentTree,
+        post_id=String(required=True),
+        max_depth=Int(default_value=5),
+        limit=Int(default_value=20),
+        offset=Int(default_value=0),
+        description="All comments of a post in one query, nested by reply",
+    )
+
+    def resolve_comment_tree(self, info, post_id, max_depth, limit, offset):
+        comments = list(CommentModel.objects(post_id=post_id).max_time_ms(MAX_TIME_MS))
+        loader = get_loaders(info).comments
+        for comment in comments:
+            loader.prime(str(comment.id), comment)
+        return build_comment_tree(
+            comments,
+            max_depth=max(max_depth, 1),
+            limit=max(limit, 0),
+            offset=max(offset, 0),
+        )
 
 
 class UserInfoInput(graphene.InputObjectType):
@@ -216,10 +345,7 @@ class UpvotePost(Mutation):
     post = Field(Post)
 
     def mutate(self, info, post_id):
-        post = PostModel.objects.get(id=post_id)
-        post.update(upvote=post.upvote + 1)
-        post.reload()
-        return UpvotePost(post=post)
+        return UpvotePost(post=record_vote(post_id, "upvote"))
 
 
 class DeletePost(Mutation):
@@ -245,10 +371,7 @@ class DownvotePost(Mutation):
     post = Field(Post)
 
     def mutate(self, info, post_id):
-        post = PostModel.objects.get(id=post_id)
-        post.update(downvote=post.downvote + 1)
-        post.reload()
-        return DownvotePost(post=post)
+        return DownvotePost(post=record_vote(post_id, "downvote"))
 
 
 class Mutation(ObjectType):
@@ -0,0 +1,144 @@
+# indicators.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+INDICATOR_CACHE_TTL = float(os.environ.get("INDICATOR_CACHE_TTL", "3600"))
+# Computed (names, window) results kept, least recently used dropped first
+INDICATOR_CACHE_MAX_ENTRIES = int(os.environ.get("INDICATOR_CACHE_MAX_ENTRIES", "32"))
+
+INDICATORS = ("sma", "ema", "rsi", "macd", "bollinger", "volatility", "returns")
+
+# stock_weekly_data column names -> frame column names
+WEEKLY_COLUMNS = {
+    "1. open": "open",
+    "2. high": "high",
+    "3. low": "low",
+    "4. close": "close",
+    "5. volume": "volume",
+}
+
+WEEKS_PER_YEAR = 52
+
+
+def weekly_frame(documents):
+    """Typed, (symbol, date)-sorted frame from stock_weekly_data rows."""
+    frame = pd.DataFrame(documents).rename(columns=WEEKLY_COLUMNS)
+    frame = frame.drop(columns=["_id"], errors="ignore")
+    # An empty collection still gives the columns compute_indicators reads
+    columns = ["symbol", "date", *WEEKLY_COLUMNS.values()]
+    frame = frame.reindex(columns=frame.columns.union(columns, sort=False))
+    frame["symbol"] = frame["symbol"].astype("category")
+    frame["date"] = pd.to_datetime(frame["date"])
+    for column in WEEKLY_COLUMNS.values():
+        frame[column] = pd.to_numeric(frame[column], errors="coerce")
+    return frame.sort_values(["symbol", "date"], kind="stable").reset_index(drop=True)
+
+
+def compute_indicators(frame, names=INDICATORS, window=20):
+    """Indicators for every symbol of a (symbol, date)-sorted frame in one
+    pass. Rolling windows run over the whole column and are masked where
+    they would cross into the previous symbol, so nothing loops per row or
+    per symbol in Python."""
+    names = set(names)
+    close = frame["close"]
+    by_symbol = frame.groupby("symbol", sort=False, observed=True)
+    position = by_symbol.cumcount().to_numpy()
+    out = frame[["symbol", "date", "close"]].copy()
+
+    def rolling(series, fn):
+        values = getattr(series.rolling(window, min_periods=window), fn)()
+        return values.where(position >= window - 1)
+
+    def ewm(series, **kwargs):
+        grouped = series.groupby(frame["symbol"], sort=False, observed=True)
+        values = grouped.ewm(adjust=False, **kwargs).mean()
+        return values.reset_index(level=0, drop=True)
+
+    returns = close.pct_change().where(position >= 1)
+    if "returns" in names:
+        out["returns"] = returns
+    if "sma" in names or "bollinger" in names:
+        sma = rolling(close, "mean")
+        if "sma" in names:
+            out["sma"] = sma
+        if "bollinger" in names:
+            std = rolling(close, "std")
+            out["bollinger_mid"] = sma
+            out["bollinger_upper"] = sma + 2 * std
+            out["bollinger_lower"] = sma - 2 * std
+    if "ema" in names:
+        out["ema"] = ewm(close, span=window)
+    if "rsi" in names:
+        delta = close.diff().where(position >= 1)
+        gain = ewm(delta.clip(lower=0), alpha=1 / window)
+        loss = ewm(-delta.clip(upper=0), alpha=1 / window)
+        rsi = 100 - 100 / (1 + gain / loss)
+        out["rsi"] = rsi.where(position >= window)
+    if "macd" in names:
+        macd = ewm(close, span=12) - ewm(close, span=26)
+        out["macd"] = macd
+        out["macd_signal"] = ewm(macd, span=9)
+        out["macd_hist"] = out["macd"] - out["macd_signal"]
+    if "volatility" in names:
+        # Annualized standard deviation of weekly returns
+        std = returns.rolling(window, min_periods=window).std()
+        out["volatility"] = std.where(position >= window) * np.sqrt(WEEKS_PER_YEAR)
+    return out
+
+
+class IndicatorCache:
+    """Computed indicator frames for all symbols, keyed on (names, window),
+    at most ``max_entries`` of them (LRU)."""
+
+    def __init__(self, load_frame, ttl=INDICATOR_CACHE_TTL,
+                 max_entries=INDICATOR_CACHE_MAX_ENTRIES):
+        self.load_frame = load_frame
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._frame = None
+        self._loaded_at = 0.0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, names, window):
+        key = (tuple(sorted(names)), window)
+        with self._lock:
+            if self._frame is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._frame = self.load_frame()
+                self._loaded_at = time.monotonic()
+                self._results.clear()
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+            result = self._results[key] = compute_indicators(self._frame, names, window)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+            return result
+
+    def clear(self):
+        with self._lock:
+            self._frame = None
+            self._results.clear()
+
+
+def indicator_rows(result, symbols, start=None, end=None):
+    """``{symbol: [row, ...]}`` for the requested symbols and date range."""
+    selected = result[result["symbol"].isin(symbols)]
+    if start:
+        selected = selected[selected["date"] >= pd.Timestamp(start)]
+    if end:
+        selected = selected[selected["date"] <= pd.Timestamp(end)]
+    selected = selected.assign(
+        symbol=selected["symbol"].astype(str),
+        date=selected["date"].dt.strftime("%Y-%m-%d"),
+    )
+    selected = selected.astype(object).where(selected.notna(), None)
+    grouped = {symbol: [] for symbol in symbols}
+    for row in selected.to_dict("records"):
+        grouped[row["symbol"]].append(row)
+    return grouped
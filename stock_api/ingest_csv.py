@@ -0,0 +1,278 @@
+# ingest_csv.py
+"""Load the ``data/*.csv`` files into the StockInfoDB collections read by
+rest_api and create the indexes its queries need.
+
+    python stock_api/ingest_csv.py [--only cash_flow ...] [--force]
+        [--invalidate-url http://localhost:5001/api/cache/invalidate]
+
+Files are streamed in chunks and written with unordered ``bulk_write``
+upserts keyed on each collection's natural key. A per-collection state
+document remembers the file checksum, and a row state collection holds one
+small document per row with its hash, so re-running only writes rows that
+changed, deletes rows that disappeared from the file and skips unchanged
+files entirely. Rows repeating a key are reduced to the most complete
+one before writing. ``--invalidate-url`` sends the
+CACHE_INVALIDATE_TOKEN environment variable, which the server must share.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+from itertools import islice
+
+import yaml
+from pymongo import ASCENDING, DeleteOne, IndexModel, MongoClient, ReplaceOne, UpdateOne
+from pymongo.errors import OperationFailure
+
+STATE_COLLECTION = "_ingest_state"
+# One document per ingested row: {"collection", "key": [...], "hash"}. Kept
+# apart from the state document, which would outgrow Mongo's 16 MB limit.
+ROW_STATE_COLLECTION = "_ingest_rows"
+ROW_STATE_INDEXES = [
+    IndexModel([("collection", ASCENDING), ("key", ASCENDING)], unique=True),
+]
+
+COLLECTIONS = {
+    "stock_weekly_data": {
+        "file": "stock_weekly_data.csv",
+        "key": ("symbol", "date"),
+        "indexes": [
+            IndexModel([("symbol", ASCENDING), ("date", ASCENDING)], unique=True),
+            IndexModel(
+                [("symbol", ASCENDING), ("date", ASCENDING), ("_id", ASCENDING)]
+            ),
+        ],
+    },
+    "cash_flow": {
+        "file": "cash_flow.csv",
+        "key": ("symbol", "fiscalDateEnding"),
+        "indexes": [
+            IndexModel(
+                [("symbol", ASCENDING), ("fiscalDateEnding", ASCENDING)], unique=True
+            ),
+        ],
+    },
+    "quarterly_earnings": {
+        "file": "quarterly_earnings.csv",
+        "key": ("symbol", "fiscalDateEnding"),
+        "indexes": [
+            IndexModel(
+                [("symbol", ASCENDING), ("fiscalDateEnding", ASCENDING)], unique=True
+            ),
+        ],
+    },
+    "company_overview": {
+        "file": "company_overview.csv",
+        "key": ("Symbol",),
+        "indexes": [IndexModel([("Symbol", ASCENDING)], unique=True)]
+        + [
+            IndexModel([(field, ASCENDING)])
+            for field in ("Name", "PEGRatio", "MarketCapitalization", "Beta")
+        ],
+    },
+    "news_sentiment": {
+        "file": "news_sentiment.csv",
+        "key": ("ticket_number", "time_published", "url"),
+        "indexes": [
+            IndexModel([("ticket_number", ASCENDING), ("time_published", ASCENDING)]),
+        ],
+    },
+}
+
+
+def convert(value):
+    """CSV cell to a Mongo value: "None"/empty become null, numbers become
+    int/float, everything else stays a string."""
+    if value is None or value in ("None", ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def read_rows(path, key_fields):
+    with open(path, newline="") as file:
+        for row in csv.DictReader(file):
+            document = {k: convert(v) for k, v in row.items()}
+            # Key fields keep their text form so they match query strings.
+            for field in key_fields:
+                document[field] = row.get(field)
+            yield document
+
+
+def kept_rows(path, key_fields):
+    """Index of the row kept for each key, and the number of duplicate rows
+    dropped. Of rows sharing a key the most complete one wins (ties go to
+    the later row), so the upserts do not depend on bulk write order."""
+    kept = {}
+    duplicates = 0
+    for index, document in enumerate(read_rows(path, key_fields)):
+        key = tuple(document[f] for f in key_fields)
+        filled = sum(value is not None for value in document.values())
+        if key in kept:
+            duplicates += 1
+            if filled < kept[key][0]:
+                continue
+        kept[key] = (filled, index)
+    return {index for _, index in kept.values()}, duplicates
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def row_hash(document):
+    raw = json.dumps(document, sort_keys=True, default=str).encode()
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+def ensure_indexes(db, names=COLLECTIONS):
+    db[ROW_STATE_COLLECTION].create_indexes(ROW_STATE_INDEXES)
+    for name in names:
+        try:
+            db[name].create_indexes(COLLECTIONS[name]["indexes"])
+        except OperationFailure as e:
+            # Usually duplicate keys left over from an earlier loader.
+            print(f"Could not create indexes on {name}: {e}")
+
+
+def ingest_collection(db, name, data_dir, chunk_size=1000, force=False):
+    """Sync one collection with its CSV. Returns the set of symbols whose
+    rows changed (empty when the file is unchanged or missing)."""
+    spec = COLLECTIONS[name]
+    path = os.path.join(data_dir, spec["file"])
+    if not os.path.exists(path):
+        print(f"{name}: {path} not found, skipped")
+        return set()
+
+    checksum = file_checksum(path)
+    state = db[STATE_COLLECTION].find_one({"_id": name}) or {}
+    if state.get("checksum") == checksum and not force:
+        print(f"{name}: unchanged, skipped")
+        return set()
+
+    key_fields = spec["key"]
+    row_state = db[ROW_STATE_COLLECTION]
+    previous = {
+        tuple(row["key"]): row["hash"]
+        for row in row_state.find({"collection": name}, {"_id": 0, "key": 1, "hash": 1})
+    }
+    kept, duplicates = kept_rows(path, key_fields)
+    if duplicates:
+        print(f"{name}: {duplicates} duplicate keys, kept the most complete rows")
+    rows = (
+        document
+        for index, document in enumerate(read_rows(path, key_fields))
+        if index in kept
+    )
+    current = {}
+    changed_symbols = set()
+    written = 0
+    for chunk in chunked(rows, chunk_size):
+        operations = []
+        hashes = []
+        for document in chunk:
+            key = tuple(document[f] for f in key_fields)
+            digest = current[key] = row_hash(document)
+            if previous.get(key) == digest and not force:
+                continue
+            # Whole-document replace: several columns ("4. close", ...)
+            # contain dots and cannot be written with $set.
+            operations.append(
+                ReplaceOne(dict(zip(key_fields, key)), document, upsert=True)
+            )
+            if previous.get(key) != digest:
+                hashes.append(
+                    UpdateOne(
+                        {"collection": name, "key": list(key)},
+                        {"$set": {"hash": digest}},
+                        upsert=True,
+                    )
+                )
+            changed_symbols.add(key[0])
+        if operations:
+            db[name].bulk_write(operations, ordered=False)
+            written += len(operations)
+        # Hashes are recorded after their rows are written, so an
+        # interrupted run rewrites the rest next time
+        if hashes:
+            row_state.bulk_write(hashes, ordered=False)
+
+    removed = [key for key in previous if key not in current]
+    for chunk in chunked(removed, chunk_size):
+        db[name].bulk_write(
+            [DeleteOne(dict(zip(key_fields, key))) for key in chunk], ordered=False
+        )
+        row_state.bulk_write(
+            [DeleteOne({"collection": name, "key": list(key)}) for key in chunk],
+            ordered=False,
+        )
+        changed_symbols.update(key[0] for key in chunk)
+
+    db[STATE_COLLECTION].replace_one(
+        {"_id": name}, {"_id": name, "checksum": checksum}, upsert=True
+    )
+    print(f"{name}: {written} rows upserted, {len(removed)} removed")
+    return changed_symbols
+
+
+def invalidate_cache(url, name, symbols, token=None):
+    """Tell a running API server to drop cached responses for ``symbols``."""
+    import requests
+
+    headers = {"X-Cache-Token": token} if token else {}
+    # Past a handful of symbols one collection-wide call is cheaper.
+    targets = sorted(symbols) if len(symbols) <= 20 else [None]
+    for symbol in targets:
+        requests.post(
+            url, json={"collection": name, "symbol": symbol}, headers=headers, timeout=5
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--data-dir", default="./data")
+    parser.add_argument("--only", nargs="+", choices=sorted(COLLECTIONS))
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--force", action="store_true", help="rewrite every row")
+    parser.add_argument("--invalidate-url")
+    args = parser.parse_args()
+
+    with open("secret.yml", "r") as file:
+        config = yaml.safe_load(file)
+    db = MongoClient(config["MONGO_URI"])["StockInfoDB"]
+
+    names = args.only or list(COLLECTIONS)
+    ensure_indexes(db, names)
+    for name in names:
+        symbols = ingest_collection(db, name, args.data_dir, args.chunk_size, args.force)
+        if symbols and args.invalidate_url:
+            invalidate_cache(
+                args.invalidate_url,
+                name,
+                symbols,
+                os.environ.get("CACHE_INVALIDATE_TOKEN"),
+            )
+
+
+if __name__ == "__main__":
+    main()
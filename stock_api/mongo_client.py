@@ -0,0 +1,160 @@
+# mongo_client.py
+"""The process's one MongoDB client, shared by the pymongo code (rest_api)
+and the mongoengine documents (GraphQL).
+
+    connect(MongoURI)               # once, at startup
+    db = get_database()             # the same client mongoengine uses
+    collection = stock_collection("cash_flow")
+
+``connect`` registers the client as mongoengine's default connection, so
+both layers use one connection pool. Its settings come from the
+environment:
+
+- ``MONGO_MAX_POOL_SIZE`` / ``MONGO_MIN_POOL_SIZE``: connections per server
+- ``MONGO_MAX_IDLE_TIME_MS``: idle connections are closed after this long
+- ``MONGO_SERVER_SELECTION_TIMEOUT_MS`` / ``MONGO_CONNECT_TIMEOUT_MS``: fail
+  fast when the server is unreachable instead of after 30 s
+- ``MONGO_COMPRESSORS``: wire compression, zlib by default ("zstd" and
+  "snappy" need their Python packages; pymongo skips unavailable ones)
+- ``MONGO_READ_PREFERENCE``: default read preference of the client
+- ``MONGO_STOCK_READ_PREFERENCE``: read preference of the read-only stock
+  collections (``stock_collection``), secondaryPreferred by default
+- ``MONGO_MAX_TIME_MS`` / ``MONGO_BULK_MAX_TIME_MS``: server-side time limit
+  of request queries and of multi-symbol, full-collection or unpaged series
+  reads; a query past its limit fails with ``ExecutionTimeout`` instead of
+  holding a worker
+
+A connection pool listener counts open, in-use and waiting connections per
+server for the health endpoint (``pool_stats``).
+"""
+import os
+import threading
+
+import mongoengine
+from mongoengine.connection import DEFAULT_CONNECTION_NAME, ConnectionFailure
+from pymongo import monitoring
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+
+DB_NAME = "StockInfoDB"
+MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "100"))
+MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "0"))
+MAX_IDLE_TIME_MS = int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", "60000"))
+SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+COMPRESSORS = os.environ.get("MONGO_COMPRESSORS", "zlib")
+READ_PREFERENCE = os.environ.get("MONGO_READ_PREFERENCE", "primary")
+STOCK_READ_PREFERENCE = os.environ.get("MONGO_STOCK_READ_PREFERENCE", "secondaryPreferred")
+MAX_TIME_MS = int(os.environ.get("MONGO_MAX_TIME_MS", "5000"))
+BULK_MAX_TIME_MS = int(os.environ.get("MONGO_BULK_MAX_TIME_MS", "30000"))
+
+def read_preference(name):
+    """A pymongo read preference from its URI name ("secondaryPreferred")."""
+    return make_read_preference(read_pref_mode_from_name(name), None)
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection counts per server address, from pymongo's connection
+    monitoring (CMAP) events of every client created with this listener."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.servers = {}
+
+    def _server(self, address):
+        key = "%s:%s" % address
+        server = self.servers.get(key)
+        if server is None:
+            server = self.servers[key] = {
+                "open": 0, "in_use": 0, "waiting": 0,
+                "checkouts": 0, "checkout_failures": 0, "cleared": 0,
+            }
+        return server
+
+    def _update(self, address, **changes):
+        with self._lock:
+            server = self._server(address)
+            for name, change in changes.items():
+                server[name] += change
+
+    def pool_created(self, event):
+        self._update(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._update(event.address, cleared=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._update(event.address, open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(event.address, open=-1)
+
+    def connection_check_out_started(self, event):
+        self._update(event.address, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._update(event.address, waiting=-1, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._update(event.address, waiting=-1, in_use=1, checkouts=1)
+
+    def connection_checked_in(self, event):
+        self._update(event.address, in_use=-1)
+
+    def stats(self):
+        with self._lock:
+            return {address: dict(server) for address, server in self.servers.items()}
+
+
+pool_listener = PoolStats()
+
+
+def client_options():
+    """MongoClient (and AsyncIOMotorClient) keyword arguments."""
+    return {
+        "maxPoolSize": MAX_POOL_SIZE,
+        "minPoolSize": MIN_POOL_SIZE,
+        "maxIdleTimeMS": MAX_IDLE_TIME_MS,
+        "serverSelectionTimeoutMS": SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": CONNECT_TIMEOUT_MS,
+        "compressors": COMPRESSORS,
+        "read_preference": read_preference(READ_PREFERENCE),
+        "event_listeners": [pool_listener],
+    }
+
+
+def connect(uri, db=DB_NAME, alias=DEFAULT_CONNECTION_NAME):
+    """Create the shared client (first call only) and return it."""
+    try:
+        return mongoengine.get_connection(alias)
+    except ConnectionFailure:
+        pass
+    mongoengine.connect(db=db, host=uri, alias=alias, **client_options())
+    return mongoengine.get_connection(alias)
+
+
+def get_database(name=DB_NAME, alias=DEFAULT_CONNECTION_NAME):
+    return mongoengine.get_connection(alias)[name]
+
+
+def stock_collection(name, db=None):
+    """One of the collections loaded by ingest_csv.py, which the API only
+    reads, with the stock read preference so reads can go to secondaries.
+    ``db`` may be a motor database."""
+    db = get_database() if db is None else db
+    return db.get_collection(name, read_preference=read_preference(STOCK_READ_PREFERENCE))
+
+
+def pool_stats():
+    return {
+        "max_pool_size": MAX_POOL_SIZE,
+        "servers": pool_listener.stats(),
+    }
@@ -0,0 +1,63 @@
+# mongo_json.py
+import json
+import math
+from datetime import date, datetime
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from flask import Response
+from tracing import span
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal128):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _scrub(data):
+    # Only used by the stdlib fallback, which cannot encode NaN as null.
+    if isinstance(data, dict):
+        return {k: _scrub(v) for k, v in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_scrub(item) for item in data]
+    if isinstance(data, float) and not math.isfinite(data):
+        return None
+    return data
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_SORT_KEYS
+
+    def dumps(data):
+        """Encode Mongo documents straight to JSON bytes: ObjectId as its
+        hex string, datetimes as ISO 8601 and NaN/inf as null."""
+        return orjson.dumps(data, default=_default, option=_OPTIONS)
+
+else:
+
+    def dumps(data):
+        """Encode Mongo documents straight to JSON bytes: ObjectId as its
+        hex string, datetimes as ISO 8601 and NaN/inf as null."""
+        return json.dumps(
+            _scrub(data),
+            default=_default,
+            sort_keys=True,
+            separators=(",", ":"),
+            allow_nan=False,
+        ).encode()
+
+
+def json_response(data, status=200):
+    with span("serialize"):
+        body = dumps(data)
+    return Response(body, status=status, mimetype="application/json")
@@ -0,0 +1,190 @@
+# response_cache.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, make_response, request
+
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "300"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+
+# Field holding the ticker in each cached collection, used by change streams
+SYMBOL_FIELDS = {
+    "company_overview": "Symbol",
+    "cash_flow": "symbol",
+    "quarterly_earnings": "symbol",
+    "stock_weekly_data": "symbol",
+    "news_sentiment": "ticket_number",
+}
+
+# Response headers worth replaying on a cache hit
+REPLAYED_HEADERS = ("X-Next-Cursor",)
+
+
+class CacheEntry:
+    __slots__ = ("body", "status", "mimetype", "headers", "etag", "expires",
+                 "collection", "symbols")
+
+    def __init__(self, body, status, mimetype, headers, collection, symbols, ttl):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.headers = headers
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.expires = time.monotonic() + ttl
+        self.collection = collection
+        self.symbols = symbols
+
+
+class ResponseCache:
+    """Bounded TTL + LRU cache of serialized response bodies."""
+
+    def __init__(self, ttl=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+        self.expirations = self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, collection=None, symbol=None):
+        """Drop entries for ``collection`` (all collections when ``None``)
+        that may contain ``symbol``. Entries not tied to a symbol, such as
+        sorted listings, are always dropped. Returns the number removed."""
+        with self._lock:
+            stale = [
+                key
+                for key, entry in self._entries.items()
+                if (collection is None or entry.collection == collection)
+                and (symbol is None or not entry.symbols or symbol in entry.symbols)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        return self.invalidate()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "bytes": sum(len(e.body) for e in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+response_cache = ResponseCache()
+
+
+def _cache_key():
+    args = sorted((k, v) for k, v in request.args.items(multi=True) if v != "")
+    return request.endpoint, tuple(args)
+
+
+def _request_symbols():
+    symbols = {s.strip().upper() for s in request.args.getlist("symbol") if s.strip()}
+    for value in request.args.getlist("symbols"):
+        symbols.update(s.strip().upper() for s in value.split(",") if s.strip())
+    return frozenset(symbols)
+
+
+def _from_entry(entry):
+    response = Response(entry.body, status=entry.status, mimetype=entry.mimetype)
+    response.headers.extend(entry.headers)
+    return response
+
+
+def cached(collection, cache=response_cache):
+    """Serve a GET view from ``cache``, keyed on the endpoint and its
+    normalized query args, with ETag / If-None-Match support. Streamed and
+    non-200 responses are passed through uncached."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.args.get("stream"):
+                return view(*args, **kwargs)
+            key = _cache_key()
+            entry = cache.get(key)
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                entry = CacheEntry(
+                    response.get_data(),
+                    response.status_code,
+                    response.mimetype,
+                    [(h, response.headers[h]) for h in REPLAYED_HEADERS
+                     if h in response.headers],
+                    collection,
+                    _request_symbols(),
+                    cache.ttl,
+                )
+                cache.put(key, entry)
+            else:
+                response = _from_entry(entry)
+            response.set_etag(entry.etag)
+            return response.make_conditional(request)
+
+        return wrapper
+
+    return decorator
+
+
+def watch_for_changes(db, cache=response_cache, collections=tuple(SYMBOL_FIELDS)):
+    """Invalidate ``cache`` from a Mongo change stream on ``collections``.
+
+    Runs in a daemon thread; change streams need a replica set, so on a
+    standalone server this logs the error and the cache relies on TTL and
+    explicit invalidation only.
+    """
+
+    def run():
+        pipeline = [{"$match": {"ns.coll": {"$in": list(collections)}}}]
+        try:
+            with db.watch(pipeline, full_document="updateLookup") as stream:
+                for change in stream:
+                    name = change["ns"]["coll"]
+                    document = change.get("fullDocument") or {}
+                    cache.invalidate(name, document.get(SYMBOL_FIELDS.get(name)))
+        except Exception as e:
+            print(f"Response cache change stream stopped: {e}")
+
+    thread = threading.Thread(target=run, name="response-cache-watch", daemon=True)
+    thread.start()
+    return thread
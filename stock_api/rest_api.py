@@ -1,48 +1,66 @@
 # rest_api.py
+import hmac
+import os
 from datetime import datetime
-from math import isnan
 
-import yaml
-from bson.json_util import dumps
 from flask import Blueprint, jsonify, request
-from pymongo import ASCENDING, DESCENDING, MongoClient
+from bulk_query import (WEEKLY_VALUE_FIELDS, bulk_filter, bulk_projection,
+                        group_by_symbol, parse_symbols, weekly_matrix)
+from config_utils import load_config
+from indicators import INDICATORS, IndicatorCache, indicator_rows, weekly_frame
+from mongo_client import BULK_MAX_TIME_MS, MAX_TIME_MS, connect, stock_collection
+from mongo_json import json_response
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import ExecutionTimeout
+from response_cache import cached, response_cache, watch_for_changes
+from series_query import (TIMEOUT_ERROR, SeriesQuery, date_range_filter, series_response,
+                          split_list)
 
 rest_api = Blueprint("rest_api", __name__)
 
-with open("secret.yml", "r") as file:
-    config = yaml.safe_load(file)
-MongoURI = config["MONGO_URI"]
+# Same cached secret.yml the server read at startup
+MongoURI = load_config()["MONGO_URI"]
 
-# Connect to MongoDB
-client = MongoClient(MongoURI)
+# The client shared with mongoengine (see mongo_client); the server has
+# usually connected it already
+client = connect(MongoURI)
 db = client["StockInfoDB"]
-collection = db["company_overview"]
-cash_flow_collection = db["cash_flow"]
-quarterly_earnings_collection = db["quarterly_earnings"]
-stock_weekly_data_collection = db["stock_weekly_data"]
-news_sentiment_collection = db["news_sentiment"]
-
-def process_data(data):
-    if isinstance(data, dict):
-        return {k: process_data(v) for k, v in data.items() if k != '_id'}
-    elif isinstance(data, list):
-        return [process_data(item) for item in data]
-    elif isinstance(data, float) and isnan(data):
-        # Convert NaN values to the string "NaN"
-        return "NaN"
-    else:
-        return data
+collection = stock_collection("company_overview", db)
+cash_flow_collection = stock_collection("cash_flow", db)
+quarterly_earnings_collection = stock_collection("quarterly_earnings", db)
+stock_weekly_data_collection = stock_collection("stock_weekly_data", db)
+news_sentiment_collection = stock_collection("news_sentiment", db)
+
+indicator_cache = IndicatorCache(
+    lambda: weekly_frame(
+        stock_weekly_data_collection.find({}, {"_id": 0}).max_time_ms(BULK_MAX_TIME_MS)
+    )
+)
+
+# Invalidate cached responses from Mongo change streams (needs a replica set)
+if os.environ.get("RESPONSE_CACHE_WATCH"):
+    watch_for_changes(db)
+
+
+@rest_api.errorhandler(ExecutionTimeout)
+def query_timeout(e):
+    # A query ran past its maxTimeMS guard
+    return jsonify({"error": TIMEOUT_ERROR}), 504
+
 
 @rest_api.route("/company_overview", methods=["GET"])
+@cached("company_overview")
 def get_company_overview():
     symbol = request.args.get("symbol")
     sort_field = request.args.get("sort_field")
     sort_order = request.args.get("sort_order", default="asc")
     limit = request.args.get("limit", default=10, type=int)
     if symbol:
-        company_data = collection.find_one({"Symbol": symbol}, {"_id": 0})
+        company_data = collection.find_one(
+            {"Symbol": symbol}, {"_id": 0}, max_time_ms=MAX_TIME_MS
+        )
         if company_data:
-            return jsonify({"response": process_data(company_data)})
+            return json_response({"response": company_data})
         else:
             return jsonify({"error": "Company not found"}), 404
     elif sort_field:
@@ -61,91 +79,177 @@ def get_company_overview():
             collection.find({}, {"_id": 0})
             .sort(sort_field, pymongo_sort_order)
             .limit(limit)
+            .max_time_ms(MAX_TIME_MS)
         )
         if companies:
-            return {"response": dumps(companies)}
+            return json_response({"response": companies})
         else:
             return jsonify({"error": "No companies found"}), 404
     else:
         return jsonify({"error": "Symbol or sort_field parameter is required"}), 400
 
 
+def series_endpoint(collection, symbol_field, date_field, transform=None, **kwargs):
+    try:
+        query = SeriesQuery(request.args, symbol_field, date_field, **kwargs)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    response = series_response(query, query.find(collection), transform)
+    if response is None:
+        return jsonify({"error": "Data not found"}), 404
+    return response
+
+
+def format_news(document):
+    if "time_published" in document:
+        dt = datetime.strptime(document["time_published"], "%Y%m%dT%H%M%S")
+        document["time_published"] = dt.strftime("%Y/%m/%d %H:%M")
+    return document
+
+
 @rest_api.route("/cash_flow", methods=["GET"])
+@cached("cash_flow")
 def get_cash_flow():
-    symbol = request.args.get("symbol")
-    sort_field = request.args.get("sort_field")
-    sort_order = request.args.get("sort_order", default="asc")
-    pymongo_sort_order = ASCENDING if sort_order == "asc" else DESCENDING
-    documents = list(
-        cash_flow_collection.find({"symbol": symbol}).sort(
-            sort_field, pymongo_sort_order
-        )
-    )
-    if documents:
-        for document in documents:
-            document["_id"] = str(document["_id"])
-            for key, value in document.items():
-                if isinstance(value, float) and isnan(value):
-                    document[key] = None
-        return jsonify(documents)
-    else:
-        return jsonify({"error": "Data not found"}), 404
+    return series_endpoint(cash_flow_collection, "symbol", "fiscalDateEnding")
 
 
 @rest_api.route("/quarterly_earnings", methods=["GET"])
+@cached("quarterly_earnings")
 def get_quarterly_earnings():
-    symbol = request.args.get("symbol")
-    sort_field = request.args.get("sort_field")
-    sort_order = request.args.get("sort_order", default="asc")
-    pymongo_sort_order = ASCENDING if sort_order == "asc" else DESCENDING
-    documents = list(
-        quarterly_earnings_collection.find({"symbol": symbol}).sort(
-            sort_field, pymongo_sort_order
-        )
+    return series_endpoint(
+        quarterly_earnings_collection, "symbol", "fiscalDateEnding"
     )
-    if documents:
-        for document in documents:
-            document["_id"] = str(document["_id"])
-        return jsonify(documents)
-    else:
-        return jsonify({"error": "Data not found"}), 404
 
 
 @rest_api.route("/stock_weekly_data", methods=["GET"])
+@cached("stock_weekly_data")
 def get_weekly_data():
-    symbol = request.args.get("symbol")
-    sort_field = request.args.get("sort_field")
-    sort_order = request.args.get("sort_order", default="asc")
-    pymongo_sort_order = ASCENDING if sort_order == "asc" else DESCENDING
-    documents = list(
-        stock_weekly_data_collection.find({"symbol": symbol}).sort(
-            sort_field, pymongo_sort_order
-        )
-    )
-    if documents:
-        for document in documents:
-            document["_id"] = str(document["_id"])
-        return jsonify(documents), 200
-    else:
-        return jsonify({"error": "Data not found"}), 404
+    return series_endpoint(stock_weekly_data_collection, "symbol", "date")
 
 
 @rest_api.route("/news_sentiment", methods=["GET"])
+@cached("news_sentiment")
 def get_news_sentiment():
-    symbol = request.args.get("symbol")
-    sort_field = request.args.get("sort_field")
-    sort_order = request.args.get("sort_order", default="asc")
-    pymongo_sort_order = ASCENDING if sort_order == "asc" else DESCENDING
-    documents = list(
-        news_sentiment_collection.find({"ticket_number": symbol}).sort(
-            sort_field, pymongo_sort_order
+    return series_endpoint(
+        news_sentiment_collection,
+        "ticket_number",
+        "time_published",
+        transform=format_news,
+        date_format="%Y%m%dT%H%M%S",
+    )
+
+
+def bulk_series_endpoint(collection, date_field, transform=None):
+    try:
+        symbols = parse_symbols(request.args)
+        query = bulk_filter(request.args, symbols, "symbol", date_field)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    projection = bulk_projection(request.args, "symbol", date_field)
+    documents = (
+        collection.find(query, projection)
+        .sort([("symbol", ASCENDING), (date_field, ASCENDING)])
+        .max_time_ms(BULK_MAX_TIME_MS)
+    )
+    return json_response(group_by_symbol(documents, symbols, "symbol", transform))
+
+
+@rest_api.route("/bulk/company_overview", methods=["GET"])
+@cached("company_overview")
+def get_bulk_company_overview():
+    try:
+        symbols = parse_symbols(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    projection = bulk_projection(request.args, "Symbol") or {}
+    projection["_id"] = 0
+    documents = collection.find(
+        bulk_filter(request.args, symbols, "Symbol"), projection
+    ).max_time_ms(BULK_MAX_TIME_MS)
+    companies = dict.fromkeys(symbols)
+    for document in documents:
+        companies[document["Symbol"]] = document
+    return json_response({"response": companies})
+
+
+@rest_api.route("/bulk/cash_flow", methods=["GET"])
+@cached("cash_flow")
+def get_bulk_cash_flow():
+    return bulk_series_endpoint(cash_flow_collection, "fiscalDateEnding")
+
+
+@rest_api.route("/bulk/quarterly_earnings", methods=["GET"])
+@cached("quarterly_earnings")
+def get_bulk_quarterly_earnings():
+    return bulk_series_endpoint(quarterly_earnings_collection, "fiscalDateEnding")
+
+
+@rest_api.route("/bulk/stock_weekly_data", methods=["GET"])
+@cached("stock_weekly_data")
+def get_bulk_weekly_data():
+    if request.args.get("format", default="grouped") != "matrix":
+        return bulk_series_endpoint(stock_weekly_data_collection, "date")
+    # Wide format: one dates x symbols matrix per requested value
+    try:
+        symbols = parse_symbols(request.args)
+        query = bulk_filter(request.args, symbols, "symbol", "date")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    values = request.args.get("values", default="close,volume").split(",")
+    if any(value not in WEEKLY_VALUE_FIELDS for value in values):
+        return jsonify({"error": "Invalid values"}), 400
+    # The price columns ("4. close", ...) contain dots, so they cannot be
+    # named in a projection; only _id is dropped.
+    documents = stock_weekly_data_collection.find(query, {"_id": 0}).max_time_ms(
+        BULK_MAX_TIME_MS
+    )
+    return json_response(weekly_matrix(documents, symbols, values))
+
+
+@rest_api.route("/indicators", methods=["GET"])
+@cached("stock_weekly_data")
+def get_indicators():
+    try:
+        symbols = parse_symbols(request.args)
+        date_range_filter(request.args)  # validates start/end
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    names = split_list(request.args.get("names")) or list(INDICATORS)
+    if any(name not in INDICATORS for name in names):
+        return jsonify({"error": f"names must be among: {', '.join(INDICATORS)}"}), 400
+    window = request.args.get("window", default=20, type=int)
+    if not 2 <= window <= 260:
+        return jsonify({"error": "window must be between 2 and 260"}), 400
+    result = indicator_cache.get(names, window)
+    return json_response(
+        indicator_rows(
+            result, symbols, request.args.get("start"), request.args.get("end")
         )
     )
-    if documents:
-        for document in documents:
-            document["_id"] = str(document["_id"])
-            dt = datetime.strptime(document["time_published"], "%Y%m%dT%H%M%S")
-            document["time_published"] = dt.strftime("%Y/%m/%d %H:%M")
-        return jsonify(documents)
-    else:
-        return jsonify({"error": "Data not found"}), 404
+
+
+@rest_api.route("/cache/stats", methods=["GET"])
+def get_cache_stats():
+    return jsonify(response_cache.stats())
+
+
+@rest_api.route("/cache/invalidate", methods=["POST"])
+def invalidate_cache():
+    """Hook for the ingest job: drop cached responses for a collection and,
+    optionally, one symbol. Both default to everything. Disabled unless
+    CACHE_INVALIDATE_TOKEN is set; callers send it as X-Cache-Token."""
+    token = os.environ.get("CACHE_INVALIDATE_TOKEN")
+    if not token:
+        return jsonify({"error": "Cache invalidation is disabled (CACHE_INVALIDATE_TOKEN)"}), 404
+    if not hmac.compare_digest(request.headers.get("X-Cache-Token", ""), token):
+        return jsonify({"error": "Forbidden"}), 403
+    data = request.get_json(silent=True) or {}
+    symbol = data.get("symbol")
+    if symbol is not None and not isinstance(symbol, str):
+        return jsonify({"error": "symbol must be a string"}), 400
+    removed = response_cache.invalidate(
+        data.get("collection"), symbol.upper() if symbol else None
+    )
+    if data.get("collection") in (None, "stock_weekly_data"):
+        indicator_cache.clear()
+    return jsonify({"invalidated": removed})
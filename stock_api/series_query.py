@@ -0,0 +1,195 @@
+# series_query.py
+import base64
+import json
+from datetime import datetime
+from itertools import chain
+
+from bson import ObjectId
+from flask import Response, stream_with_context
+from mongo_client import BULK_MAX_TIME_MS, MAX_TIME_MS
+from mongo_json import dumps
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import ExecutionTimeout
+from tracing import span
+
+MAX_LIMIT = 5000
+STREAM_BATCH_SIZE = 500
+STREAM_FORMATS = {"json": "application/json", "ndjson": "application/x-ndjson"}
+# Ends a stream whose query timed out after the response had started
+TIMEOUT_ERROR = "Query timed out"
+
+
+def split_list(value):
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def date_range_filter(args, date_format="%Y-%m-%d"):
+    """Mongo condition for the ``start``/``end`` (``YYYY-MM-DD``) query args,
+    rendered in the collection's own date string format."""
+    date_range = {}
+    for arg, op in (("start", "$gte"), ("end", "$lte")):
+        value = args.get(arg)
+        if value:
+            try:
+                date = datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise ValueError(f"{arg} must be a YYYY-MM-DD date")
+            if arg == "end" and date_format != "%Y-%m-%d":
+                date = date.replace(hour=23, minute=59, second=59)
+            date_range[op] = date.strftime(date_format)
+    return date_range
+
+
+class SeriesQuery:
+    """Filter, projection, sort and paging for one per-symbol time series
+    request, built from the query string of the REST endpoints.
+
+    ``start``/``end`` are ``YYYY-MM-DD`` dates matched against the
+    collection's date field, ``fields`` is a comma separated projection,
+    ``limit``/``cursor`` page through the results in ``sort_field`` order and
+    ``stream=json|ndjson`` writes rows as they come off the Mongo cursor.
+    Requests without a limit read the whole series and get the bulk time
+    limit.
+    """
+
+    def __init__(self, args, symbol_field, date_field, date_format="%Y-%m-%d"):
+        self.symbol = args.get("symbol")
+        self.sort_field = args.get("sort_field") or date_field
+        sort_order = args.get("sort_order", default="asc")
+        self.direction = ASCENDING if sort_order == "asc" else DESCENDING
+
+        self.filter = {symbol_field: self.symbol}
+        date_range = date_range_filter(args, date_format)
+        if date_range:
+            self.filter[date_field] = date_range
+
+        fields = split_list(args.get("fields"))
+        self.projection = None
+        if fields:
+            self.projection = dict.fromkeys(fields + [self.sort_field], 1)
+
+        self.limit = args.get("limit", type=int)
+        if self.limit is not None and not 0 < self.limit <= MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+        cursor = args.get("cursor")
+        if cursor:
+            self.filter = {"$and": [self.filter, self._after(cursor)]}
+
+        self.stream = args.get("stream")
+        if self.stream and self.stream not in STREAM_FORMATS:
+            raise ValueError("stream must be one of: json, ndjson")
+
+    @property
+    def sort(self):
+        return [(self.sort_field, self.direction), ("_id", self.direction)]
+
+    def _after(self, cursor):
+        try:
+            value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            last_id = ObjectId(last_id)
+        except Exception:
+            raise ValueError("Invalid cursor")
+        op = "$gt" if self.direction == ASCENDING else "$lt"
+        return {
+            "$or": [
+                {self.sort_field: {op: value}},
+                {self.sort_field: value, "_id": {op: last_id}},
+            ]
+        }
+
+    def next_cursor(self, document):
+        raw = json.dumps([document.get(self.sort_field), str(document["_id"])])
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def find(self, collection):
+        cursor = (
+            collection.find(self.filter, self.projection)
+            .sort(self.sort)
+            .max_time_ms(MAX_TIME_MS if self.limit else BULK_MAX_TIME_MS)
+        )
+        if self.limit:
+            cursor = cursor.limit(self.limit + 1)
+        return cursor.batch_size(STREAM_BATCH_SIZE)
+
+
+def series_response(query, cursor, transform=None):
+    """Render the rows of ``cursor`` as the response for ``query``.
+
+    Buffered responses keep the plain JSON list body and put the cursor of
+    the next page in the ``X-Next-Cursor`` header. Streamed responses cannot
+    know it up front, so they end with it instead: ``{"data": [...],
+    "next_cursor": ...}`` for JSON and a final ``{"next_cursor": ...}`` line
+    for NDJSON. A query timing out once rows were sent can no longer turn
+    into a 504, so the stream ends with ``"error"`` instead: a key of the
+    JSON object, or a final ``{"error": ...}`` line.
+    """
+    transform = transform or _identity
+    rows = iter(cursor)
+    first = next(rows, None)
+    if first is None:
+        return None
+    rows = chain([first], rows)
+    if query.limit:
+        rows = _limited(rows, query)
+    else:
+        rows = ((document, None) for document in rows)
+
+    if not query.stream:
+        documents, next_cursor = [], None
+        for document, next_cursor in rows:
+            documents.append(transform(document))
+        with span("serialize"):
+            body = dumps(documents)
+        response = Response(body, mimetype="application/json")
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response
+
+    generate = _ndjson if query.stream == "ndjson" else _json_array
+    return Response(
+        stream_with_context(generate(rows, transform)),
+        mimetype=STREAM_FORMATS[query.stream],
+    )
+
+
+def _limited(rows, query):
+    # Yields (document, next_cursor); the cursor is only set on the last row
+    # of a page that has more rows after it.
+    previous = None
+    for count, document in enumerate(rows):
+        if count == query.limit:
+            yield previous, query.next_cursor(previous)
+            return
+        if previous is not None:
+            yield previous, None
+        previous = document
+    if previous is not None:
+        yield previous, None
+
+
+def _identity(document):
+    return document
+
+
+def _json_array(rows, transform):
+    yield b'{"data":['
+    next_cursor = None
+    try:
+        for index, (document, next_cursor) in enumerate(rows):
+            yield (b"," if index else b"") + dumps(transform(document))
+    except ExecutionTimeout:
+        yield b'],"next_cursor":null,"error":' + dumps(TIMEOUT_ERROR) + b"}"
+        return
+    yield b'],"next_cursor":' + dumps(next_cursor) + b"}"
+
+
+def _ndjson(rows, transform):
+    next_cursor = None
+    try:
+        for document, next_cursor in rows:
+            yield dumps(transform(document)) + b"\n"
+    except ExecutionTimeout:
+        yield dumps({"error": TIMEOUT_ERROR}) + b"\n"
+        return
+    if next_cursor:
+        yield dumps({"next_cursor": next_cursor}) + b"\n"
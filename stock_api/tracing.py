@@ -0,0 +1,321 @@
+# tracing.py
+"""Latency and call-count metrics, exported in the Prometheus text format.
+
+    with span("similarity_search"):
+        ...
+
+    @traced("classify_question")
+    def classify_question(query): ...
+
+Spans and ``traced`` functions feed the ``stage_duration_seconds``
+histogram; ``instrument_flask`` adds per-route request histograms; a
+pymongo command listener times every Mongo command; ``llm_callbacks``
+counts and times LLM calls. ``render`` writes everything for /metrics.
+
+``TRACING=0`` turns it all off: ``traced`` returns the function itself,
+``span`` returns a shared no-op object and no hooks or listeners are
+installed. With ``TRACE_LOG=1`` each Flask request also prints its stages.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+
+TRACING = os.environ.get("TRACING", "1") != "0"
+TRACE_LOG = os.environ.get("TRACE_LOG", "0") == "1"
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+# (stage, seconds) pairs of the current request, when TRACE_LOG is on
+_trace = contextvars.ContextVar("trace", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self.values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, labels=()):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            value = self.values.get(labels)
+            if value is None:
+                value = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            value[index] += 1
+            value[-1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = sorted((labels, list(value)) for labels, value in self.values.items())
+        for labels, value in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), value[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {value[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Request latency by route.", ("route", "method")
+)
+requests_total = Counter(
+    "http_requests_total", "Requests by route and status.", ("route", "method", "status")
+)
+stage_duration = Histogram(
+    "stage_duration_seconds", "Latency of traced stages.", ("stage",)
+)
+stage_errors = Counter("stage_errors_total", "Traced stages that raised.", ("stage",))
+db_query_duration = Histogram(
+    "db_query_duration_seconds", "Mongo command latency.", ("command", "collection")
+)
+db_queries = Counter(
+    "db_queries_total", "Mongo commands by outcome.", ("command", "collection", "outcome")
+)
+llm_call_duration = Histogram("llm_call_duration_seconds", "LLM call latency.", ("model",))
+llm_calls = Counter("llm_calls_total", "LLM calls by outcome.", ("model", "outcome"))
+METRICS = [
+    request_duration, requests_total, stage_duration, stage_errors,
+    db_query_duration, db_queries, llm_call_duration, llm_calls,
+]
+
+
+def record_stage(stage, seconds):
+    stage_duration.observe(seconds, (stage,))
+    trace = _trace.get()
+    if trace is not None:
+        trace.append((stage, seconds))
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record_stage(self.stage, time.perf_counter() - self.start)
+        if exc_type is not None:
+            stage_errors.inc((self.stage,))
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage):
+    """Context manager timing one stage."""
+    return _Span(stage) if TRACING else _NO_SPAN
+
+
+def traced(stage):
+    """Decorator timing every call of a function or coroutine function."""
+
+    def decorator(function):
+        if not TRACING:
+            return function
+        if asyncio.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with _Span(stage):
+                    return await function(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _Span(stage):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def observe_request(route, method, status, seconds):
+    request_duration.observe(seconds, (route, method))
+    requests_total.inc((route, method, str(status)))
+
+
+def instrument_flask(app):
+    """Per-route latency and status counts for a Flask app. Routes are
+    labeled with their URL rule, so the label set stays small."""
+    if not TRACING:
+        return
+    from flask import g, request
+
+    @app.before_request
+    def _start_request():
+        g.tracing_start = time.perf_counter()
+        if TRACE_LOG:
+            g.tracing_token = _trace.set([])
+
+    @app.after_request
+    def _finish_request(response):
+        start = g.pop("tracing_start", None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        observe_request(route, request.method, response.status_code, elapsed)
+        token = g.pop("tracing_token", None)
+        if token is not None:
+            stages = ", ".join(f"{stage} {1000 * seconds:.1f} ms" for stage, seconds in _trace.get())
+            print(f"Trace {request.method} {route} {response.status_code} {1000 * elapsed:.1f} ms: {stages}")
+            _trace.reset(token)
+        return response
+
+
+def _command_listener():
+    from pymongo import monitoring
+
+    class CommandMetrics(monitoring.CommandListener):
+        """Times every Mongo command, labeled with its collection."""
+
+        def __init__(self):
+            self.collections = {}
+
+        def started(self, event):
+            collection = event.command.get(event.command_name)
+            self.collections[event.request_id] = (
+                collection if isinstance(collection, str) else ""
+            )
+
+        def _finish(self, event, outcome):
+            collection = self.collections.pop(event.request_id, "")
+            seconds = event.duration_micros / 1e6
+            db_query_duration.observe(seconds, (event.command_name, collection))
+            db_queries.inc((event.command_name, collection, outcome))
+            trace = _trace.get()
+            if trace is not None:
+                trace.append((f"mongo {event.command_name} {collection}", seconds))
+
+        def succeeded(self, event):
+            self._finish(event, "ok")
+
+        def failed(self, event):
+            self._finish(event, "error")
+
+    return CommandMetrics()
+
+
+_llm_callbacks = None
+
+
+def llm_callbacks():
+    """LangChain callback handlers counting and timing LLM calls; pass them
+    to a chat model's ``callbacks``."""
+    global _llm_callbacks
+    if not TRACING:
+        return []
+    if _llm_callbacks is None:
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        class LLMMetrics(BaseCallbackHandler):
+            def __init__(self):
+                self.starts = {}
+
+            def _start(self, serialized, run_id):
+                kwargs = (serialized or {}).get("kwargs", {})
+                model = kwargs.get("model_name") or kwargs.get("model") or "unknown"
+                self.starts[run_id] = model, time.perf_counter()
+
+            def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+                self._start(serialized, run_id)
+
+            def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+                self._start(serialized, run_id)
+
+            def _finish(self, run_id, outcome):
+                started = self.starts.pop(run_id, None)
+                if started is None:
+                    return
+                model, start = started
+                llm_call_duration.observe(time.perf_counter() - start, (model,))
+                llm_calls.inc((model, outcome))
+
+            def on_llm_end(self, response, *, run_id, **kwargs):
+                self._finish(run_id, "ok")
+
+            def on_llm_error(self, error, *, run_id, **kwargs):
+                self._finish(run_id, "error")
+
+        _llm_callbacks = [LLMMetrics()]
+    return _llm_callbacks
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Listeners only apply to clients created afterwards, so modules that
+# create Mongo clients import this module first.
+if TRACING:
+    from pymongo import monitoring
+
+    monitoring.register(_command_listener())
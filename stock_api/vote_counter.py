@@ -0,0 +1,114 @@
+# vote_counter.py
+import atexit
+import os
+import threading
+from collections import defaultdict
+
+from bson import ObjectId
+from graphql_models import Post as PostModel
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+# Write-behind interval for post votes; 0 keeps every vote a direct $inc.
+# With write-behind a vote does not read the post: the returned post holds
+# its id and the votes still buffered for it, not the stored totals.
+VOTE_FLUSH_INTERVAL_MS = int(os.environ.get("VOTE_FLUSH_INTERVAL_MS", "0"))
+
+VOTE_FIELDS = ("upvote", "downvote")
+
+
+def increment_vote(post_id, field):
+    """Atomically ``$inc`` one vote counter and return the updated post."""
+    post = PostModel.objects(id=post_id).modify(**{f"inc__{field}": 1}, new=True)
+    if post is None:
+        raise PostModel.DoesNotExist(f"Post {post_id} does not exist")
+    return post
+
+
+class VoteBuffer:
+    """Groups vote increments per post in memory and flushes them in bulk."""
+
+    def __init__(self, interval_ms):
+        self.interval = interval_ms / 1000.0
+        self._pending = defaultdict(lambda: dict.fromkeys(VOTE_FIELDS, 0))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, post_id, field, amount=1):
+        ObjectId(post_id)  # raises InvalidId before anything is buffered
+        with self._lock:
+            self._pending[str(post_id)][field] += amount
+        self.start()
+
+    def pending(self, post_id):
+        with self._lock:
+            counts = self._pending.get(str(post_id))
+            return dict(counts) if counts else dict.fromkeys(VOTE_FIELDS, 0)
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, defaultdict(
+                lambda: dict.fromkeys(VOTE_FIELDS, 0)
+            )
+        batch = [(post_id, counts) for post_id, counts in batch.items() if any(counts.values())]
+        operations = [
+            UpdateOne(
+                {"_id": ObjectId(post_id)},
+                {"$inc": {k: v for k, v in counts.items() if v}},
+            )
+            for post_id, counts in batch
+        ]
+        if not operations:
+            return 0
+        try:
+            PostModel._get_collection().bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # The other operations of an unordered bulk write were applied;
+            # only the failed ones go back for the next flush.
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            self._requeue(batch[index] for index in sorted(failed))
+            raise
+        except Exception:
+            # Nothing is known to be written: put every count back
+            self._requeue(batch)
+            raise
+        return len(operations)
+
+    def _requeue(self, batch):
+        with self._lock:
+            for post_id, counts in batch:
+                for field, amount in counts.items():
+                    self._pending[post_id][field] += amount
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="vote-flush", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing votes: {e}")
+
+
+vote_buffer = VoteBuffer(VOTE_FLUSH_INTERVAL_MS) if VOTE_FLUSH_INTERVAL_MS > 0 else None
+
+
+def record_vote(post_id, field):
+    if vote_buffer is None:
+        return increment_vote(post_id, field)
+    vote_buffer.add(post_id, field)
+    return PostModel(id=ObjectId(post_id), **vote_buffer.pending(post_id))
@@ -0,0 +1,221 @@
+# asgi_server.py
+"""Async serving mode for the unified API.
+
+    uvicorn unified_api.asgi_server:app --host 0.0.0.0 --port 5001
+
+``/bot`` and the per-symbol series endpoints run as coroutines (LangChain
+``ainvoke`` and motor). Every other route is the existing Flask app,
+mounted through a WSGI adapter with its own thread pool. Each route group
+gets a bounded number of concurrent requests, so slow chatbot traffic
+cannot take the capacity the data endpoints need; a request that waits
+longer than its group's queue timeout gets a 503.
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from unified_api.unified_api_server import SSE_HEADERS, StreamTimer, config, sse_event
+from unified_api.unified_api_server import app as flask_app
+from rag_demo.query_router import aanswer_query, astream_query
+from stock_api.rest_api import format_news
+from async_rest_api import AsyncSeriesEndpoint
+from mongo_client import client_options, stock_collection
+from tracing import TRACING, observe_request
+
+BOT_CONCURRENCY = int(os.environ.get("BOT_CONCURRENCY", "8"))
+BOT_QUEUE_TIMEOUT = float(os.environ.get("BOT_QUEUE_TIMEOUT", "30"))
+DATA_CONCURRENCY = int(os.environ.get("DATA_CONCURRENCY", "64"))
+DATA_QUEUE_TIMEOUT = float(os.environ.get("DATA_QUEUE_TIMEOUT", "5"))
+# Threads running the mounted Flask app (GraphQL and the remaining REST views)
+WSGI_WORKERS = int(os.environ.get("WSGI_WORKERS", "32"))
+
+# (name, path prefixes, concurrent requests, seconds a request may queue);
+# the first matching group applies, unmatched paths are not limited.
+ROUTE_GROUPS = [
+    ("health", ("/healthz", "/readyz", "/bot/stats", "/metrics"), None, None),
+    ("bot", ("/bot",), BOT_CONCURRENCY, BOT_QUEUE_TIMEOUT),
+    ("data", ("/api", "/graphql"), DATA_CONCURRENCY, DATA_QUEUE_TIMEOUT),
+]
+
+
+class ConcurrencyLimiter:
+    """ASGI middleware holding one semaphore per route group."""
+
+    def __init__(self, app, groups=ROUTE_GROUPS):
+        self.app = app
+        self.groups = groups
+        self.semaphores = {}
+        self.in_flight = dict.fromkeys((name for name, *_ in groups), 0)
+        self.rejected = dict.fromkeys((name for name, *_ in groups), 0)
+
+    def _group(self, path):
+        for name, prefixes, limit, timeout in self.groups:
+            if path.startswith(prefixes):
+                return name, limit, timeout
+        return None, None, None
+
+    async def __call__(self, scope, receive, send):
+        name, limit, timeout = self._group(scope.get("path", ""))
+        if scope["type"] != "http" or limit is None:
+            return await self.app(scope, receive, send)
+        semaphore = self.semaphores.get(name)
+        if semaphore is None:
+            semaphore = self.semaphores[name] = asyncio.Semaphore(limit)
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self.rejected[name] += 1
+            response = JSONResponse(
+                {"error": f"Too many concurrent {name} requests"},
+                status_code=503,
+                headers={"Retry-After": "1"},
+            )
+            return await response(scope, receive, send)
+        self.in_flight[name] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight[name] -= 1
+            semaphore.release()
+
+    def stats(self):
+        return {
+            name: {
+                "limit": limit,
+                "in_flight": self.in_flight[name],
+                "rejected": self.rejected[name],
+            }
+            for name, _, limit, _ in self.groups
+            if limit is not None
+        }
+
+
+motor_client = None
+
+
+def motor_collection(name):
+    def collection():
+        return stock_collection(name, motor_client["StockInfoDB"])
+
+    return collection
+
+
+async def _query(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+    return data.get("query", "")
+
+
+async def ask(request):
+    query = await _query(request)
+    if not query:
+        return JSONResponse({"error": "Query is required"}, status_code=400)
+    try:
+        response = await aanswer_query(query)
+        return JSONResponse({"response": response})
+    except Exception as e:
+        return JSONResponse({"error": str(e)})
+
+
+async def ask_stream(request):
+    query = await _query(request)
+    if not query:
+        return JSONResponse({"error": "Query is required"}, status_code=400)
+
+    async def generate():
+        timer = StreamTimer()
+        try:
+            async for chunk in astream_query(query):
+                timer.chunk()
+                yield sse_event("token", {"token": chunk})
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+            return
+        yield sse_event("done", timer.done())
+
+    return StreamingResponse(
+        generate(), media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+
+async def limits(request):
+    return JSONResponse(limiter.stats())
+
+
+def route(path, endpoint, methods):
+    """A Route whose requests are recorded in the /metrics request
+    histograms, like the Flask routes (tracing.instrument_flask). Streamed
+    responses are timed until their headers are ready."""
+    if not TRACING:
+        return Route(path, endpoint, methods=methods)
+
+    async def timed(request):
+        start = time.perf_counter()
+        response = await endpoint(request)
+        observe_request(path, request.method, response.status_code, time.perf_counter() - start)
+        return response
+
+    return Route(path, timed, methods=methods)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global motor_client
+    # Created inside the server's event loop, with the Flask side's pool,
+    # timeout and read settings (motor keeps its own connection pool)
+    motor_client = AsyncIOMotorClient(config["MONGO_URI"], **client_options())
+    yield
+    motor_client.close()
+
+
+routes = [
+    route("/bot", ask, methods=["POST"]),
+    route("/bot/stream", ask_stream, methods=["POST"]),
+    route("/limits", limits, methods=["GET"]),
+    route(
+        "/api/cash_flow",
+        AsyncSeriesEndpoint(
+            motor_collection("cash_flow"), "symbol", "fiscalDateEnding",
+            "rest_api.get_cash_flow", "cash_flow",
+        ).handle,
+        methods=["GET"],
+    ),
+    route(
+        "/api/quarterly_earnings",
+        AsyncSeriesEndpoint(
+            motor_collection("quarterly_earnings"), "symbol", "fiscalDateEnding",
+            "rest_api.get_quarterly_earnings", "quarterly_earnings",
+        ).handle,
+        methods=["GET"],
+    ),
+    route(
+        "/api/stock_weekly_data",
+        AsyncSeriesEndpoint(
+            motor_collection("stock_weekly_data"), "symbol", "date",
+            "rest_api.get_weekly_data", "stock_weekly_data",
+        ).handle,
+        methods=["GET"],
+    ),
+    route(
+        "/api/news_sentiment",
+        AsyncSeriesEndpoint(
+            motor_collection("news_sentiment"), "ticket_number", "time_published",
+            "rest_api.get_news_sentiment", "news_sentiment",
+            transform=format_news, date_format="%Y%m%dT%H%M%S",
+        ).handle,
+        methods=["GET"],
+    ),
+    Mount("/", WSGIMiddleware(flask_app, workers=WSGI_WORKERS)),
+]
+
+limiter = ConcurrencyLimiter(Starlette(routes=routes, lifespan=lifespan))
+app = limiter
@@ -1,29 +1,65 @@
 # unified_api_server.py
-from mongoengine import connect
-import yaml
+import json
+import time
+from contextlib import contextmanager
 
-with open("secret.yml", "r") as file:
-    config = yaml.safe_load(file)
-MongoURI = config["MONGO_URI"]
-# Define the MongoDB connection settings
-MONGODB_SETTINGS = {"db": "StockInfoDB", "host": MongoURI}
-# Connect to the MongoDB database using the connection settings
-connect(**MONGODB_SETTINGS)
+startup_started = time.perf_counter()
+# Seconds spent in each import stage, reported by /readyz
+startup_timings = {}
 
 
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from rag_demo.query_router import route_query
-from stock_api.graphql_api import graphql_api
-from stock_api.rest_api import rest_api
+@contextmanager
+def startup_stage(name):
+    start = time.perf_counter()
+    yield
+    startup_timings[name] = round(time.perf_counter() - start, 3)
+
+
+with startup_stage("config"):
+    from config_utils import load_config
+
+    config = load_config()
+
+with startup_stage("mongo"):
+    # Registers the Mongo command listener before any client is created
+    import tracing
+    from mongo_client import connect, pool_stats
+
+    MongoURI = config["MONGO_URI"]
+    # One pooled client for mongoengine (GraphQL) and rest_api
+    connect(MongoURI)
+
+with startup_stage("flask"):
+    from flask import Flask, Response, request, jsonify, stream_with_context
+    from flask_cors import CORS
+
+with startup_stage("rest_api"):
+    from stock_api.rest_api import rest_api
+
+with startup_stage("graphql_api"):
+    from stock_api.graphql_api import graphql_api
+
+# The RAG pieces (LLM clients, vector store, data frames, agent) are only
+# registered here; they are built by the warm-up thread or on first use.
+with startup_stage("rag"):
+    from rag_demo.query_router import (answer_query, query_stats,
+                                       record_stream_timing, stream_query)
+    from resources import RESOURCE_WARMUP, resources
 
 app = Flask(__name__)
 CORS(app)
+tracing.instrument_flask(app)
 
 # Register Blueprints
 app.register_blueprint(rest_api, url_prefix="/api")
 app.register_blueprint(graphql_api)
 
+startup_timings["total"] = round(time.perf_counter() - startup_started, 3)
+print(f"Startup stages (s): {startup_timings}")
+
+if RESOURCE_WARMUP:
+    resources.warm_up()
+
 
 # Bot endpoint
 @app.route('/bot', methods=['POST'])
@@ -33,13 +69,95 @@ def ask():
     if not query:
         return jsonify({'error': 'Query is required'}), 400
     try:
-        response = route_query(query)
+        response = answer_query(query)
         return jsonify({'response': response})
     except Exception as e:
         return jsonify({'error': str(e)})
 
 
-if __name__ == '__main__':
-    app.run(debug=True, host="0.0.0.0", port=5001)
+def sse_event(event, data):
+    """One server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+class StreamTimer:
+    """Time to first chunk and total time of one streamed answer."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.ttfb = None
+
+    def chunk(self):
+        if self.ttfb is None:
+            self.ttfb = time.perf_counter() - self.start
+
+    def done(self):
+        total = time.perf_counter() - self.start
+        ttfb = self.ttfb if self.ttfb is not None else total
+        timings = {"ttfb_ms": round(1000 * ttfb, 1), "total_ms": round(1000 * total, 1)}
+        record_stream_timing(**timings)
+        return timings
+
 
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
+
+# Streaming bot endpoint: server-sent "token" events as the answer is
+# generated, then "done" with the time to first token and the total time
+@app.route('/bot/stream', methods=['POST'])
+def ask_stream():
+    data = request.json
+    query = data.get('query', '')
+    if not query:
+        return jsonify({'error': 'Query is required'}), 400
+
+    def generate():
+        timer = StreamTimer()
+        try:
+            for chunk in stream_query(query):
+                timer.chunk()
+                yield sse_event('token', {'token': chunk})
+        except Exception as e:
+            yield sse_event('error', {'error': str(e)})
+            return
+        yield sse_event('done', timer.done())
+
+    return Response(
+        stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS
+    )
+
+
+# Prometheus metrics: per-route and per-stage latency, Mongo and LLM calls
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    if not tracing.TRACING:
+        return jsonify({'error': 'Tracing is disabled (TRACING=0)'}), 404
+    return Response(tracing.render(), content_type=tracing.CONTENT_TYPE)
+
+
+@app.route('/bot/stats', methods=['GET'])
+def bot_stats():
+    return jsonify(query_stats())
+
+
+# Liveness: the process is up and serving
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({'status': 'ok', 'mongo_pool': pool_stats()})
+
+
+# Readiness: the RAG resources are built, so /bot answers without cold start
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    # With warm-up off the resources are built on first use by design
+    ready = resources.ready() or not RESOURCE_WARMUP
+    body = {
+        'status': 'ready' if ready else 'warming' if resources.warming else 'not ready',
+        'resources': resources.status(),
+        'startup': startup_timings,
+    }
+    return jsonify(body), 200 if ready else 503
+
+
+if __name__ == '__main__':
+    app.run(debug=True, host="0.0.0.0", port=5001)